@@ -0,0 +1,85 @@
+"""Compare the throughput of printing logs with `logging.StreamHandler`
+and with `BufferedStreamHandler`, when stdout is a pipe, as it is in
+containers.
+
+Run from the repository root:
+
+    python benchmarks/stdout_sink.py --records 200000 --threads 1 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Callable, TextIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loga._buffered import BufferedStreamHandler  # noqa: E402
+from loga._loga import LocalLogFormatter  # noqa: E402
+
+
+def drain(fd: int) -> None:
+    while os.read(fd, 1 << 16):
+        pass
+
+
+def run(make_handler: Callable[[TextIO], logging.Handler], records: int, threads: int) -> float:
+    """Return the records handled per second by `threads` threads
+    logging `records` records in total to a pipe."""
+    read_fd, write_fd = os.pipe()
+    reader = threading.Thread(target=drain, args=(read_fd,))
+    reader.start()
+    stream = os.fdopen(write_fd, "w")
+    handler = make_handler(stream)
+    handler.setFormatter(LocalLogFormatter())
+    record = logging.makeLogRecord(
+        {
+            "msg": "*Returned from Multiplier.multiply(a=2, b=3) with int (6)",
+            "levelno": logging.INFO,
+            "levelname": "INFO",
+        }
+    )
+
+    def log() -> None:
+        for _ in range(records // threads):
+            handler.handle(record)
+
+    workers = [threading.Thread(target=log) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    handler.flush()
+    elapsed = time.perf_counter() - start
+    handler.close()
+    stream.close()
+    reader.join()
+    os.close(read_fd)
+    return records / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--records", type=int, default=200_000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--buffer-size", type=int, default=65536)
+    args = parser.parse_args()
+    handlers: dict[str, Callable[[TextIO], logging.Handler]] = {
+        "StreamHandler": logging.StreamHandler,
+        "BufferedStreamHandler": lambda stream: BufferedStreamHandler(stream, args.buffer_size),
+    }
+    print(f"{'handler':<24}{'threads':>8}{'records/s':>14}")
+    for threads in args.threads:
+        for name, make_handler in handlers.items():
+            rate = run(make_handler, args.records, threads)
+            print(f"{name:<24}{threads:>8}{rate:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Command line tools for loga's log files."""
+
+from __future__ import annotations
+
+import argparse
+from datetime import datetime
+import json
+import sys
+from typing import Sequence
+
+from . import _analyze, _binary, _index, _shared
+from ._loga import JsonLogFormatter, LocalLogFormatter
+
+
+def _analyze_command(args: argparse.Namespace) -> None:
+    report = _analyze.analyze(args.files, processes=args.processes)
+    if args.json:
+        print(json.dumps({name: r._asdict() for name, r in report.items()}, indent=2))
+    else:
+        print(_analyze.format_report(report))
+
+
+def _time(value: str) -> float:
+    """Parse seconds since the epoch, or an ISO 8601 local time."""
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def _query_command(args: argparse.Namespace) -> None:
+    for record in _index.query(
+        args.file,
+        couplet=args.couplet,
+        callable_name=args.callable,
+        level=args.level,
+        since=args.since,
+        until=args.until,
+        limit=args.limit,
+    ):
+        print(record)
+
+
+def _convert_command(args: argparse.Namespace) -> None:
+    formatter = JsonLogFormatter() if args.to == "json" else LocalLogFormatter()
+    if args.output is None:
+        _binary.convert(args.file, sys.stdout, formatter)
+        return
+    with open(args.output, "w", encoding="utf-8") as output:
+        _binary.convert(args.file, output, formatter)
+
+
+def _metrics_command(args: argparse.Namespace) -> None:
+    metrics = _shared.SharedCallMetrics.attach(args.name)
+    try:
+        sys.stdout.write(metrics.exposition())
+    finally:
+        metrics.close()
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m loga", description=__doc__)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    analyze = subparsers.add_parser(
+        "analyze", help="report call counts, error rates and latency percentiles per callable"
+    )
+    analyze.add_argument("files", nargs="+", help="log files, oldest first")
+    analyze.add_argument(
+        "--processes", type=int, default=1, help="number of processes reading the files"
+    )
+    analyze.add_argument("--json", action="store_true", help="print the report as JSON")
+    analyze.set_defaults(handler=_analyze_command)
+
+    query = subparsers.add_parser(
+        "query", help="print the records of an indexed log file that match all the filters"
+    )
+    query.add_argument("file", help="log file written with logfile_index=True")
+    query.add_argument("--couplet", help="couplet of a decorated call")
+    query.add_argument("--callable", help="name of a decorated callable")
+    query.add_argument("--level", type=int, help="lowest level of the records")
+    query.add_argument(
+        "--since", type=_time, help="seconds since the epoch, or ISO 8601 local time"
+    )
+    query.add_argument(
+        "--until", type=_time, help="seconds since the epoch, or ISO 8601 local time"
+    )
+    query.add_argument("--limit", type=int, help="most records to print")
+    query.set_defaults(handler=_query_command)
+
+    convert = subparsers.add_parser(
+        "convert", help="convert a binary log file to the text or JSON format"
+    )
+    convert.add_argument("file", help="log file written with logfile_format='binary'")
+    convert.add_argument("--to", choices=("text", "json"), default="text", help="output format")
+    convert.add_argument("--output", "-o", help="file to write, instead of stdout")
+    convert.set_defaults(handler=_convert_command)
+
+    metrics = subparsers.add_parser(
+        "metrics", help="print the counts of a shared metrics segment in OpenMetrics format"
+    )
+    metrics.add_argument("name", help="segment configured as shared_metrics")
+    metrics.set_defaults(handler=_metrics_command)
+
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,293 @@
+"""Offline analysis of the log files loga writes.
+
+Files are read through memory maps, split into chunks of whole lines,
+and each chunk is reduced to per-callable partial aggregates, so that
+chunks can be analysed in parallel processes and a file is never
+loaded into memory at once.
+"""
+
+from __future__ import annotations
+
+from array import array
+import calendar
+from collections.abc import Iterable, Iterator, Sequence
+from concurrent.futures import ProcessPoolExecutor
+import json
+import math
+import mmap
+import os
+import re
+import time
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+from . import _binary
+
+# Chunks are at least this large when a file is split between processes
+MIN_CHUNK_SIZE = 1 << 20
+
+_TEXT_LINE = re.compile(r"\d{4}-\d\d-\d\d \d\d:\d\d:\d\d[^\t\n]*\t")
+# Prefixes of the default message forms, mapped to their events
+_TEXT_EVENTS = (
+    ("*Called ", "called"),
+    ("*Returned None from ", "returned"),
+    ("*Returned from ", "returned"),
+    ("*Errored during ", "errored"),
+)
+
+
+class CallableReport(NamedTuple):
+    calls: int  # calls that returned or raised
+    errors: int
+    error_rate: float
+    p50: float  # call durations in seconds
+    p90: float
+    p99: float
+    max: float  # noqa: A003
+    unfinished: int  # 'called' logs without a matching return or error
+
+
+# An event that ends a call: the candidate keys of the call it ends, its
+# time and whether it is an error
+_Close = Tuple[str, Tuple[str, ...], float, bool]
+_OpenCalls = Dict[Tuple[str, str], List[float]]
+
+
+class _Partial:
+    """Aggregates of a chunk of lines.
+
+    Calls ended in the chunk that started before it are kept as
+    `unmatched` closes, and calls started in it that don't end in it as
+    `opens`, so that they can be paired when the chunks are merged in
+    order.
+    """
+
+    def __init__(self) -> None:
+        self.durations: dict[str, array] = {}
+        self.errors: dict[str, int] = {}
+        self.opens: _OpenCalls = {}
+        self.unmatched: list[_Close] = []
+
+    def open(self, name: str, key: str, timestamp: float) -> None:  # noqa: A003
+        self.opens.setdefault((name, key), []).append(timestamp)
+
+    def close(self, close: _Close) -> None:
+        name, candidates, timestamp, is_error = close
+        for key in candidates:
+            started = self.opens.get((name, key))
+            if started:
+                # Nested calls with identical keys end in reverse order
+                self._finish(name, timestamp - started.pop(), is_error)
+                if not started:
+                    del self.opens[(name, key)]
+                return
+        self.unmatched.append(close)
+
+    def _finish(self, name: str, duration: float, is_error: bool) -> None:
+        durations = self.durations.get(name)
+        if durations is None:
+            durations = self.durations[name] = array("d")
+        durations.append(duration)
+        if is_error:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def merge(self, later: _Partial) -> None:
+        """Add the aggregates of the chunk following this one."""
+        for close in later.unmatched:
+            self.close(close)
+        for name, durations in later.durations.items():
+            own = self.durations.get(name)
+            if own is None:
+                self.durations[name] = durations
+            else:
+                own.extend(durations)
+        for name, count in later.errors.items():
+            self.errors[name] = self.errors.get(name, 0) + count
+        for call, started in later.opens.items():
+            self.opens.setdefault(call, []).extend(started)
+
+    def report(self) -> dict[str, CallableReport]:
+        unfinished: dict[str, int] = {}
+        for (name, _), started in self.opens.items():
+            unfinished[name] = unfinished.get(name, 0) + len(started)
+        report = {}
+        for name in sorted(self.durations.keys() | unfinished.keys()):
+            durations = sorted(self.durations.get(name, ()))
+            calls = len(durations)
+            errors = self.errors.get(name, 0)
+            report[name] = CallableReport(
+                calls,
+                errors,
+                errors / calls if calls else 0.0,
+                _percentile(durations, 50),
+                _percentile(durations, 90),
+                _percentile(durations, 99),
+                durations[-1] if durations else 0.0,
+                unfinished.get(name, 0),
+            )
+        return report
+
+
+def _percentile(ordered: Sequence[float], percent: float) -> float:
+    """Return the nearest-rank percentile of sorted values."""
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+def _iter_lines(path: str, start: int, end: int) -> Iterator[bytes]:
+    """Yield the lines of a file that start in [start, end)."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            position = start
+            if start > 0 and mm[start - 1 : start] != b"\n":
+                # The line in progress belongs to the previous chunk
+                newline = mm.find(b"\n", start)
+                position = len(mm) if newline == -1 else newline + 1
+            while position < end:
+                newline = mm.find(b"\n", position)
+                if newline == -1:
+                    newline = len(mm)
+                yield mm[position:newline]
+                position = newline + 1
+
+
+def _text_close_keys(rest: str) -> tuple[str, ...]:
+    """Return the call signatures that the rest of a 'returned' or
+    'errored' message may start with, longest first."""
+    keys = [rest]
+    index = rest.rfind(" with ")
+    while index != -1:
+        keys.append(rest[:index])
+        index = rest.rfind(" with ", 0, index)
+    return tuple(keys)
+
+
+def _add_structured(partial: _Partial, data: dict[str, Any]) -> None:
+    """Add a record of a JSON or binary log file."""
+    try:
+        event, name, couplet = data["event"], data["callable"], str(data["couplet"])
+        timestamp = float(data["time"])
+    except (ValueError, KeyError, TypeError):
+        return
+    if event == "called":
+        partial.open(name, couplet, timestamp)
+    elif event in {"returned", "returned_none", "errored"}:
+        partial.close((name, (couplet,), timestamp, event == "errored"))
+
+
+def _analyse_chunk(path: str, start: int, end: int) -> _Partial:
+    partial = _Partial()
+    if _binary.is_binary(path):
+        # Binary files can't be split, so they are analysed whole
+        for data in _binary.read_records(path):
+            _add_structured(partial, data)
+        return partial
+    timestamps: dict[str, float] = {}
+    for raw in _iter_lines(path, start, end):
+        line = raw.decode("utf-8", "replace")
+        if line.startswith("{"):
+            try:
+                data = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(data, dict):
+                _add_structured(partial, data)
+            continue
+
+        match = _TEXT_LINE.match(line)
+        if match is None:
+            # A continuation line of a multi-line message or traceback
+            continue
+        level_tab = line.rfind("\t")
+        # The first line of a multi-line message has no level
+        message = (
+            line[match.end() : level_tab] if level_tab >= match.end() else line[match.end() :]
+        )
+        for prefix, event in _TEXT_EVENTS:
+            if message.startswith(prefix):
+                break
+        else:
+            continue
+        rest = message[len(prefix) :]
+        name = rest.split("(", 1)[0]
+        asctime = line[:19]
+        if asctime not in timestamps:
+            # Only durations are reported, so the time zone doesn't matter
+            parsed = time.strptime(asctime, "%Y-%m-%d %H:%M:%S")
+            timestamps[asctime] = calendar.timegm(parsed)
+        timestamp = timestamps[asctime]
+        if event == "called":
+            partial.open(name, rest, timestamp)
+        else:
+            partial.close((name, _text_close_keys(rest), timestamp, event == "errored"))
+    return partial
+
+
+def _analyse_chunk_args(args: tuple[str, int, int]) -> _Partial:
+    return _analyse_chunk(*args)
+
+
+def _chunks(paths: Iterable[str], processes: int) -> list[tuple[str, int, int]]:
+    chunks = []
+    for path in paths:
+        size = os.path.getsize(path)
+        chunk_size = max(MIN_CHUNK_SIZE, math.ceil(size / (processes * 4)))
+        if processes <= 1 or _binary.is_binary(path):
+            chunk_size = max(size, 1)
+        for start in range(0, size, chunk_size):
+            chunks.append((path, start, min(start + chunk_size, size)))
+    return chunks
+
+
+def analyze(paths: Sequence[str], processes: int = 1) -> dict[str, CallableReport]:
+    """Report the calls, errors and call durations of each callable in
+    loga's log files.
+
+    Files of all `logfile_format`s can be read. Calls are paired by
+    couplet in JSON and binary logs. Text logs have no
+    couplets, and only time stamps to the second, so calls are paired
+    by their call signature, and only logs made with the default
+    message forms are recognised. Rotated files should be given oldest
+    first, so that calls spanning files are paired.
+    """
+    chunks = _chunks(paths, processes)
+    if processes > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(processes) as executor:
+            partials: Iterable[_Partial] = executor.map(_analyse_chunk_args, chunks)
+            merged = _merge(partials)
+    else:
+        merged = _merge(_analyse_chunk(*chunk) for chunk in chunks)
+    return merged.report()
+
+
+def _merge(partials: Iterable[_Partial]) -> _Partial:
+    merged = _Partial()
+    for partial in partials:
+        merged.merge(partial)
+    return merged
+
+
+def format_report(report: dict[str, CallableReport]) -> str:
+    """Format a report as a table."""
+    header = ("callable", "calls", "errors", "error %", "p50", "p90", "p99", "max", "unfinished")
+    rows: list[tuple[str, ...]] = [header]
+    for name, r in report.items():
+        rows.append(
+            (
+                name,
+                str(r.calls),
+                str(r.errors),
+                f"{r.error_rate * 100:.1f}",
+                *(f"{seconds:.3f}" for seconds in (r.p50, r.p90, r.p99, r.max)),
+                str(r.unfinished),
+            )
+        )
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    lines = []
+    for row in rows:
+        cells = [row[0].ljust(widths[0])]
+        cells += [cell.rjust(width) for cell, width in zip(row[1:], widths[1:])]
+        lines.append("  ".join(cells).rstrip())
+    return "\n".join(lines)
@@ -0,0 +1,255 @@
+"""A compact binary format for log files.
+
+A file is a sequence of frames: a type byte, the length of the payload
+as a varint, and the payload. Files are split into segments, each
+starting with a segment frame, in which field keys and the values of
+low-cardinality fields are written once as string frames, and referred
+to by their number within the segment from record frames. A segment is
+readable without the ones before it, and a torn frame at the end of a
+file, left by a crash, is ignored.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+import logging
+import mmap
+import os
+import pathlib
+import struct
+from typing import IO, Any, Dict
+import uuid
+
+MAGIC = b"loga\x01"
+# Records written before the string table starts anew
+SEGMENT_RECORDS = 10000
+# Log data whose values are interned like keys
+INTERNED_FIELDS = frozenset({"callable", "event", "exception_type", "return_type"})
+
+_SEGMENT, _STRING, _RECORD = b"S", b"K", b"R"
+FILE_START = _SEGMENT + bytes([len(MAGIC)]) + MAGIC
+# Types of values in records
+_STR, _INT, _NEG_INT, _FLOAT, _TRUE, _FALSE, _NONE, _UUID, _INTERNED = range(9)
+_DOUBLE = struct.Struct("<d")
+# Attributes of records that aren't log data
+_RECORD_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+LogData = Dict[str, Any]
+
+
+def _varint(buffer: bytearray, number: int) -> None:
+    while number > 0x7F:
+        buffer.append(number & 0x7F | 0x80)
+        number >>= 7
+    buffer.append(number)
+
+
+def _frame(buffer: bytearray, frame_type: bytes, payload: bytes | bytearray) -> None:
+    buffer += frame_type
+    _varint(buffer, len(payload))
+    buffer += payload
+
+
+class BinaryFileHandler(logging.FileHandler):
+    """A file handler writing records in the binary format.
+
+    Unlike `FileHandler`, records are buffered, and only flushed by
+    `flush()`, and when a record of `flush_level` or higher is handled.
+    As records refer to the string table of their segment, only one
+    process can append to a file: forked children write to a file of
+    their own, suffixed with their process id.
+    """
+
+    def __init__(
+        self, filename: str, delay: bool = False, flush_level: int = logging.ERROR
+    ) -> None:
+        self.flush_level = flush_level
+        self._strings: dict[str, int] = {}
+        self._records = SEGMENT_RECORDS
+        super().__init__(filename, mode="ab", delay=delay)
+
+    def _open(self) -> Any:
+        # The string table of the last segment isn't known to this handler
+        self._records = SEGMENT_RECORDS
+        return super()._open()
+
+    def after_fork_in_child(self) -> None:
+        """Write the child's records to a file of its own, suffixed with
+        its process id."""
+        # The stream was flushed before the fork, so closing the child's
+        # copy of it doesn't write anything
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+        path = pathlib.Path(self.baseFilename)
+        self.baseFilename = str(path.with_name(f"{path.stem}.{os.getpid()}{path.suffix}"))
+
+    def _intern(self, frames: bytearray, string: str) -> int:
+        number = self._strings.get(string)
+        if number is None:
+            number = self._strings[string] = len(self._strings)
+            _frame(frames, _STRING, string.encode("utf-8", "surrogatepass"))
+        return number
+
+    def _value(self, frames: bytearray, payload: bytearray, value: Any, interned: bool) -> None:
+        if isinstance(value, str):
+            if interned:
+                payload.append(_INTERNED)
+                _varint(payload, self._intern(frames, value))
+            else:
+                encoded = value.encode("utf-8", "surrogatepass")
+                payload.append(_STR)
+                _varint(payload, len(encoded))
+                payload += encoded
+        elif value is True:
+            payload.append(_TRUE)
+        elif value is False:
+            payload.append(_FALSE)
+        elif value is None:
+            payload.append(_NONE)
+        elif isinstance(value, int):
+            payload.append(_INT if value >= 0 else _NEG_INT)
+            _varint(payload, abs(value))
+        elif isinstance(value, float):
+            payload.append(_FLOAT)
+            payload += _DOUBLE.pack(value)
+        elif isinstance(value, uuid.UUID):
+            payload.append(_UUID)
+            payload += value.bytes
+        else:
+            self._value(frames, payload, str(value), interned)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+            frames = bytearray()
+            if self._records >= SEGMENT_RECORDS:
+                _frame(frames, _SEGMENT, MAGIC)
+                self._strings = {}
+                self._records = 0
+            payload = bytearray(_DOUBLE.pack(record.created))
+            _varint(payload, record.levelno)
+            self._value(frames, payload, record.getMessage(), False)
+            data = [(k, v) for k, v in vars(record).items() if k not in _RECORD_ATTRS]
+            _varint(payload, len(data))
+            for key, value in data:
+                _varint(payload, self._intern(frames, key))
+                self._value(frames, payload, value, key in INTERNED_FIELDS)
+            _frame(frames, _RECORD, payload)
+            # The stream is opened in binary mode
+            self.stream.write(frames)  # type: ignore[arg-type]
+            self._records += 1
+            if record.levelno >= self.flush_level:
+                self.stream.flush()
+        except Exception:
+            self.handleError(record)
+
+
+class _Reader:
+    __slots__ = ("data", "position", "strings")
+
+    def __init__(self, data: mmap.mmap) -> None:
+        self.data = data
+        self.position = 0
+        self.strings: list[str] = []
+
+    def varint(self) -> int:
+        number = shift = 0
+        while True:
+            byte = self.data[self.position]
+            self.position += 1
+            number |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return number
+            shift += 7
+
+    def string(self, length: int) -> str:
+        start = self.position
+        self.position += length
+        return self.data[start : self.position].decode("utf-8", "surrogatepass")
+
+    def value(self) -> Any:
+        value_type = self.data[self.position]
+        self.position += 1
+        if value_type == _STR:
+            return self.string(self.varint())
+        if value_type == _INTERNED:
+            return self.strings[self.varint()]
+        if value_type == _INT:
+            return self.varint()
+        if value_type == _NEG_INT:
+            return -self.varint()
+        if value_type == _FLOAT:
+            self.position += 8
+            return _DOUBLE.unpack_from(self.data, self.position - 8)[0]
+        if value_type == _UUID:
+            self.position += 16
+            return uuid.UUID(bytes=self.data[self.position - 16 : self.position])
+        return {_TRUE: True, _FALSE: False, _NONE: None}[value_type]
+
+    def record(self) -> LogData:
+        created = _DOUBLE.unpack_from(self.data, self.position)[0]
+        self.position += 8
+        data = {"time": created, "level": self.varint(), "message": self.value()}
+        for _ in range(self.varint()):
+            key = self.strings[self.varint()]
+            data[key] = self.value()
+        return data
+
+
+def is_binary(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(FILE_START)) == FILE_START
+
+
+def read_records(path: str) -> Iterator[LogData]:
+    """Yield the time, level, message and log data of each record in a
+    binary log file, like the objects of JSON log files."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            reader = _Reader(data)
+            while reader.position < len(data):
+                frame_type = data[reader.position : reader.position + 1]
+                reader.position += 1
+                try:
+                    length = reader.varint()
+                except IndexError:
+                    return
+                end = reader.position + length
+                if end > len(data):
+                    return
+                if frame_type == _RECORD:
+                    yield reader.record()
+                elif frame_type == _STRING:
+                    reader.strings.append(reader.string(length))
+                elif frame_type == _SEGMENT:
+                    if data[reader.position : end] != MAGIC:
+                        raise ValueError(f"{path} is not a binary loga log file")
+                    reader.strings = []
+                reader.position = end
+
+
+def to_log_record(data: LogData) -> logging.LogRecord:
+    """Make a record of the data of a binary log record, for formatting."""
+    created, level = data["time"], data["level"]
+    log_data = {k: v for k, v in data.items() if k not in {"time", "level", "message"}}
+    return logging.makeLogRecord(
+        {
+            **log_data,
+            "msg": data["message"],
+            "levelno": level,
+            "levelname": logging.getLevelName(level),
+            "created": created,
+            "msecs": (created - int(created)) * 1000,
+        }
+    )
+
+
+def convert(path: str, output: IO[str], formatter: logging.Formatter) -> None:
+    """Write the records of a binary log file to `output`, one per line,
+    formatted as the file handler would have with `formatter`."""
+    for data in read_records(path):
+        output.write(formatter.format(to_log_record(data)) + "\n")
@@ -0,0 +1,100 @@
+"""Keeping the size of each log within a budget."""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from typing import Any, Literal
+
+BudgetUnit = Literal["characters", "bytes"]
+SUFFIX = "..."
+# Log data naming the fields that were cut to fit the budget
+CUT_FIELDS_KEY = "cut_fields"
+# Fields whose end is kept when cut, as that is where the error is
+TAIL_FIELDS = frozenset({"trace", "traceback"})
+
+
+def _utf8_len(string: str) -> int:
+    return len(string.encode("utf-8", "surrogatepass"))
+
+
+def _fair_cap(sizes: list[int], available: int) -> int | None:
+    """Return the largest size to which the largest of `sizes` can be
+    cut for all of them to fit in `available`, or None if they fit."""
+    if sum(sizes) <= available:
+        return None
+    remaining = available
+    left = len(sizes)
+    for size in sorted(sizes):
+        if size * left > remaining:
+            break
+        remaining -= size
+        left -= 1
+    return max(remaining // left, len(SUFFIX))
+
+
+class EventBudget:
+    """Cut the message and the string log data of each log so that
+    their total size, along with the names of the log data and its
+    other values, is at most `size` characters or UTF-8 bytes.
+
+    The budget is shared fairly: values smaller than an equal share
+    are kept whole, and the space they leave is shared by the larger
+    ones, which are all cut to the same size. Cut values end with
+    "...", or start with it for tracebacks, and their names are listed
+    in the `cut_fields` log data, with "message" for the message.
+    """
+
+    def __init__(self, size: int, unit: BudgetUnit = "characters") -> None:
+        if unit not in {"characters", "bytes"}:
+            raise ValueError(f"Unknown budget unit {unit!r}")
+        if size < 1:
+            raise ValueError("Event budget must be positive")
+        self.size = size
+        self.unit = unit
+        self._measure: Callable[[str], int] = len if unit == "characters" else _utf8_len
+
+    def _cut(self, key: str, value: str, cap: int) -> str:
+        keep = cap - len(SUFFIX)
+        if self.unit == "bytes":
+            encoded = value.encode("utf-8", "surrogatepass")
+            if key in TAIL_FIELDS:
+                return SUFFIX + encoded[len(encoded) - keep :].decode("utf-8", "ignore")
+            return encoded[:keep].decode("utf-8", "ignore") + SUFFIX
+        if key in TAIL_FIELDS:
+            return SUFFIX + value[len(value) - keep :]
+        return value[:keep] + SUFFIX
+
+    def apply(self, msg: str, extra: dict[str, Any]) -> str:
+        """Cut `msg` and the values of `extra` in place to fit the
+        budget, and return the message."""
+        measure = self._measure
+        fixed = 0
+        names = ["message"]
+        sizes = [measure(msg)]
+        for key, value in extra.items():
+            fixed += measure(key)
+            if isinstance(value, str):
+                names.append(key)
+                sizes.append(measure(value))
+            else:
+                fixed += measure(str(value))
+        available = self.size - fixed
+        cap = _fair_cap(sizes, available)
+        if cap is None:
+            return msg
+        # Listing the cut fields takes space too, which may cut more
+        while True:
+            cut = [name for name, size in zip(names, sizes) if size > cap]
+            listing = measure(CUT_FIELDS_KEY) + measure(",".join(cut))
+            smaller_cap = _fair_cap(sizes, available - listing)
+            if smaller_cap is None or smaller_cap >= cap:
+                break
+            cap = smaller_cap
+        for name, size in zip(names, sizes):
+            if size > cap:
+                if name == "message":
+                    msg = self._cut(name, msg, cap)
+                else:
+                    extra[name] = self._cut(name, extra[name], cap)
+        extra[CUT_FIELDS_KEY] = ",".join(cut)
+        return msg
@@ -0,0 +1,106 @@
+"""Writing formatted records to a stream in batches."""
+
+from __future__ import annotations
+
+import logging
+import threading
+from typing import TextIO
+
+from ._multiprocess import close_at_exit
+
+
+class BufferedStreamHandler(logging.StreamHandler):
+    """Write records to `stream` a batch at a time, rather than writing
+    and flushing each record on its own.
+
+    Formatted records are buffered, and written and flushed together
+    when `buffer_size` characters are buffered, when a record of
+    `flush_level` or higher is handled, every `flush_interval` seconds,
+    and at exit. Records are formatted before the handler's lock is
+    taken, so that threads logging at once only wait for each other to
+    append to the buffer.
+    """
+
+    def __init__(
+        self,
+        stream: TextIO,
+        buffer_size: int = 65536,
+        flush_interval: float = 0.1,
+        flush_level: int = logging.ERROR,
+    ) -> None:
+        if buffer_size < 1:
+            raise ValueError("Buffer size must be positive")
+        super().__init__(stream)
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.flush_level = flush_level
+        self._start()
+
+    def _start(self) -> None:
+        self._buffer: list[str] = []
+        self._buffered = 0
+        self._stopping = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+        self._flusher.start()
+        # Flushed when multiprocessing children exit too
+        self._finalizer = close_at_exit(self)
+
+    def after_fork_in_child(self) -> None:
+        # The parent flushed what it had buffered before forking
+        self._finalizer.cancel()
+        self._start()
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        # Unlike `Handler.handle`, the lock is only taken by `emit`
+        if not self.filter(record):
+            return False
+        self.emit(record)
+        return True
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            text = self.format(record) + self.terminator
+            self.acquire()
+            try:
+                self._buffer.append(text)
+                self._buffered += len(text)
+                if self._buffered >= self.buffer_size or record.levelno >= self.flush_level:
+                    self._write()
+            finally:
+                self.release()
+        except Exception:
+            self.handleError(record)
+
+    def _write(self) -> None:
+        """Write and flush the buffer. Called with the lock held."""
+        if not self._buffer:
+            return
+        text = "".join(self._buffer)
+        self._buffer.clear()
+        self._buffered = 0
+        self.stream.write(text)
+        self.stream.flush()
+
+    def flush(self) -> None:
+        self.acquire()
+        try:
+            if self.stream and hasattr(self.stream, "flush"):
+                self._write()
+        finally:
+            self.release()
+
+    def _flush_periodically(self) -> None:
+        while not self._stopping.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                # Like a failed emit, e.g. a closed stream, which may work again
+                pass
+
+    def close(self) -> None:
+        self._stopping.set()
+        self._finalizer.cancel()
+        try:
+            self.flush()
+        finally:
+            super().close()
@@ -0,0 +1,273 @@
+"""An in-memory store of decorated call events, kept in columns.
+
+Events are appended to preallocated arrays, one per column, that grow a
+chunk at a time, so that millions of events can be kept without a
+Python object each. The arrays are NumPy arrays if NumPy is installed,
+and stdlib `array`s otherwise.
+"""
+
+from __future__ import annotations
+
+from array import array
+from collections import OrderedDict
+import csv
+import logging
+import math
+import os
+import sys
+from typing import Any, Dict
+import uuid
+
+from ._analyze import CallableReport, _percentile
+
+try:
+    import numpy
+except ModuleNotFoundError:
+    numpy = None  # type: ignore[assignment]
+
+EVENTS = ("called", "returned", "returned_none", "errored")
+_EVENT_IDS = {event: i for i, event in enumerate(EVENTS)}
+_CALLED = _EVENT_IDS["called"]
+_ERRORED = _EVENT_IDS["errored"]
+# Columns and the typecodes of their arrays, also understood by NumPy.
+# Couplets are split into their high and low 64 bits, 0 for none.
+COLUMNS = {
+    "time": "d",
+    "duration": "d",  # NaN for 'called' events and unpaired ones
+    "callable": "I",  # index in `callables`
+    "event": "B",  # index in EVENTS
+    "couplet_high": "Q",
+    "couplet_low": "Q",
+}
+_LOW_BITS = (1 << 64) - 1
+# The log data of decorated call logs the store reads
+FIELDS = frozenset({"event", "callable", "couplet"})
+
+Columns = Dict[str, Any]
+
+
+def _write_npy(path: str, values: array) -> None:
+    """Write an array in the .npy format, as `numpy.save` does."""
+    kind = "f" if values.typecode == "d" else "u"
+    descr = f"{'|' if values.itemsize == 1 else '<'}{kind}{values.itemsize}"
+    header = f"{{'descr': '{descr}', 'fortran_order': False, 'shape': ({len(values)},), }}"
+    # Magic, version and header length take 10 bytes, data starts 64 byte aligned
+    header += " " * (-(10 + len(header) + 1) % 64) + "\n"
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    with open(path, "wb") as f:
+        f.write(b"\x93NUMPY\x01\x00" + len(header).to_bytes(2, "little") + header.encode())
+        values.tofile(f)
+
+
+class EventStore(logging.Handler):
+    """Keep the time, duration, callable, event and couplet of each
+    decorated call log in columns, `chunk_size` events at a time.
+
+    Durations are those of the calls that 'returned' and 'errored'
+    events end, paired with their 'called' event by couplet. At most
+    `max_open` calls are kept waiting for their end, the oldest being
+    forgotten, as calls whose end isn't logged would otherwise be kept
+    forever. Other logs are ignored. NumPy is used if installed, unless
+    `use_numpy` is False.
+    """
+
+    def __init__(
+        self, chunk_size: int = 65536, use_numpy: bool | None = None, max_open: int = 65536
+    ) -> None:
+        if chunk_size < 1:
+            raise ValueError("Event store chunks must hold at least one event")
+        if max_open < 1:
+            raise ValueError("The event store must keep at least one open call")
+        if use_numpy and numpy is None:
+            raise ValueError("NumPy is not installed")
+        super().__init__()
+        self.chunk_size = chunk_size
+        self.max_open = max_open
+        self.use_numpy = numpy is not None if use_numpy is None else use_numpy
+        self._clear()
+
+    def _clear(self) -> None:
+        self._chunks: list[tuple] = []
+        self._filled = self.chunk_size
+        self.callables: list[str] = []
+        self._callable_ids: dict[str, int] = {}
+        # Start time and callable of calls not yet ended, by couplet, in
+        # the order they started
+        self._open: OrderedDict[int, tuple[float, int]] = OrderedDict()
+
+    def clear(self) -> None:
+        """Drop all events."""
+        self.acquire()
+        try:
+            self._clear()
+        finally:
+            self.release()
+
+    def _new_chunk(self) -> tuple:
+        if self.use_numpy:
+            return tuple(numpy.empty(self.chunk_size, code) for code in COLUMNS.values())
+        return tuple(
+            array(code, bytes(array(code).itemsize * self.chunk_size)) for code in COLUMNS.values()
+        )
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            event = _EVENT_IDS.get(getattr(record, "event", None))  # type: ignore[arg-type]
+            if event is None or getattr(record, "decorated", None) is not True:
+                return
+            name = str(getattr(record, "callable", ""))
+            name_id = self._callable_ids.get(name)
+            if name_id is None:
+                name_id = self._callable_ids[name] = len(self.callables)
+                self.callables.append(name)
+            couplet = getattr(record, "couplet", None)
+            if isinstance(couplet, str):
+                # Sent from another process
+                couplet = uuid.UUID(couplet)
+            key = couplet.int if isinstance(couplet, uuid.UUID) else 0
+            duration = math.nan
+            if key and event == _CALLED:
+                self._open[key] = (record.created, name_id)
+                if len(self._open) > self.max_open:
+                    self._open.popitem(last=False)
+            elif key:
+                start = self._open.pop(key, None)
+                if start is not None:
+                    duration = record.created - start[0]
+            if self._filled == self.chunk_size:
+                self._chunks.append(self._new_chunk())
+                self._filled = 0
+            times, durations, names, events, highs, lows = self._chunks[-1]
+            i = self._filled
+            times[i] = record.created
+            durations[i] = duration
+            names[i] = name_id
+            events[i] = event
+            highs[i] = key >> 64
+            lows[i] = key & _LOW_BITS
+            self._filled += 1
+        except Exception:
+            self.handleError(record)
+
+    def __len__(self) -> int:
+        return (len(self._chunks) - 1) * self.chunk_size + self._filled if self._chunks else 0
+
+    def columns(self) -> Columns:
+        """Return a copy of each column, by name, of all events so far."""
+        self.acquire()
+        try:
+            chunks = [list(chunk) for chunk in self._chunks]
+            if chunks:
+                chunks[-1] = [column[: self._filled] for column in chunks[-1]]
+        finally:
+            self.release()
+        if self.use_numpy:
+            return {
+                name: numpy.concatenate([chunk[i] for chunk in chunks])
+                if chunks
+                else numpy.empty(0, code)
+                for i, (name, code) in enumerate(COLUMNS.items())
+            }
+        columns = {}
+        for i, (name, code) in enumerate(COLUMNS.items()):
+            column = array(code)
+            for chunk in chunks:
+                column += chunk[i]
+            columns[name] = column
+        return columns
+
+    def summary(self) -> dict[str, CallableReport]:
+        """Report the calls, errors and duration percentiles of each
+        callable, as `python -m loga analyze` does for log files."""
+        columns = self.columns()
+        self.acquire()
+        try:
+            names = list(self.callables)
+            unfinished = [0] * len(names)
+            for _, name_id in list(self._open.values()):
+                unfinished[name_id] += 1
+        finally:
+            self.release()
+        ids, events, durations = columns["callable"], columns["event"], columns["duration"]
+        calls: Any
+        errors: Any
+        if self.use_numpy:
+            ended = events != _CALLED
+            calls = numpy.bincount(ids[ended], minlength=len(names))
+            errors = numpy.bincount(ids[events == _ERRORED], minlength=len(names))
+            timed = ended & ~numpy.isnan(durations)
+            # Durations sorted within each callable
+            order = numpy.lexsort((durations[timed], ids[timed]))
+            sorted_ids, sorted_durations = ids[timed][order], durations[timed][order]
+            bounds = numpy.searchsorted(sorted_ids, numpy.arange(len(names) + 1))
+            by_callable = [
+                sorted_durations[bounds[i] : bounds[i + 1]].tolist() for i in range(len(names))
+            ]
+        else:
+            calls = [0] * len(names)
+            errors = [0] * len(names)
+            by_callable = [[] for _ in names]
+            for name_id, event, duration in zip(ids, events, durations):
+                if event == _CALLED:
+                    continue
+                calls[name_id] += 1
+                if event == _ERRORED:
+                    errors[name_id] += 1
+                if not math.isnan(duration):
+                    by_callable[name_id].append(duration)
+            for ordered in by_callable:
+                ordered.sort()
+        report = {}
+        for i, name in enumerate(names):
+            ordered = by_callable[i]
+            count = int(calls[i])
+            report[name] = CallableReport(
+                count,
+                int(errors[i]),
+                int(errors[i]) / count if count else 0.0,
+                _percentile(ordered, 50),
+                _percentile(ordered, 90),
+                _percentile(ordered, 99),
+                ordered[-1] if ordered else 0.0,
+                unfinished[i],
+            )
+        return report
+
+    def to_npy(self, directory: str) -> None:
+        """Write each column to `<column>.npy` in `directory`, and the
+        callables, one per line, to `callables.txt`."""
+        os.makedirs(directory, exist_ok=True)
+        for name, column in self.columns().items():
+            path = os.path.join(directory, f"{name}.npy")
+            if self.use_numpy:
+                numpy.save(path, column)
+            else:
+                _write_npy(path, column)
+        with open(os.path.join(directory, "callables.txt"), "w", encoding="utf-8") as f:
+            f.writelines(name + "\n" for name in list(self.callables))
+
+    def to_csv(self, path: str) -> None:
+        """Write the events to a CSV file, with the names of their
+        callable and event, and their couplet as a UUID."""
+        columns = self.columns()
+        callables = list(self.callables)
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["time", "duration", "callable", "event", "couplet"])
+            for created, duration, name_id, event, high, low in zip(*columns.values()):
+                key = (int(high) << 64) | int(low)
+                writer.writerow(
+                    [
+                        repr(float(created)),
+                        "" if math.isnan(duration) else repr(float(duration)),
+                        callables[name_id],
+                        EVENTS[event],
+                        uuid.UUID(int=key) if key else "",
+                    ]
+                )
+
+    def after_fork_in_child(self) -> None:
+        """Keep only the child's events."""
+        self._clear()
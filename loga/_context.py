@@ -0,0 +1,55 @@
+"""Log data bound to the current context, for all logs made in it."""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Mapping
+from contextvars import ContextVar, Token
+from types import MappingProxyType
+from typing import Any
+
+_EMPTY: Mapping[str, str] = MappingProxyType({})
+
+
+class Binding:
+    """Unbind the fields of a `bind` when used as a context manager."""
+
+    __slots__ = ("_var", "_token")
+
+    def __init__(self, var: ContextVar[Mapping[str, str]], token: Token) -> None:
+        self._var = var
+        self._token = token
+
+    def __enter__(self) -> Binding:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._var.reset(self._token)
+
+
+class BoundFields:
+    """Fields bound in a context variable, so that each thread and
+    asyncio task sees the fields bound in its own context, and those
+    inherited from where it was started.
+
+    The bound fields are an immutable mapping replaced on each bind, so
+    getting them for a log costs a context variable lookup.
+    """
+
+    def __init__(self, name: str) -> None:
+        self._var: ContextVar[Mapping[str, str]] = ContextVar(name, default=_EMPTY)
+
+    def get(self) -> Mapping[str, str]:
+        return self._var.get()
+
+    def bind(self, fields: Mapping[str, str]) -> Binding:
+        token = self._var.set(MappingProxyType({**self._var.get(), **fields}))
+        return Binding(self._var, token)
+
+    def unbind(self, keys: Iterable[str]) -> None:
+        unbound = set(keys)
+        bound = self._var.get()
+        self._var.set(MappingProxyType({k: v for k, v in bound.items() if k not in unbound}))
+
+    def use(self, fields: Mapping[str, str]) -> Binding:
+        """Bind exactly `fields`, as bound at another time."""
+        return Binding(self._var, self._var.set(fields))
@@ -0,0 +1,81 @@
+"""Keeping loga usable in processes forked from a process using it.
+
+A forked child inherits the open files, sockets and locks of its
+parent, but none of its threads. Loga instances flush their handlers
+before a fork, and reinitialise their state in the child, so that
+children don't duplicate the parent's buffered logs, share its sockets
+or wait for locks held by threads that don't exist.
+
+Caches are deliberately kept, so that representations and decoration
+state built in a prefork server's master are shared copy-on-write by
+its workers.
+"""
+
+from __future__ import annotations
+
+import logging
+import logging.handlers
+import os
+import sys
+import traceback
+from typing import Any
+import weakref
+
+_instances: weakref.WeakSet[Any] = weakref.WeakSet()
+
+
+def register(loga: Any) -> None:
+    """Call `loga._before_fork()` before, and `loga._after_fork_in_child()`
+    after each fork of this process."""
+    _instances.add(loga)
+
+
+def reinit_handler(handler: logging.Handler) -> None:
+    """Make a handler inherited from a parent process safe to use.
+
+    Handlers can define their own `after_fork_in_child` method. The
+    stdlib logging module already reinitialises the locks of all
+    handlers.
+    """
+    after_fork_in_child = getattr(handler, "after_fork_in_child", None)
+    if after_fork_in_child is not None:
+        after_fork_in_child()
+    # Covers DatagramHandler, and therefore graypy's handlers too
+    elif isinstance(handler, logging.handlers.SocketHandler):
+        if handler.sock is not None:
+            handler.sock.close()
+            handler.sock = None
+    elif isinstance(handler, logging.FileHandler):
+        # The stream was flushed before the fork, so closing the
+        # child's copy of it doesn't write anything
+        if handler.stream is not None:
+            handler.stream.close()
+            handler.stream = None
+
+
+def _report_hook_error() -> None:
+    # Raising from a fork hook is ignored, and logging the error could
+    # fail the same way, so print it like logging's `handleError` does
+    sys.stderr.write("--- Loga error in fork hook ---\n")
+    traceback.print_exc(file=sys.stderr)
+
+
+def _before_fork() -> None:
+    for loga in list(_instances):
+        try:
+            loga._before_fork()
+        except Exception:
+            _report_hook_error()
+
+
+def _after_fork_in_child() -> None:
+    for loga in list(_instances):
+        try:
+            loga._after_fork_in_child()
+        except Exception:
+            _report_hook_error()
+
+
+# Not available on Windows, where processes are never forked
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(before=_before_fork, after_in_child=_after_fork_in_child)
@@ -0,0 +1,299 @@
+"""A sidecar index of log files, for fetching records without reading
+the whole file.
+
+For each record, the index file (`<logfile>.idx`) has a fixed-size
+entry with its byte offset and length in the log file, its time in
+whole seconds, its level, and the couplet and callable of decorated
+call logs. Callable names are stored once, one per line, in
+`<logfile>.idx.names`, and referred to by line number in the entries.
+
+Entries are in the order records were written, which is nearly, but
+not exactly, their time order: e.g. the 'called' logs of slow calls
+are backdated. For time queries, `<logfile>.idx.times` has the time
+bucket and first entry of each run of consecutive entries in the same
+bucket, so that only the entries of the wanted buckets are read.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Generator
+import io
+import logging
+import mmap
+import os
+import struct
+import uuid
+
+INDEX_SUFFIX = ".idx"
+NAMES_SUFFIX = ".idx.names"
+TIMES_SUFFIX = ".idx.times"
+# offset, length, time, level, couplet, callable (0 for none)
+ENTRY = struct.Struct("<QIIB16sI")
+# Seconds in each time bucket
+TIME_BUCKET = 60
+# time bucket, number of the first entry of the run
+TIME_RUN = struct.Struct("<IQ")
+_COUPLET_OFFSET = 17
+_NO_COUPLET = bytes(16)
+
+
+class IndexedFileHandler(logging.FileHandler):
+    """A file handler that indexes the records it writes.
+
+    Like `FileHandler`, each record is written to the file as soon as it
+    is handled, by a single appending write, and its offset is taken
+    from the end of the file after it. Other processes can therefore
+    append to the file too, e.g. forked children, whose records aren't
+    indexed. The index itself is flushed by `flush()`, and when a record
+    of `flush_level` or higher is handled.
+    """
+
+    def __init__(
+        self, filename: str, delay: bool = False, flush_level: int = logging.ERROR
+    ) -> None:
+        self.flush_level = flush_level
+        self._indexing = True
+        self._names: dict[str, int] = {}
+        self._index_file: io.BufferedWriter | None = None
+        self._names_file: io.TextIOWrapper | None = None
+        self._times_file: io.BufferedWriter | None = None
+        self._entry_count = 0
+        self._last_bucket: int | None = None
+        # The offsets are in bytes, so the encoding must be known to readers
+        super().__init__(filename, encoding="utf-8", delay=delay)
+
+    def _open(self) -> io.TextIOWrapper:
+        stream = super()._open()
+        if self._indexing:
+            names_path = self.baseFilename + NAMES_SUFFIX
+            index_path = self.baseFilename + INDEX_SUFFIX
+            times_path = self.baseFilename + TIMES_SUFFIX
+            # Starts a new run with the next entry
+            self._last_bucket = None
+            if os.fstat(stream.fileno()).st_size:
+                self._names_file = open(names_path, "a+", encoding="utf-8")
+                self._names_file.seek(0)
+                self._names = {line.rstrip("\n"): i for i, line in enumerate(self._names_file, 1)}
+                self._index_file = open(index_path, "ab")
+                self._entry_count = self._index_file.tell() // ENTRY.size
+                self._times_file = open(times_path, "ab")
+                _drop_runs_after(self._times_file, self._entry_count)
+            else:
+                # A new log file makes the index of an old one meaningless
+                self._names_file = open(names_path, "w", encoding="utf-8")
+                self._names = {}
+                self._index_file = open(index_path, "wb")
+                self._entry_count = 0
+                self._times_file = open(times_path, "wb")
+        return stream
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+            data = (self.format(record) + self.terminator).encode("utf-8")
+            # Bypasses the stream's buffers, which are never written to
+            fd = self.stream.fileno()
+            written = os.write(fd, data)
+            # An appending write leaves the position at the end of what it wrote
+            offset = os.lseek(fd, 0, os.SEEK_CUR) - written
+            while written < len(data):
+                written += os.write(fd, data[written:])
+            if self._index_file is not None:
+                self._index_file.write(self._entry(record, offset, len(data)))
+                self._count_entry(record)
+                if record.levelno >= self.flush_level:
+                    self._flush_index()
+        except Exception:
+            self.handleError(record)
+
+    def _entry(self, record: logging.LogRecord, offset: int, length: int) -> bytes:
+        couplet = getattr(record, "couplet", None)
+        name = getattr(record, "callable", None)
+        name_id = 0
+        if isinstance(name, str) and "\n" not in name:
+            name_id = self._names.get(name, 0)
+            if not name_id:
+                name_id = self._names[name] = len(self._names) + 1
+                self._names_file.write(name + "\n")  # type: ignore[union-attr]
+        return ENTRY.pack(
+            offset,
+            length,
+            int(record.created),
+            min(record.levelno, 255),
+            couplet.bytes if isinstance(couplet, uuid.UUID) else _NO_COUPLET,
+            name_id,
+        )
+
+    def _count_entry(self, record: logging.LogRecord) -> None:
+        bucket = int(record.created) // TIME_BUCKET
+        if bucket != self._last_bucket:
+            self._times_file.write(  # type: ignore[union-attr]
+                TIME_RUN.pack(bucket, self._entry_count)
+            )
+            self._last_bucket = bucket
+        self._entry_count += 1
+
+    def _flush_index(self) -> None:
+        # Names and runs first, so that readers know the names and time
+        # buckets of all entries
+        for f in (self._names_file, self._times_file, self._index_file):
+            if f is not None:
+                f.flush()
+
+    def flush(self) -> None:
+        self.acquire()
+        try:
+            super().flush()
+            self._flush_index()
+        finally:
+            self.release()
+
+    def _close_index(self) -> None:
+        for f in (self._names_file, self._times_file, self._index_file):
+            if f is not None:
+                f.close()
+        self._names_file = self._times_file = self._index_file = None
+
+    def close(self) -> None:
+        self.acquire()
+        try:
+            self._close_index()
+        finally:
+            self.release()
+        super().close()
+
+    def after_fork_in_child(self) -> None:
+        # Both processes now append to the same file, and only the
+        # parent's callable names are known
+        self._indexing = False
+        self._close_index()
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+
+def _drop_runs_after(times_file: io.BufferedWriter, count: int) -> None:
+    """Drop the runs of entries that never made it to the index, e.g.
+    when the process was killed after the runs were flushed."""
+    with open(times_file.name, "rb") as f:
+        data = f.read()
+    end = len(data) - len(data) % TIME_RUN.size
+    while end and TIME_RUN.unpack_from(data, end - TIME_RUN.size)[1] >= count:
+        end -= TIME_RUN.size
+    if end < len(data):
+        times_file.truncate(end)
+
+
+def _time_ranges(
+    logfile: str, count: int, since: float | None, until: float | None
+) -> list[tuple[int, int]] | None:
+    """Return the ranges of entries in the time buckets between `since`
+    and `until`, or None if the index has no time buckets."""
+    try:
+        with open(logfile + TIMES_SUFFIX, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    runs = list(TIME_RUN.iter_unpack(data[: len(data) - len(data) % TIME_RUN.size]))
+    # E.g. an index started before time buckets were
+    if not runs or runs[0][1] != 0:
+        return None
+    first = None if since is None else int(since) // TIME_BUCKET
+    last = None if until is None else int(until) // TIME_BUCKET
+    ranges: list[tuple[int, int]] = []
+    for i, (bucket, start) in enumerate(runs):
+        if start >= count:
+            break
+        if (first is not None and bucket < first) or (last is not None and bucket > last):
+            continue
+        end = min(runs[i + 1][1], count) if i + 1 < len(runs) else count
+        if ranges and ranges[-1][1] == start:
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((start, end))
+    return ranges
+
+
+def _entries(
+    index: mmap.mmap, couplet: uuid.UUID | None, ranges: list[tuple[int, int]] | None
+) -> Generator[tuple, None, None]:
+    count = len(index) // ENTRY.size
+    if couplet is None:
+        view = memoryview(index)
+        for start, end in [(0, count)] if ranges is None else ranges:
+            yield from ENTRY.iter_unpack(view[start * ENTRY.size : end * ENTRY.size])
+        return
+    # Searching for the couplet's bytes is much faster than unpacking
+    # every entry
+    position = index.find(couplet.bytes)
+    while position != -1:
+        start = position - _COUPLET_OFFSET
+        if start % ENTRY.size == 0 and start + ENTRY.size <= count * ENTRY.size:
+            yield ENTRY.unpack_from(index, start)
+        position = index.find(couplet.bytes, position + 1)
+
+
+def query(
+    logfile: str,
+    *,
+    couplet: uuid.UUID | str | None = None,
+    callable_name: str | None = None,
+    level: int | None = None,
+    since: float | None = None,
+    until: float | None = None,
+    limit: int | None = None,
+) -> list[str]:
+    """Return the records of an indexed log file that match all the
+    given filters, in the order they were written.
+
+    `level` is the lowest level of the records, and `since` and `until`
+    are seconds since the epoch, compared to the second.
+    """
+    if isinstance(couplet, str):
+        couplet = uuid.UUID(couplet)
+    try:
+        with open(logfile + NAMES_SUFFIX, encoding="utf-8") as f:
+            names = [line.rstrip("\n") for line in f]
+    except FileNotFoundError:
+        return []
+    name_ids = None
+    if callable_name is not None:
+        name_ids = {i for i, name in enumerate(names, 1) if name == callable_name}
+        if not name_ids:
+            return []
+    try:
+        index_file = open(logfile + INDEX_SUFFIX, "rb")
+    except FileNotFoundError:
+        return []
+    matches = []
+    with index_file, open(logfile, "rb") as log:
+        if not os.fstat(index_file.fileno()).st_size:
+            return []
+        with mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ) as index:
+            count = len(index) // ENTRY.size
+            ranges = None
+            if couplet is None and (since is not None or until is not None):
+                ranges = _time_ranges(logfile, count, since, until)
+            entries = _entries(index, couplet, ranges)
+            for offset, length, created, levelno, _, name_id in entries:
+                if name_ids is not None and name_id not in name_ids:
+                    continue
+                if level is not None and levelno < level:
+                    continue
+                if since is not None and created < int(since):
+                    continue
+                if until is not None and created > until:
+                    continue
+                matches.append((offset, length))
+                if limit is not None and len(matches) >= limit:
+                    break
+            # Release the entries' view of the index before unmapping it
+            entries.close()
+        if not matches:
+            return []
+        with mmap.mmap(log.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return [
+                mm[offset : offset + length].decode("utf-8", "replace").rstrip("\n")
+                for offset, length in matches
+            ]
@@ -0,0 +1,68 @@
+"""Per-callable and per-module verbosity of decorated call logs."""
+
+from __future__ import annotations
+
+from fnmatch import fnmatchcase
+import logging
+
+# Overrides set at startup, e.g. "myapp.db.*=INFO,myapp.http.*=WARNING"
+LEVELS_ENV_VAR = "LOGA_LEVELS"
+
+
+def parse_level(level: int | str) -> int:
+    """Return the number of a level given by number or name."""
+    if isinstance(level, int):
+        return level
+    if level.strip().isdigit():
+        return int(level)
+    number = logging.getLevelName(level.strip().upper())
+    if not isinstance(number, int):
+        raise ValueError(f"Unknown log level {level!r}")
+    return number
+
+
+def parse_levels(spec: str) -> dict[str, int]:
+    """Parse comma separated `pattern=level` overrides."""
+    levels = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        pattern, sep, level = item.rpartition("=")
+        if not sep or not pattern.strip():
+            raise ValueError(f"Log level override {item!r} is not of the form pattern=level")
+        levels[pattern.strip()] = parse_level(level)
+    return levels
+
+
+class LevelOverrides:
+    """The levels below which the 'called' and 'returned' logs of
+    decorated callables aren't made, by pattern of their
+    `module.qualname`, e.g. "myapp.db.*". The longest matching pattern
+    wins.
+
+    Each change increments `generation`, so that decorated callables
+    can cache their decision and only match the patterns again after a
+    change.
+    """
+
+    def __init__(self, levels: dict[str, int] | None = None) -> None:
+        self._levels = dict(levels or {})
+        self.generation = 0
+
+    def set(self, pattern: str, level: int | None) -> None:  # noqa: A003
+        """Override the level of callables matching `pattern`, or remove
+        the override if `level` is None."""
+        if level is None:
+            self._levels.pop(pattern, None)
+        else:
+            self._levels[pattern] = level
+        self.generation += 1
+
+    def threshold(self, name: str, default: int) -> int:
+        """Return the level of the longest pattern matching `name`, or
+        `default` if none does."""
+        levels = dict(self._levels)
+        matching = [pattern for pattern in levels if fnmatchcase(name, pattern)]
+        if not matching:
+            return default
+        return levels[max(matching, key=len)]
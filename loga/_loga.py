@@ -4,20 +4,42 @@
 
 from __future__ import annotations
 
-from collections.abc import Callable, Generator, Mapping, Set
+from collections.abc import Callable, Generator, Mapping, Sequence, Set
 from contextlib import contextmanager
-from functools import wraps
+from functools import partial, wraps
 import inspect
+import json
 import logging
 import os
 import pathlib
+import string
 import sys
 import time
 import traceback
 from types import MappingProxyType
-from typing import Any, Literal, TypedDict, TypeVar
+from typing import Any, Literal, TypedDict, TypeVar, overload
 import uuid
 
+from . import _binary, _columns, _fork, _index
+from ._budget import BudgetUnit, EventBudget
+from ._buffered import BufferedStreamHandler
+from ._columns import EventStore
+from ._context import Binding, BoundFields
+from ._levels import LEVELS_ENV_VAR, LevelOverrides, parse_level, parse_levels
+from ._memo import ReprCache, ReprCacheInfo
+from ._metrics import DEFAULT_BUCKETS, CallMetrics, MetricsServer
+from ._multiprocess import Address, AggregatorHandler, AggregatorServer
+from ._overhead import OverheadMeter, OverheadStats, OverheadSample
+from ._profile import ProfileStats, StackProfiler
+from ._recorder import FlightRecorder, RecordedCall, RecordedEvent
+from ._repeats import RepeatSuppressor
+from ._represent import BUILTIN_REPRESENTERS, Representer, RepresentedType, Representers
+from ._shared import SharedCallMetrics
+from ._sinks import OverflowPolicy, QueuedSink, SinkStats
+from ._throttle import TalkerStats, Throttle
+from ._trace import ChromeTraceWriter
+from ._unix import SocketType, UnixSocketHandler
+
 # you don't need graylog installed
 try:
     import graypy
@@ -47,6 +69,8 @@ OBSCURED_STRING = "********"
 # Callables with an attribute of this name set to True will not be logged by loga
 NO_LOGS_ATTR_NAME = "_do_not_log_this_callable"
 DATE_FORMAT = "%Y-%m-%d %H:%M:%S %Z"
+# Log data of this name overrides the creation time of the log record
+CREATED_ATTR_NAME = "_loga_created"
 
 # Make a dummy logging.LogRecord object, so that we can inspect what
 # attributes instances of that class have.
@@ -69,11 +93,15 @@ class Formatters(TypedDict, total=False):
     params: str
 
     decorated: bool
+    event: CallableEvent
     couplet: uuid.UUID
     number_of_params: int
     timestamp: str
     log_level: int
 
+    # Only available if a slow_threshold is configured
+    duration: float
+
     # Only available if 'errored'
     traceback: str
     exception_type: str
@@ -84,6 +112,29 @@ class Formatters(TypedDict, total=False):
     return_type: str
 
 
+# Fields of decorated call logs that are computed only if used
+COSTLY_FIELDS = frozenset(
+    {
+        "params",
+        "call_signature",
+        "couplet",
+        "timestamp",
+        "return_value",
+        "exception_msg",
+        "traceback",
+    }
+)
+
+
+def _template_fields(template: str) -> set[str]:
+    """Return the names of the fields used in a message form."""
+    fields = set()
+    for _, field_name, _, _ in string.Formatter().parse(template):
+        if field_name:
+            fields.add(field_name.split(".", 1)[0].split("[", 1)[0])
+    return fields
+
+
 class LocalLogFormatter(logging.Formatter):
     """Formatter for file logs and stdout logs."""
 
@@ -98,6 +149,32 @@ class LocalLogFormatter(logging.Formatter):
         return msg
 
 
+class JsonLogFormatter(logging.Formatter):
+    """Formatter for structured file logs: one JSON object per line, with
+    the time, level, message and log data of the record."""
+
+    def format(self, record: logging.LogRecord) -> str:  # noqa: A003
+        data = {"time": record.created, "level": record.levelno, "message": record.getMessage()}
+        for key, value in vars(record).items():
+            if key not in LOG_RECORD_ATTRS and key not in {"message", "asctime"}:
+                data[key] = value
+        return json.dumps(data, default=str)
+
+
+class BackdateFilter(logging.Filter):
+    """Set the creation time of records made for deferred 'called' logs
+    to when the call started."""
+
+    def filter(self, record: logging.LogRecord) -> bool:  # noqa: A003
+        created = record.__dict__.pop(CREATED_ATTR_NAME, None)
+        if created is not None:
+            shift = record.created - created
+            record.created = created
+            record.msecs = (created - int(created)) * 1000
+            record.relativeCreated -= shift * 1000
+        return True
+
+
 class Loga:
     """A class for logging."""
 
@@ -111,14 +188,50 @@ class Loga:
         facility: str = "loga",
         graylog_address: tuple[str, int] | None = None,
         do_print: bool = False,
+        print_buffer_size: int | None = None,
+        print_flush_interval: float = 0.1,
         do_write: bool = False,
         truncation: int = 7500,
         msg_truncation: int = 7500,
         trace_truncation: int = 15000,
         raise_logging_errors: bool = True,
         logfile: str = "./logs/logs.txt",
+        logfile_format: Literal["text", "json", "binary"] = "text",
+        logfile_index: bool = False,
         private_data: Set[str] = frozenset(),
         log_if_graylog_disabled: bool = True,
+        repeat_window: float | None = None,
+        repeat_max_keys: int = 1024,
+        representers: Mapping[RepresentedType, Representer] = EMPTY_MAP,
+        repr_cache_size: int = 0,
+        aggregator_address: Address | None = None,
+        trace_file: str | None = None,
+        profile_file: str | None = None,
+        profile_interval: float = 60.0,
+        slow_threshold: float | None = None,
+        flight_recorder_size: int = 0,
+        collect_metrics: bool = False,
+        metrics_buckets: Sequence[float] = DEFAULT_BUCKETS,
+        sink_queue_size: int = 0,
+        sink_overflow: OverflowPolicy = "drop_oldest",
+        overhead_sample_rate: float = 0.0,
+        log_fields: Set[str] | None = None,
+        event_budget: int | None = None,
+        event_budget_unit: BudgetUnit = "characters",
+        throttle_rate: float | None = None,
+        throttle_callsite_rate: float | None = None,
+        throttle_burst: float = 1.0,
+        throttle_notice_interval: float = 60.0,
+        shared_metrics: str | None = None,
+        shared_metrics_slots: int = 256,
+        shared_metrics_processes: int = 64,
+        levels: Mapping[str, int | str] | None = None,
+        event_store: bool = False,
+        event_store_chunk_size: int = 65536,
+        event_store_max_open: int = 65536,
+        unix_socket: str | None = None,
+        unix_socket_type: SocketType = "stream",
+        unix_socket_buffer_size: int = 4 << 20,
     ) -> None:
         """Initializes a Loga object.
 
@@ -128,7 +241,16 @@ class Loga:
         - graylog_address: A tuple (ip, port). Address for graylog.
         - logfile: path to a file to which logs will be written
         - do_print: print logs to console
+        - print_buffer_size: buffer up to this many characters of printed logs
+            and write them to stdout together, rather than one log at a time.
+            Error logs are written right away
+        - print_flush_interval: most seconds printed logs stay buffered
         - do_write: write logs to file
+        - logfile_format: "text" for tab separated time, message and level, or
+            "json" for one JSON object per line, including the log data, or
+            "binary" for a compact binary format, read with `python -m loga convert`
+        - logfile_index: keep an index of the records in the log file by
+            couplet, callable, level and time, for `query()`
         - truncation: truncate value of log data fields to this length
         - msg_truncation: truncate value of log messages to this length
         - trace_truncation: truncate value of log data fields "trace" and "traceback"
@@ -137,6 +259,84 @@ class Loga:
         - raise_logging_errors: should stdlib `log` call errors be suppressed or no?
         - log_if_graylog_disabled: boolean value, should a warning log be made when
             failing to connect to graylog
+        - repeat_window: if set, identical events within this many seconds
+            are counted instead of logged, and a single "repeated N times"
+            log is made when the window closes
+        - repeat_max_keys: maximum number of distinct events tracked for
+            `repeat_window`
+        - representers: a mapping of types (or dotted paths to types, e.g.
+            "numpy.ndarray") to functions that make the string representation
+            of their instances in parameters and return values
+        - repr_cache_size: if set, cache the representations of large
+            immutable parameters (strings, bytes, and tuples and frozensets
+            of those), using at most this many bytes of memory
+        - aggregator_address: send logs to a loga instance in another process
+            that has called `start_aggregator`, instead of writing, printing
+            or sending them to graylog in this process
+        - trace_file: path to a file to which decorated calls will be written
+            in Chrome Trace Event format, for viewing in chrome://tracing or Perfetto
+        - profile_file: path to a file to which the time spent in decorated
+            calls will be written as folded stacks, for making flame graphs
+        - profile_interval: minimum time, in seconds, between rewrites of
+            `profile_file` after top-level decorated calls
+        - slow_threshold: if set, only log calls of decorated callables that
+            take at least this many seconds, or raise. Can be overridden per
+            callable with `@loga(slow_threshold=...)`
+        - flight_recorder_size: if set, keep the last this many 'called' and
+            'returned' events of each thread in memory instead of logging them,
+            and only log them before an 'errored' log in the same thread, or
+            on `dump()`
+        - collect_metrics: count the calls, errors and durations of decorated
+            callables, for `metrics()` and `serve_metrics()`
+        - metrics_buckets: upper bounds, in seconds, of the buckets of the
+            call duration histograms
+        - sink_queue_size: if set, give each sink (file, stdout, graylog, or
+            added with `add_sink`) a queue of this many records, handled by a
+            worker thread of its own, so that a slow sink doesn't hold up logging
+            or the other sinks
+        - sink_overflow: what to do when a sink's queue is full: "drop_oldest"
+            or "drop_newest" record, or "block" until there is space
+        - overhead_sample_rate: if set, measure the time loga spends on this
+            fraction of decorated calls, for `overhead_report()`
+        - log_fields: if set, only these `Formatters` fields are added to the
+            log data of decorated calls, besides their parameters, and costly
+            fields that neither the messages nor the log data use aren't computed
+        - event_budget: if set, the most characters (or bytes) the message and
+            log data of each log may take, shared fairly between them by cutting
+            the largest values, e.g. to fit each log in a single GELF datagram
+        - event_budget_unit: "characters" or UTF-8 "bytes"
+        - throttle_rate: if set, the most logs per second made by all decorated
+            callables and manual log call sites together
+        - throttle_callsite_rate: if set, the most logs per second made by
+            each decorated callable or manual log call site
+        - throttle_burst: seconds worth of logs that can be made at once
+            before being throttled
+        - throttle_notice_interval: seconds between the "*Throttled N events
+            from X" logs of each throttled call site
+        - shared_metrics: if set, the name of a shared memory segment in which
+            to count the calls, errors and durations of decorated callables
+            instead, so that `metrics()` returns the counts of all processes
+            using it, e.g. all workers of a prefork server
+        - shared_metrics_slots: the most callables and exception types
+            counted in `shared_metrics`
+        - shared_metrics_processes: the most processes counting in
+            `shared_metrics` at once
+        - levels: levels below which the 'called' and 'returned' logs of
+            decorated callables aren't made, by pattern of their
+            `module.qualname`, e.g. {"myapp.db.*": logging.INFO}. Overridden
+            by the LOGA_LEVELS environment variable, e.g.
+            "myapp.db.*=INFO,myapp.http.*=WARNING", and by `set_level()`
+        - event_store: keep the time, duration, callable, event and couplet of
+            decorated call logs in memory, in columns, for `events()`
+        - event_store_chunk_size: number of events by which the columns of
+            `event_store` grow
+        - event_store_max_open: maximum number of calls whose 'called' event
+            `event_store` keeps, to pair with the event ending them
+        - unix_socket: path to a Unix domain socket to which logs will be sent
+            as length-prefixed JSON objects, e.g. for a log shipping sidecar
+        - unix_socket_type: "stream" or "datagram"
+        - unix_socket_buffer_size: the most bytes of logs kept while the
+            socket can't take them, after which the oldest are dropped
         """
         self._stopped = False
         self._allow_errors = True
@@ -146,48 +346,168 @@ class Loga:
             "returned_none": self._best_returned_none(returned, returned_none),
             "errored": errored,
         }
+        if log_fields is not None and event_store:
+            log_fields = {*log_fields, *_columns.FIELDS}
+        self._log_fields = None if log_fields is None else frozenset(log_fields) | {"decorated"}
+        used_fields = set(COSTLY_FIELDS if log_fields is None else log_fields)
+        for form in self._msg_forms.values():
+            if form:
+                used_fields |= _template_fields(form)
+        if trace_file:
+            used_fields.add("params")
+        # The costly fields to compute for decorated call logs
+        self._fields = COSTLY_FIELDS & used_fields
         self._truncation = truncation
+        self._budget = EventBudget(event_budget, event_budget_unit) if event_budget else None
         self._msg_truncation = msg_truncation
         self._trace_truncation = trace_truncation
         self._raise_logging_errors = raise_logging_errors
         self._private_data = private_data
+        self._representers = Representers({**BUILTIN_REPRESENTERS, **representers})
+        self._repr_cache = ReprCache(repr_cache_size) if repr_cache_size else None
+        self._slow_threshold = slow_threshold
+        self._levels = LevelOverrides(
+            {
+                **{pattern: parse_level(level) for pattern, level in (levels or {}).items()},
+                **parse_levels(os.environ.get(LEVELS_ENV_VAR, "")),
+            }
+        )
+        self._profiler = StackProfiler(profile_file, profile_interval) if profile_file else None
+        self._tracer = ChromeTraceWriter(trace_file) if trace_file else None
+        self._recorder = FlightRecorder(flight_recorder_size) if flight_recorder_size else None
+        self._metrics: CallMetrics | None = None
+        if shared_metrics is not None:
+            self._metrics = SharedCallMetrics(
+                shared_metrics, metrics_buckets, shared_metrics_slots, shared_metrics_processes
+            )
+        elif collect_metrics:
+            self._metrics = CallMetrics(metrics_buckets)
+        self._metrics_server: MetricsServer | None = None
+        self._overhead = OverheadMeter(overhead_sample_rate) if overhead_sample_rate else None
         self._logger = logging.getLogger(facility)
         self._logger.setLevel(LOG_THRESHOLD)
+        if not any(isinstance(f, BackdateFilter) for f in self._logger.filters):
+            self._logger.addFilter(BackdateFilter())
+        self._repeats = (
+            RepeatSuppressor(repeat_window, repeat_max_keys, self._log_repeated)
+            if repeat_window
+            else None
+        )
+        self._throttle = (
+            Throttle(
+                throttle_rate,
+                throttle_callsite_rate,
+                throttle_burst,
+                throttle_notice_interval,
+                self._log_throttled,
+            )
+            if throttle_rate or throttle_callsite_rate
+            else None
+        )
+        self._sink_queue_size = sink_queue_size
+        self._sink_overflow = sink_overflow
+        self._handlers: list[logging.Handler] = []
+        self._sinks: dict[str, QueuedSink] = {}
+        self._aggregator: AggregatorServer | None = None
+        self._indexed_logfile: str | None = None
+        self._event_store = (
+            EventStore(event_store_chunk_size, max_open=event_store_max_open)
+            if event_store
+            else None
+        )
+        self._bound = BoundFields("loga_bound")
+
+        _fork.register(self)
+
+        if aggregator_address is not None:
+            self.connect_aggregator(aggregator_address)
+            return
 
         if do_write:
             logfile = os.path.abspath(os.path.expanduser(logfile))
             # create the directory where logs are stored if it does not exist yet
             pathlib.Path(os.path.dirname(logfile)).mkdir(parents=True, exist_ok=True)
-            file_handler = logging.FileHandler(logfile, delay=True)
-            file_handler.setFormatter(LocalLogFormatter())
-            self._logger.addHandler(file_handler)
+            if logfile_format == "binary":
+                if logfile_index:
+                    raise ValueError("Binary log files can't be indexed")
+                file_handler: logging.FileHandler = _binary.BinaryFileHandler(logfile, delay=True)
+            elif logfile_index:
+                file_handler = _index.IndexedFileHandler(logfile, delay=True)
+                self._indexed_logfile = logfile
+            else:
+                file_handler = logging.FileHandler(logfile, delay=True)
+            if logfile_format == "json":
+                file_handler.setFormatter(JsonLogFormatter())
+            elif logfile_format == "text":
+                file_handler.setFormatter(LocalLogFormatter())
+            elif logfile_format != "binary":
+                raise ValueError(f"Unknown logfile format {logfile_format!r}")
+            self._add_handler(file_handler, "file")
 
         if do_print:
-            print_handler = logging.StreamHandler(sys.stdout)
+            print_handler: logging.Handler
+            if print_buffer_size is None:
+                print_handler = logging.StreamHandler(sys.stdout)
+            else:
+                print_handler = BufferedStreamHandler(
+                    sys.stdout, print_buffer_size, print_flush_interval
+                )
             print_handler.setFormatter(LocalLogFormatter())
-            self._logger.addHandler(print_handler)
+            self._add_handler(print_handler, "stdout")
+
+        if unix_socket is not None:
+            socket_handler = UnixSocketHandler(
+                unix_socket, unix_socket_type, buffer_size=unix_socket_buffer_size
+            )
+            socket_handler.setFormatter(JsonLogFormatter())
+            self._add_handler(socket_handler, "unix_socket")
+
+        if self._event_store is not None:
+            self._add_handler(self._event_store, "events")
 
         self._add_graylog_handler(graylog_address, log_if_disabled=log_if_graylog_disabled)
 
+    @overload
     def __call__(self, class_or_func: CallableOrType) -> CallableOrType:
+        ...
+
+    @overload
+    def __call__(
+        self, *, slow_threshold: float | None = None, level: int | str = LOG_LEVEL
+    ) -> Callable[[CallableOrType], CallableOrType]:
+        ...
+
+    def __call__(
+        self,
+        class_or_func: Any = None,
+        *,
+        slow_threshold: float | None = None,
+        level: int | str = LOG_LEVEL,
+    ) -> Any:
         """Make Loga object itself a decorator.
 
         Allow decorating either a class or a method/function, so @loga
-        can be used on both classes and functions.
+        can be used on both classes and functions. Options for the
+        decorated callables can be given with @loga(option=value).
         """
+        level = parse_level(level)
+        if class_or_func is None:
+            return partial(self.__call__, slow_threshold=slow_threshold, level=level)
         if isinstance(class_or_func, type):
-            return self._decorate_all_methods(class_or_func)
+            return self._decorate_all_methods(
+                class_or_func, slow_threshold=slow_threshold, level=level
+            )
         if self._can_decorate(class_or_func):
-            return self._logme(class_or_func)
+            return self._logme(class_or_func, slow_threshold=slow_threshold, level=level)
         return class_or_func
 
     @staticmethod
-    def _get_timestamp() -> str:
-        """Return current time as a string.
+    def _get_timestamp(seconds: float | None = None) -> str:
+        """Return current time, or `seconds` since the epoch, as a string.
 
         Formatted as follows: "2019-07-17 09:35:06 CEST".
         """
-        return time.strftime(DATE_FORMAT, time.localtime())
+        return time.strftime(DATE_FORMAT, time.localtime(seconds))
 
     @staticmethod
     def _best_returned_none(returned: str | None, returned_none: str | None) -> str | None:
@@ -222,12 +542,20 @@ class Loga:
             return False
         return True
 
-    def _decorate_all_methods(self, cls: type, just_errors: bool = False) -> type:
+    def _decorate_all_methods(
+        self,
+        cls: type,
+        just_errors: bool = False,
+        slow_threshold: float | None = None,
+        level: int = LOG_LEVEL,
+    ) -> type:
         """Decorate all viable methods in a class."""
         members = inspect.getmembers(cls)
         members = [(k, v) for k, v in members if callable(v) and self._can_decorate(v, name=k)]
         for name, candidate in members:
-            deco = self._logme(candidate, just_errors=just_errors)
+            deco = self._logme(
+                candidate, just_errors=just_errors, slow_threshold=slow_threshold, level=level
+            )
             # somehow, decorating classmethods as staticmethods is the only way
             # to make everything work properly. we should find out why, some day
             if isinstance(vars(cls)[name], (staticmethod, classmethod)):
@@ -267,6 +595,15 @@ class Loga:
         self._stopped = False
         self._allow_errors = allow_errors
 
+    def set_level(self, pattern: str, level: int | str | None) -> None:
+        """Only make the 'called' and 'returned' logs of decorated
+        callables whose `module.qualname` matches `pattern` (e.g.
+        "myapp.db.*") if they are made at `level` or above. Errors are
+        still logged. The longest matching pattern wins. A `level` of
+        None removes the override.
+        """
+        self._levels.set(pattern, None if level is None else parse_level(level))
+
     @staticmethod
     def ignore(function: Callable) -> Callable:
         """A decorator that will override Loga class decorator.
@@ -285,16 +622,38 @@ class Loga:
             return self._decorate_all_methods(class_or_func, just_errors=True)
         return self._logme(class_or_func, just_errors=True)
 
-    def _logme(self, function: Callable, just_errors: bool = False) -> Callable:
+    def _logme(
+        self,
+        function: Callable,
+        just_errors: bool = False,
+        slow_threshold: float | None = None,
+        level: int = LOG_LEVEL,
+    ) -> Callable:
         """A decorator for automated input/output logging.
 
         Used by @loga and @loga.errors decorators. Makes a log when a
         callable is called, returns, or raises. If `just_errors` is
-        True, only logs when a callable raises.
+        True, only logs when a callable raises. If `slow_threshold`
+        (or the instance's `slow_threshold`) is set, the 'called' log
+        is deferred until the callable raises or has been running for
+        at least that many seconds. With `just_errors`, the arguments
+        are only kept by reference, and represented if the callable
+        raises, so that successful calls cost next to nothing. If the
+        flight recorder is enabled,
+        the 'called' and 'returned' events are recorded instead, and
+        logged before the 'errored' log of a later error.
+
+        Logs are made at `level`. If it is below the level set for the
+        callable with `set_level`, calls are handled as with
+        `just_errors`. That decision is cached until the levels change.
         """
         # if logging has been turned off, just do nothing
         if getattr(function, NO_LOGS_ATTR_NAME, False):
             return function
+        qualname = getattr(function, "__qualname__", "unknown_callable")
+        name = f"{getattr(function, '__module__', None)}.{qualname}"
+        # The generation of the levels, and whether calls are then logged
+        decision = [(-1, True)]
 
         @wraps(function)
         def full_decoration(*args: Any, **kwargs: Any) -> Any:
@@ -304,48 +663,213 @@ class Loga:
             it. If it errors, log the error. If it doesn't, log the
             return value.
             """
-            bound = self._params_to_dict(function, *args, **kwargs)
-            if bound is None:
-                self.warning(
-                    "Failed getting function signature, "
-                    "or coupling arguments with signature's parameters",
-                    extra={"callable_name": getattr(function, "__qualname__", "unknown_callable")},
+            generation, verbose = decision[0]
+            if generation != self._levels.generation:
+                generation = self._levels.generation
+                verbose = level >= self._levels.threshold(name, LOG_THRESHOLD)
+                decision[0] = generation, verbose
+            errors_only = just_errors or not verbose
+            threshold = self._slow_threshold if slow_threshold is None else slow_threshold
+            if errors_only:
+                threshold = None
+            recorder = None if errors_only or self._stopped else self._recorder
+            sample = None if self._overhead is None else self._overhead.sample(qualname)
+            call: tuple[Formatters, dict[str, str]] | None = None
+            recorded: RecordedCall | None = None
+            if recorder is not None:
+                # Only represented if logged
+                recorded = RecordedCall(
+                    function, args, kwargs, time.time(), self._bound.get(), level
                 )
-                return function(*args, **kwargs)
-
-            param_strings = self.sanitise(bound)
-            formatters = self._make_call_signature(function, param_strings)
-
-            # add more format strings
-            more = Formatters(
-                decorated=True,
-                couplet=uuid.uuid1(),
-                number_of_params=len(args) + len(kwargs),
-                timestamp=self._get_timestamp(),
-            )
-            formatters.update(more)
-
-            # 'called' log tells you what was called and with what arguments
-            if not just_errors:
-                self._generate_log("called", None, formatters, param_strings)
-
+                recorder.record(RecordedEvent("called", recorded, None, recorded.time))
+            elif threshold is not None:
+                # Fast calls only pay for this clock read
+                start = time.perf_counter()
+            elif not errors_only:
+                call = self._prepare_call(function, args, kwargs, sample=sample, level=level)
+                if call is None:
+                    return function(*args, **kwargs)
+                # 'called' log tells you what was called and with what arguments
+                self._generate_log("called", None, *call, sample=sample)
+
+            profiler = self._profiler
+            if profiler is not None:
+                profiler.enter(qualname)
+            observed = self._tracer is not None or self._metrics is not None
+            if observed:
+                call_start = time.perf_counter_ns()
             try:
-                # where the original function is actually run
-                response = function(*args, **kwargs)
+                try:
+                    # where the original function is actually run
+                    response = function(*args, **kwargs)
+                finally:
+                    if profiler is not None:
+                        profiler.exit()
             # handle any possible error in the original function
             except Exception as error:
-                formatters["traceback"] = traceback.format_exc()
-                self._generate_log("errored", error, formatters, param_strings)
+                if observed:
+                    self._observe_call(qualname, call_start, call, type(error).__name__)
+                trace = traceback.format_exc() if "traceback" in self._fields else None
+                if self._recorder is not None:
+                    self._log_recorded(self._recorder.take())
+                if recorded is not None:
+                    call = self._prepare_recorded(recorded)
+                    if call is None:
+                        raise
+                elif errors_only:
+                    # Represented as the arguments are now, after the call
+                    call = self._prepare_call(function, args, kwargs, sample=sample, level=level)
+                    if call is None:
+                        raise
+                elif call is None:
+                    call = self._log_deferred_call(function, args, kwargs, start, sample, level)
+                    if call is None:
+                        raise
+                formatters, param_strings = call
+                if trace is not None:
+                    formatters["traceback"] = trace
+                self._generate_log("errored", error, formatters, param_strings, sample=sample)
                 raise
-            where: CallableEvent = "returned_none" if response is None else "returned"
+            if observed:
+                self._observe_call(qualname, call_start, call)
+            if errors_only:
+                return response
+            where: CallableEvent
+            if recorder is not None and recorded is not None:
+                where = "returned_none" if response is None else "returned"
+                recorder.record(RecordedEvent(where, recorded, response, time.time()))
+                return response
+            if call is None:
+                if threshold is not None and time.perf_counter() - start < threshold:
+                    return response
+                call = self._log_deferred_call(function, args, kwargs, start, sample, level)
+                if call is None:
+                    return response
+            where = "returned_none" if response is None else "returned"
             # the successful return log
-            if not just_errors:
-                self._generate_log(where, response, formatters, param_strings)
+            self._generate_log(where, response, *call, sample=sample)
             # return whatever the original callable did
             return response
 
         return full_decoration
 
+    def _prepare_call(
+        self,
+        function: Callable,
+        args: tuple,
+        kwargs: dict,
+        start_time: float | None = None,
+        sample: OverheadSample | None = None,
+        level: int = LOG_LEVEL,
+    ) -> tuple[Formatters, dict[str, str]] | None:
+        """Make the format strings and sanitised parameters of a call,
+        whose logs are made at `level`.
+
+        Returns None, and logs a warning, if the arguments can't be
+        bound to the callable's parameters.
+        """
+        if sample is not None:
+            sample.restart()
+        bound = self._params_to_dict(function, *args, **kwargs)
+        if sample is not None:
+            sample.lap("bind")
+        if bound is None:
+            self.warning(
+                "Failed getting function signature, "
+                "or coupling arguments with signature's parameters",
+                extra={"callable_name": getattr(function, "__qualname__", "unknown_callable")},
+            )
+            return None
+
+        param_strings = self.sanitise(bound)
+        if sample is not None:
+            sample.lap("sanitise")
+        formatters = self._make_call_signature(function, param_strings, self._fields)
+
+        # add more format strings
+        formatters["decorated"] = True
+        formatters["number_of_params"] = len(args) + len(kwargs)
+        formatters["log_level"] = level
+        if "couplet" in self._fields:
+            formatters["couplet"] = uuid.uuid1()
+        if "timestamp" in self._fields:
+            formatters["timestamp"] = self._get_timestamp(start_time)
+        if sample is not None:
+            sample.lap("formatting")
+        return formatters, param_strings
+
+    def _log_deferred_call(
+        self,
+        function: Callable,
+        args: tuple,
+        kwargs: dict,
+        start: float,
+        sample: OverheadSample | None = None,
+        level: int = LOG_LEVEL,
+    ) -> tuple[Formatters, dict[str, str]] | None:
+        """Make the deferred 'called' log of a call that has finished.
+
+        `start` is the `time.perf_counter()` when the call started.
+        """
+        duration = time.perf_counter() - start
+        start_time = time.time() - duration
+        call = self._prepare_call(function, args, kwargs, start_time, sample, level)
+        if call is not None:
+            call[0]["duration"] = duration
+            self._generate_log("called", None, *call, created=start_time, sample=sample)
+        return call
+
+    def _observe_call(
+        self,
+        qualname: str,
+        start_ns: int,
+        call: tuple[Formatters, dict[str, str]] | None,
+        exception_type: str | None = None,
+    ) -> None:
+        """Pass a finished call to the tracer and metrics.
+
+        `start_ns` is the `time.perf_counter_ns()` when the call started.
+        """
+        end_ns = time.perf_counter_ns()
+        if self._tracer is not None:
+            params = None if call is None else call[0]["params"]
+            self._tracer.complete(qualname, start_ns, end_ns, params, exception_type)
+        if self._metrics is not None:
+            self._metrics.observe(qualname, (end_ns - start_ns) / 1e9, exception_type)
+
+    def _prepare_recorded(
+        self, recorded: RecordedCall
+    ) -> tuple[Formatters, dict[str, str]] | None:
+        """Make the format strings and sanitised parameters of a call kept
+        by the flight recorder, once for all of its events."""
+        if recorded.prepared is None:
+            recorded.prepared = self._prepare_call(
+                recorded.function,
+                recorded.args,
+                recorded.kwargs,
+                start_time=recorded.time,
+                level=recorded.level,
+            )
+        return recorded.prepared
+
+    def _log_recorded(self, events: list[RecordedEvent]) -> None:
+        """Log events taken from the flight recorder, timestamped with
+        when they happened."""
+        for event in events:
+            call = self._prepare_recorded(event.call)
+            if call is not None:
+                with self._bound.use(event.call.bound):
+                    self._generate_log(event.where, event.returned, *call, created=event.time)
+
+    def dump(self) -> None:
+        """Log the events kept by the flight recorder of every thread.
+
+        Requires `flight_recorder_size` to be configured.
+        """
+        if self._recorder is None:
+            raise RuntimeError("Flight recorder not enabled, configure a flight_recorder_size")
+        self._log_recorded(self._recorder.take_all())
+
     def _string_params(self, non_private_params: Mapping, use_repr: bool = True) -> dict[str, str]:
         """Turn every entry in log_data into truncated strings."""
         params = {}
@@ -355,24 +879,29 @@ class Loga:
             else:
                 truncation = self._truncation
             safe_key = self._force_string_and_truncate(key, 50, use_repr=False)
-            safe_val = self._force_string_and_truncate(val, truncation, use_repr=use_repr)
+            if use_repr and self._repr_cache is not None:
+                safe_val = self._repr_cache.represent(val, truncation, self._repr_and_truncate)
+            else:
+                safe_val = self._force_string_and_truncate(val, truncation, use_repr=use_repr)
             params[safe_key] = safe_val
         return params
 
     @staticmethod
-    def _make_call_signature(function: Callable, param_strings: Mapping[str, str]) -> Formatters:
+    def _make_call_signature(
+        function: Callable, param_strings: Mapping[str, str], fields: Set[str] = COSTLY_FIELDS
+    ) -> Formatters:
         """Represent the call as a string mimicking how it is written in
         Python.
 
         Return it within a dict containing some other format strings.
+        The parameters and call signature are only included if in `fields`.
         """
         signature = "{callable}({params})"
-        param_str = ", ".join(f"{k}={v}" for k, v in param_strings.items())
-        format_strings = Formatters(
-            callable=getattr(function, "__qualname__", "unknown_callable"),
-            params=param_str,
-        )
-        format_strings["call_signature"] = signature.format(**format_strings)
+        format_strings = Formatters(callable=getattr(function, "__qualname__", "unknown_callable"))
+        if "params" in fields or "call_signature" in fields:
+            format_strings["params"] = ", ".join(f"{k}={v}" for k, v in param_strings.items())
+        if "call_signature" in fields:
+            format_strings["call_signature"] = signature.format(**format_strings)
         return format_strings
 
     def listen_to(loga_self, facility: str) -> None:
@@ -435,12 +964,70 @@ class Loga:
                 out[key] = value
         return out
 
+    def register_representer(self, cls: RepresentedType, representer: Representer) -> None:
+        """Represent instances of `cls` in logs with `representer(obj)`
+        instead of `repr(obj)`.
+
+        `cls` can also be a dotted path to a type, e.g. "numpy.ndarray",
+        so that optional libraries need not be imported.
+        """
+        self._representers.register(cls, representer)
+        if self._repr_cache is not None:
+            self._repr_cache.clear()
+
+    def profile_stats(self) -> dict[str, ProfileStats]:
+        """Report the number of calls, total time and self time of each
+        decorated call path, keyed by semicolon separated `__qualname__`s.
+
+        Requires `profile_file` to be configured.
+        """
+        if self._profiler is None:
+            raise RuntimeError("Profiling not enabled, configure a profile_file")
+        return self._profiler.stats()
+
+    def metrics(self) -> str:
+        """Return the calls, errors and call durations of decorated
+        callables in OpenMetrics text format, as scraped by Prometheus.
+
+        Requires `collect_metrics` or `shared_metrics` to be configured.
+        """
+        if self._metrics is None:
+            raise RuntimeError("Metrics not enabled, configure collect_metrics")
+        return self._metrics.exposition()
+
+    def serve_metrics(self, host: str = "127.0.0.1", port: int = 0) -> tuple[str, int]:
+        """Serve `metrics()` over HTTP from a background thread, at
+        http://host:port/metrics.
+
+        Returns the address served at. If no port is given, a free one
+        is chosen.
+        """
+        if self._metrics is None:
+            raise RuntimeError("Metrics not enabled, configure collect_metrics")
+        if self._metrics_server is not None:
+            raise RuntimeError("Metrics already served")
+        self._metrics_server = MetricsServer(self._metrics, host, port)
+        return self._metrics_server.address
+
+    def overhead_report(self) -> dict[str, OverheadStats]:
+        """Report the mean time loga spent on each stage of the sampled calls
+        of each decorated callable, in seconds.
+
+        Requires `overhead_sample_rate` to be configured.
+        """
+        if self._overhead is None:
+            raise RuntimeError("Overhead not measured, configure an overhead_sample_rate")
+        return self._overhead.report()
+
+    def repr_cache_info(self) -> ReprCacheInfo:
+        """Report hits, misses, maximum and current size in bytes of the
+        `repr_cache_size` cache."""
+        if self._repr_cache is None:
+            return ReprCacheInfo(0, 0, 0, 0)
+        return self._repr_cache.info()
+
     def _represent_return_value(self, response: Any) -> str:
         """Make a string representation of whatever a method returns."""
-        # some custom handling for request response objects
-        if str(type(response)) == "<class 'requests.models.Response'>":
-            response = response.text
-
         return "(" + self._force_string_and_truncate(response, truncate=None, use_repr=True) + ")"
 
     def _generate_log(
@@ -449,6 +1036,8 @@ class Loga:
         returned: Any,
         formatters: Formatters,
         safe_log_data: Mapping[str, str],
+        created: float | None = None,
+        sample: OverheadSample | None = None,
     ) -> None:
         """Generate message, level and log data for automated logs.
 
@@ -457,6 +1046,8 @@ class Loga:
         - formatters (dict): dict containing format strings needed for message
         - safe_log_data (Mapping): A mapping of stringified, truncated, censored
             parameters
+        - created (float): time of the log, if not now, in seconds since the epoch
+        - sample: stopwatch of the call, if its overhead is measured
         """
         # if the user turned off logs of this type, do nothing immediately
         msg = self._msg_forms[where]
@@ -471,35 +1062,65 @@ class Loga:
         if self._stopped and where != "errored":
             return
 
+        if self._throttle is not None and not self._throttle.admit(formatters["callable"]):
+            return
+
+        if sample is not None:
+            sample.restart()
+
         # return value for log message
         if where in {"returned", "returned_none"}:
-            ret_str = self._represent_return_value(returned)
-            formatters["return_value"] = ret_str
+            if "return_value" in self._fields:
+                formatters["return_value"] = self._represent_return_value(returned)
             formatters["return_type"] = type(returned).__name__
 
         # if what is 'returned' is an exception, get the error formatters
         if where == "errored":
             formatters["exception_type"] = type(returned).__name__
-            formatters["exception_msg"] = str(returned)
-        formatters["log_level"] = LOG_LEVEL
+            if "exception_msg" in self._fields:
+                formatters["exception_msg"] = str(returned)
+        formatters["event"] = where
+        level = formatters.get("log_level", LOG_LEVEL)
 
         # format the string template
         msg = msg.format(**formatters)
 
+        if self._repeats is not None:
+            repeat_key = (
+                formatters["callable"],
+                where,
+                self._msg_forms[where],
+                formatters.get("exception_type"),
+            )
+            if not self._repeats.admit(repeat_key, level, msg):
+                return
+
         # make the log data
-        log_data = {**formatters, **safe_log_data}
+        if self._log_fields is None:
+            log_data = {**formatters, **safe_log_data}
+        else:
+            log_data = {k: v for k, v in formatters.items() if k in self._log_fields}
+            log_data.update(safe_log_data)
+        if sample is not None:
+            sample.lap("formatting")
         custom_log_data = self.add_custom_log_data()
         log_data.update(custom_log_data)
+        if sample is not None:
+            sample.lap("custom_data")
+        if created is not None:
+            log_data[CREATED_ATTR_NAME] = created
 
         # record if logging was on or off
         original_state = self._stopped
         # turn it on just for now, as if we shouldn't log we'd have returned
         self._stopped = False
         try:
-            self.log(LOG_LEVEL, msg, extra=log_data, safe=True)
+            self.log(level, msg, extra=log_data, safe=True)
         finally:
             # restore old stopped state
             self._stopped = original_state
+        if sample is not None:
+            sample.lap("emit")
 
     def add_custom_log_data(self) -> dict[str, str]:
         """An overwritable method useful for adding custom log data."""
@@ -517,8 +1138,190 @@ class Loga:
             return
 
         handler = graypy.GELFUDPHandler(*address, debugging_fields=False)
+        self._add_handler(handler, "graylog")
+
+    def add_sink(
+        self,
+        handler: logging.Handler,
+        name: str | None = None,
+        queue_size: int | None = None,
+        overflow: OverflowPolicy | None = None,
+    ) -> None:
+        """Pass this instance's logs to `handler` too.
+
+        Unless `queue_size` is 0, the handler is given a queue of its own,
+        as configured with `sink_queue_size` and `sink_overflow`, unless
+        overridden. Its statistics are reported by `sink_stats()` under
+        `name`, by default the handler's class name.
+        """
+        self._add_handler(handler, name or type(handler).__name__, queue_size, overflow)
+
+    def sink_stats(self) -> dict[str, SinkStats]:
+        """Report the number of queued, handled and dropped records, and the
+        mean and maximum time records spent queued, of each queued sink."""
+        return {name: sink.stats() for name, sink in self._sinks.items()}
+
+    def events(self) -> EventStore:
+        """Return the in-memory store of decorated call events, for
+        querying them with `columns()` and `summary()`, and exporting
+        them with `to_npy()` and `to_csv()`.
+
+        Requires `event_store` to be configured.
+        """
+        if self._event_store is None:
+            raise RuntimeError("Event store not enabled, configure event_store")
+        return self._event_store
+
+    def query(
+        self,
+        *,
+        couplet: uuid.UUID | str | None = None,
+        callable_name: str | None = None,
+        level: int | None = None,
+        since: float | None = None,
+        until: float | None = None,
+        limit: int | None = None,
+    ) -> list[str]:
+        """Return the records of the log file that match all the given
+        filters, using its index.
+
+        `level` is the lowest level of the records, and `since` and
+        `until` are seconds since the epoch. Requires `do_write` and
+        `logfile_index` to be configured.
+        """
+        if self._indexed_logfile is None:
+            raise RuntimeError("Log file index not enabled, configure do_write and logfile_index")
+        self.flush()
+        return _index.query(
+            self._indexed_logfile,
+            couplet=couplet,
+            callable_name=callable_name,
+            level=level,
+            since=since,
+            until=until,
+            limit=limit,
+        )
+
+    def _add_handler(
+        self,
+        handler: logging.Handler,
+        name: str | None = None,
+        queue_size: int | None = None,
+        overflow: OverflowPolicy | None = None,
+    ) -> None:
+        queue_size = self._sink_queue_size if queue_size is None else queue_size
+        if queue_size:
+            handler = QueuedSink(handler, queue_size, overflow or self._sink_overflow)
+            name = unique_name = name or type(handler.target).__name__
+            number = 1
+            while unique_name in self._sinks:
+                number += 1
+                unique_name = f"{name}-{number}"
+            self._sinks[unique_name] = handler
+        self._handlers.append(handler)
         self._logger.addHandler(handler)
 
+    def _remove_handlers(self) -> None:
+        for handler in self._handlers:
+            self._logger.removeHandler(handler)
+            handler.close()
+        self._handlers = []
+        self._sinks = {}
+
+    def start_aggregator(
+        self, address: Address | None = None, authkey: bytes | None = None
+    ) -> Address:
+        """Receive logs from loga instances in other processes, and write,
+        print or send them to graylog as configured for this instance.
+
+        Returns the address that the other instances should be given as
+        `aggregator_address`, or pass to `connect_aggregator`. If no
+        `address` is given, a local one is chosen. `authkey` defaults
+        to the authkey of the current process, which is inherited by
+        `multiprocessing` children.
+        """
+        if self._aggregator is not None:
+            raise RuntimeError("Aggregator already started")
+        self._aggregator = AggregatorServer(self._logger, address, authkey)
+        return self._aggregator.address
+
+    def connect_aggregator(
+        self,
+        address: Address,
+        authkey: bytes | None = None,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+    ) -> None:
+        """Send logs to an aggregator started with `start_aggregator`,
+        instead of the handlers configured for this instance.
+
+        Logs are sent in batches of `batch_size`, at least every
+        `flush_interval` seconds, and immediately for errors.
+        """
+        self._remove_handlers()
+        self._add_handler(
+            AggregatorHandler(address, authkey, batch_size, flush_interval), "aggregator"
+        )
+
+    def _before_fork(self) -> None:
+        if self._tracer is not None:
+            self._tracer.flush()
+        for handler in self._handlers:
+            handler.flush()
+
+    def _after_fork_in_child(self) -> None:
+        """Reinitialise sockets, files, locks and threads inherited from
+        the parent process.
+
+        If the parent is an aggregator, send the child's logs to it.
+        """
+        if self._repeats is not None:
+            self._repeats.after_fork_in_child()
+        if self._throttle is not None:
+            self._throttle.after_fork_in_child()
+        if self._repr_cache is not None:
+            self._repr_cache.after_fork_in_child()
+        if self._profiler is not None:
+            self._profiler.after_fork_in_child()
+        if self._tracer is not None:
+            self._tracer.after_fork_in_child()
+        if self._recorder is not None:
+            self._recorder.after_fork_in_child()
+        if self._metrics is not None:
+            self._metrics.after_fork_in_child()
+        if self._overhead is not None:
+            self._overhead.after_fork_in_child()
+        if self._metrics_server is not None:
+            # The serving thread only exists in the parent
+            self._metrics_server.after_fork_in_child()
+            self._metrics_server = None
+        for handler in self._handlers:
+            _fork.reinit_handler(handler)
+        if self._aggregator is not None:
+            # The aggregator's threads only exist in the parent
+            aggregator, self._aggregator = self._aggregator, None
+            self.connect_aggregator(aggregator.address, aggregator.authkey)
+
+    def close(self) -> None:
+        """Flush and close this instance's handlers and stop its aggregator.
+
+        Logs made after closing are only passed to handlers that have
+        been added to the logger outside of loga.
+        """
+        self.flush()
+        if self._tracer is not None:
+            self._tracer.close()
+            self._tracer = None
+        if self._aggregator is not None:
+            self._aggregator.close()
+            self._aggregator = None
+        if self._metrics_server is not None:
+            self._metrics_server.close()
+            self._metrics_server = None
+        if self._metrics is not None:
+            self._metrics.close()
+        self._remove_handlers()
+
     def _force_string_and_truncate(
         self, obj: Any, truncate: int | None, use_repr: bool = False
     ) -> str:
@@ -528,7 +1331,11 @@ class Loga:
         '<<Unstringable input>>'
         """
         try:
-            obj = repr(obj) if use_repr else str(obj)
+            if use_repr:
+                representer = self._representers.lookup(type(obj))
+                obj = repr(obj) if representer is None else representer(obj)
+            else:
+                obj = str(obj)
         except Exception as exc:
             self.warning(
                 "Object could not be cast to string",
@@ -537,6 +1344,9 @@ class Loga:
             return "<<Unstringable input>>"
         return self._truncate(obj, truncate)
 
+    def _repr_and_truncate(self, obj: Any, truncate: int | None) -> str:
+        return self._force_string_and_truncate(obj, truncate, use_repr=True)
+
     @staticmethod
     def _truncate(string_to_truncate: str, max_len: int | None) -> str:
         """Return a truncated string.
@@ -602,9 +1412,49 @@ class Loga:
             extra = self.sanitise(extra, use_repr=False)
             msg = self.sanitise_msg(msg)
 
+        decorated = extra.get("decorated") is True
+        if (
+            self._throttle is not None
+            and not decorated
+            and not self._throttle.admit(self._callsite())
+        ):
+            return
+
+        if (
+            self._repeats is not None
+            and not decorated
+            and not self._repeats.admit(("log", level, msg), level, msg)
+        ):
+            return
+
         msg = self._truncate(msg, self._msg_truncation)
+        self._emit(level, msg, extra)
+
+    def bind(self, **fields: Any) -> Binding:
+        """Add `fields` to the log data of all logs made in the current
+        context, i.e. in this thread or asyncio task, and in the tasks it
+        starts.
 
+        The fields are sanitised once, when bound. Log data given to a
+        log call takes precedence over bound fields of the same name.
+        Used as a context manager, the fields are unbound at its exit:
+
+            with loga.bind(request_id=request.id):
+                handle(request)
+        """
+        return self._bound.bind(self.sanitise(fields, use_repr=False))
+
+    def unbind(self, *keys: str) -> None:
+        """Remove the fields of these names bound in the current context."""
+        self._bound.unbind(keys)
+
+    def _emit(self, level: int, msg: str, extra: dict) -> None:
+        """Pass a ready-made log to the stdlib logger."""
+        for key, value in self._bound.get().items():
+            extra.setdefault(key, value)
         extra.update({"log_level": str(level), "loga": "True"})
+        if self._budget is not None:
+            msg = self._budget.apply(msg, extra)
 
         try:
             self._logger.log(level, msg, extra=extra)
@@ -615,6 +1465,49 @@ class Loga:
             if self._raise_logging_errors:
                 raise
 
+    @staticmethod
+    def _callsite() -> str:
+        """Return the file and line of the code that called loga."""
+        frame = sys._getframe(1)
+        while frame.f_back is not None and frame.f_code.co_filename == __file__:
+            frame = frame.f_back
+        return f"{frame.f_code.co_filename}:{frame.f_lineno}"
+
+    def _log_throttled(self, callsite: str, count: int) -> None:
+        """Log the number of logs of a call site that were throttled."""
+        msg = self._truncate(f"*Throttled {count} events from {callsite}", self._msg_truncation)
+        self._emit(logging.WARNING, msg, {"throttled": str(count), "callsite": callsite})
+
+    def top_talkers(self, n: int | None = 10) -> list[TalkerStats]:
+        """Return the `n` decorated callables and manual log call sites
+        that made the most logs, including throttled ones, most first.
+
+        Requires `throttle_rate` or `throttle_callsite_rate` to be configured.
+        """
+        if self._throttle is None:
+            raise RuntimeError("Throttling not enabled, configure throttle_rate")
+        return self._throttle.top_talkers(n)
+
+    def _log_repeated(self, level: int, msg: str, count: int) -> None:
+        """Log a summary of events suppressed by `repeat_window`."""
+        msg = self._truncate(f"*Last message repeated {count} times: {msg}", self._msg_truncation)
+        self._emit(level, msg, {"repeated": str(count)})
+
+    def flush(self) -> None:
+        """Log summaries of repeated events whose suppression window
+        is still open, and of throttled events not yet reported, and
+        flush any buffered logs."""
+        if self._repeats is not None:
+            self._repeats.flush()
+        if self._throttle is not None:
+            self._throttle.flush()
+        if self._profiler is not None:
+            self._profiler.write()
+        if self._tracer is not None:
+            self._tracer.flush()
+        for handler in self._handlers:
+            handler.flush()
+
     def debug(self, msg: str, extra: Mapping = EMPTY_MAP, safe: bool = False) -> None:
         return self.log(logging.DEBUG, msg, extra=extra, safe=safe)
 
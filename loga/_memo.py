@@ -0,0 +1,118 @@
+"""Memoised string representations of immutable objects."""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from collections.abc import Callable
+import sys
+import threading
+from typing import Any, NamedTuple
+
+# Objects shorter than this are cheaper to repr than to look up
+MEMO_MIN_LEN = 32
+MAX_MEMO_NESTING = 3
+IMMUTABLE_SCALARS = frozenset({str, bytes, int, float, complex, bool, type(None), range})
+
+
+class ReprCacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+def _is_immutable(obj: Any, depth: int = 0) -> bool:
+    """Is the string representation of `obj` guaranteed to never change.
+
+    Only exact builtin types qualify, as subclasses can have mutable
+    attributes or a custom `__repr__`.
+    """
+    if type(obj) in IMMUTABLE_SCALARS:
+        return True
+    if type(obj) not in {tuple, frozenset} or depth >= MAX_MEMO_NESTING:
+        return False
+    return all(_is_immutable(item, depth + 1) for item in obj)
+
+
+def _deep_size(obj: Any) -> int:
+    """Size in bytes of an immutable object, including its items.
+
+    Items shared with other objects are counted too, so this may
+    overestimate the memory the cache keeps alive, never underestimate.
+    """
+    size = sys.getsizeof(obj)
+    if type(obj) in {tuple, frozenset}:
+        size += sum(_deep_size(item) for item in obj)
+    return size
+
+
+class _Entry:
+    __slots__ = ("obj", "string", "size")
+
+    def __init__(self, obj: Any, string: str) -> None:
+        # Holding a reference to the object guarantees that its id is not
+        # reused by another object while the entry is in the cache.
+        self.obj = obj
+        self.string = string
+        self.size = _deep_size(obj) + sys.getsizeof(string)
+
+
+class ReprCache:
+    """An LRU cache of string representations keyed by object identity.
+
+    Entries are evicted least recently used first, once the total size
+    in bytes of the cached objects and their representations exceeds
+    `maxsize`.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self._maxsize = maxsize
+        self._currsize = 0
+        self._hits = 0
+        self._misses = 0
+        self._entries: OrderedDict[tuple[int, int | None], _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def represent(
+        self, obj: Any, truncate: int | None, make: Callable[[Any, int | None], str]
+    ) -> str:
+        """Return `make(obj, truncate)`, from the cache if possible."""
+        if type(obj) not in {str, bytes, tuple, frozenset} or len(obj) < MEMO_MIN_LEN:
+            return make(obj, truncate)
+        key = (id(obj), truncate)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.obj is obj:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry.string
+        if not _is_immutable(obj):
+            return make(obj, truncate)
+        string = make(obj, truncate)
+        entry = _Entry(obj, string)
+        with self._lock:
+            self._misses += 1
+            if entry.size > self._maxsize:
+                return string
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._currsize -= old.size
+            self._entries[key] = entry
+            self._currsize += entry.size
+            while self._currsize > self._maxsize:
+                _, evicted = self._entries.popitem(last=False)
+                self._currsize -= evicted.size
+        return string
+
+    def info(self) -> ReprCacheInfo:
+        with self._lock:
+            return ReprCacheInfo(self._hits, self._misses, self._maxsize, self._currsize)
+
+    def after_fork_in_child(self) -> None:
+        # Keep the entries, they are shared with the parent copy-on-write
+        self._lock = threading.Lock()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._currsize = 0
@@ -0,0 +1,201 @@
+"""Per-callable call, error and latency metrics in OpenMetrics format."""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections.abc import Sequence
+import http.server
+import math
+import threading
+from typing import Dict
+import weakref
+
+# The default buckets of Prometheus client libraries, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+
+class _Series:
+    """The counts of one callable in one thread."""
+
+    __slots__ = ("buckets", "sum", "errors")
+
+    def __init__(self, size: int) -> None:
+        # Non-cumulative, the last one counts durations above all bounds
+        self.buckets = [0] * size
+        self.sum = 0.0
+        self.errors: dict[str, int] = {}
+
+    def merge(self, other: _Series) -> None:
+        for i, count in enumerate(other.buckets):
+            self.buckets[i] += count
+        self.sum += other.sum
+        for exception_type, count in list(other.errors.items()):
+            self.errors[exception_type] = self.errors.get(exception_type, 0) + count
+
+
+SeriesByName = Dict[str, _Series]
+
+
+class _ThreadSeries:
+    __slots__ = ("series", "__weakref__")
+
+    def __init__(self) -> None:
+        self.series: SeriesByName = {}
+
+
+def _label(value: str) -> str:
+    escaped = value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+    return f'"{escaped}"'
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+    return repr(float(value))
+
+
+class CallMetrics:
+    """Count calls, errors by exception type, and call durations in
+    histogram buckets, per callable.
+
+    Like the profiler, each thread updates its own counts without
+    locks, and the counts of a thread are merged into those of
+    finished threads when it ends.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(sorted(buckets))
+        if not self.buckets:
+            raise ValueError("Histogram needs at least one bucket")
+        self._reset()
+
+    def _reset(self) -> None:
+        self._local = threading.local()
+        self._live: dict[int, SeriesByName] = {}
+        self._finished: SeriesByName = {}
+        self._lock = threading.Lock()
+
+    def _thread_series(self) -> SeriesByName:
+        try:
+            return self._local.data.series
+        except AttributeError:
+            data = self._local.data = _ThreadSeries()
+            with self._lock:
+                self._live[id(data)] = data.series
+            weakref.finalize(data, self._thread_finished, id(data), self._lock)
+            return data.series
+
+    def _thread_finished(self, data_id: int, lock: threading.Lock) -> None:
+        with lock:
+            series_by_name = self._live.pop(data_id, None)
+            if series_by_name is not None:
+                self._merge(self._finished, series_by_name)
+
+    def _merge(self, into: SeriesByName, series_by_name: SeriesByName) -> None:
+        for name, series in list(series_by_name.items()):
+            merged = into.get(name)
+            if merged is None:
+                merged = into[name] = _Series(len(self.buckets) + 1)
+            merged.merge(series)
+
+    def observe(self, name: str, seconds: float, exception_type: str | None = None) -> None:
+        """Count a call of `name` that took `seconds`, and raised if an
+        `exception_type` is given."""
+        series_by_name = self._thread_series()
+        series = series_by_name.get(name)
+        if series is None:
+            series = series_by_name[name] = _Series(len(self.buckets) + 1)
+        series.buckets[bisect_left(self.buckets, seconds)] += 1
+        series.sum += seconds
+        if exception_type is not None:
+            series.errors[exception_type] = series.errors.get(exception_type, 0) + 1
+
+    def snapshot(self) -> SeriesByName:
+        """Return the counts of all threads, merged."""
+        merged: SeriesByName = {}
+        with self._lock:
+            self._merge(merged, self._finished)
+            for series_by_name in list(self._live.values()):
+                self._merge(merged, series_by_name)
+        return merged
+
+    def exposition(self) -> str:
+        """Return the metrics as OpenMetrics text."""
+        snapshot = sorted(self.snapshot().items())
+        lines = [
+            "# TYPE loga_calls counter",
+            "# HELP loga_calls Calls of decorated callables.",
+        ]
+        for name, series in snapshot:
+            lines.append(f"loga_calls_total{{callable={_label(name)}}} {sum(series.buckets)}")
+        lines += [
+            "# TYPE loga_errors counter",
+            "# HELP loga_errors Exceptions raised by decorated callables.",
+        ]
+        for name, series in snapshot:
+            for exception_type, count in sorted(series.errors.items()):
+                labels = f"callable={_label(name)},exception_type={_label(exception_type)}"
+                lines.append(f"loga_errors_total{{{labels}}} {count}")
+        lines += [
+            "# TYPE loga_call_duration_seconds histogram",
+            "# HELP loga_call_duration_seconds Durations of calls of decorated callables.",
+            "# UNIT loga_call_duration_seconds seconds",
+        ]
+        for name, series in snapshot:
+            label = _label(name)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), series.buckets):
+                cumulative += count
+                lines.append(
+                    f'loga_call_duration_seconds_bucket{{callable={label},le="{_number(bound)}"}}'
+                    f" {cumulative}"
+                )
+            lines.append(f"loga_call_duration_seconds_count{{callable={label}}} {cumulative}")
+            lines.append(f"loga_call_duration_seconds_sum{{callable={label}}} {series.sum!r}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def after_fork_in_child(self) -> None:
+        """Count the child's calls separately."""
+        self._reset()
+
+    def close(self) -> None:
+        """Release the resources of the metrics, if any."""
+
+
+class MetricsServer:
+    """Serve the exposition of `metrics` over HTTP from a daemon thread,
+    for Prometheus to scrape."""
+
+    def __init__(self, metrics: CallMetrics, host: str = "127.0.0.1", port: int = 0) -> None:
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self) -> None:  # noqa: N802
+                if self.path.split("?")[0] not in {"/", "/metrics"}:
+                    self.send_error(404)
+                    return
+                body = metrics.exposition().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: object) -> None:  # noqa: A002
+                # Don't write each scrape to stderr
+                pass
+
+        self._server = http.server.ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.address: tuple[str, int] = self._server.server_address[:2]  # type: ignore[assignment]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def after_fork_in_child(self) -> None:
+        """Close the child's copy of the listening socket, the serving
+        thread only exists in the parent."""
+        self._server.server_close()
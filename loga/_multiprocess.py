@@ -0,0 +1,228 @@
+"""Sending logs from many processes to a single writer process."""
+
+from __future__ import annotations
+
+import logging
+import logging.handlers
+from multiprocessing import current_process, util
+from multiprocessing.connection import Client, Connection, Listener
+import socket
+import threading
+import time
+from typing import Any, Tuple, Union
+import weakref
+
+Address = Union[str, Tuple[str, int]]
+# Types of record attributes sent as they are, others are sent as strings
+PICKLED_TYPES = (str, int, float, bool, type(None))
+# How often idle receivers check whether the server is closing, in seconds
+RECEIVE_POLL_INTERVAL = 0.1
+
+
+def close_at_exit(handler: logging.Handler) -> util.Finalize:
+    """Close `handler` at exit, without keeping it alive until then.
+
+    multiprocessing children exit without running atexit hooks, but
+    they do run finalizers with an exit priority. Cancel the returned
+    finalizer once the handler is closed.
+    """
+    ref = weakref.ref(handler)
+
+    def close() -> None:
+        alive = ref()
+        if alive is not None:
+            alive.close()
+
+    return util.Finalize(handler, close, exitpriority=10)
+
+
+class AggregatorHandler(logging.handlers.BufferingHandler):
+    """Send log records to an `AggregatorServer` in batches.
+
+    Buffered records are sent when `capacity` records have been
+    buffered, when a record of `flush_level` or higher is handled, and
+    every `flush_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        address: Address,
+        authkey: bytes | None = None,
+        capacity: int = 100,
+        flush_interval: float = 1.0,
+        flush_level: int = logging.ERROR,
+    ) -> None:
+        super().__init__(capacity)
+        self.address = address
+        self.authkey = current_process().authkey if authkey is None else authkey
+        self.flush_level = flush_level
+        self.flush_interval = flush_interval
+        self._conn: Connection | None = None
+        self._start()
+
+    def _start(self) -> None:
+        self._stopping = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+        self._flusher.start()
+        self._finalizer = close_at_exit(self)
+
+    def after_fork_in_child(self) -> None:
+        # The parent sends what it had buffered, over its own connection
+        self.buffer.clear()
+        self._finalizer.cancel()
+        self._disconnect()
+        self._start()
+
+    def shouldFlush(self, record: logging.LogRecord) -> bool:
+        return len(self.buffer) >= self.capacity or record.levelno >= self.flush_level
+
+    @staticmethod
+    def prepare(record: logging.LogRecord) -> dict[str, Any]:
+        """Make a picklable copy of a record.
+
+        Like `QueueHandler.prepare`, the message is formatted with its
+        args, and exception info is dropped. Attributes that aren't
+        primitives (e.g. objects passed in `extra`) are sent as strings,
+        so that one unpicklable value can't lose the whole batch.
+        """
+        data = {
+            key: value if isinstance(value, PICKLED_TYPES) else str(value)
+            for key, value in vars(record).items()
+        }
+        data["msg"] = record.getMessage()
+        data["args"] = None
+        data["exc_info"] = None
+        data.pop("message", None)
+        return data
+
+    def flush(self) -> None:
+        self.acquire()
+        try:
+            if not self.buffer:
+                return
+            batch = [self.prepare(record) for record in self.buffer]
+            last = self.buffer[-1]
+            self.buffer.clear()
+            try:
+                if self._conn is None:
+                    self._conn = Client(self.address, authkey=self.authkey)
+                self._conn.send(batch)
+            except Exception:
+                self._disconnect()
+                self.handleError(last)
+        finally:
+            self.release()
+
+    def close(self) -> None:
+        if self._stopping.is_set():
+            return
+        self._stopping.set()
+        self._finalizer.cancel()
+        try:
+            self.flush()
+            self._disconnect()
+        finally:
+            super().close()
+
+    def _disconnect(self) -> None:
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except OSError:
+                pass
+            self._conn = None
+
+    def _flush_periodically(self) -> None:
+        while not self._stopping.wait(self.flush_interval):
+            self.flush()
+
+
+class AggregatorServer:
+    """Receive log records sent by `AggregatorHandler`s in other
+    processes, and pass them to the handlers of `logger`."""
+
+    def __init__(
+        self, logger: logging.Logger, address: Address | None = None, authkey: bytes | None = None
+    ) -> None:
+        self._logger = logger
+        self._authkey = current_process().authkey if authkey is None else authkey
+        self._listener = Listener(address, authkey=self._authkey)
+        self.address: Address = self._listener.address
+        self._closing = threading.Event()
+        self._receivers: list[tuple[threading.Thread, Connection]] = []
+        self._accepter = threading.Thread(target=self._accept, daemon=True)
+        self._accepter.start()
+
+    def _accept(self) -> None:
+        while not self._closing.is_set():
+            try:
+                conn = self._listener.accept()
+            except Exception:
+                # Failed handshakes, e.g. a client with a wrong authkey
+                continue
+            # Connections accepted while closing are still drained
+            receiver = threading.Thread(target=self._receive, args=(conn,), daemon=True)
+            receiver.start()
+            # Forget the receivers of clients that have disconnected
+            self._receivers = [r for r in self._receivers if r[0].is_alive()]
+            self._receivers.append((receiver, conn))
+
+    def _receive(self, conn: Connection) -> None:
+        with conn:
+            while True:
+                try:
+                    if not conn.poll(RECEIVE_POLL_INTERVAL):
+                        # Stop once closing and everything sent was handled
+                        if self._closing.is_set():
+                            return
+                        continue
+                    batch = conn.recv()
+                except (EOFError, OSError):
+                    return
+                for data in batch:
+                    self._logger.handle(logging.makeLogRecord(data))
+
+    def _wake_accepter(self) -> None:
+        """Make a blocked `accept` return, by connecting without a
+        handshake.
+
+        Unlike connecting with `Client`, this can't block if the
+        accepting thread has already returned.
+        """
+        if isinstance(self.address, tuple):
+            family = socket.AF_INET
+        elif hasattr(socket, "AF_UNIX"):
+            family = socket.AF_UNIX
+        else:
+            # Windows named pipes
+            return
+        try:
+            with socket.socket(family) as sock:
+                sock.connect(self.address)
+        except OSError:
+            pass
+
+    @property
+    def authkey(self) -> bytes:
+        return self._authkey
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Stop accepting connections, handle the logs already sent by
+        connected clients, and disconnect them.
+
+        Waits at most `timeout` seconds for the logs to be handled.
+        """
+        if self._closing.is_set():
+            return
+        self._closing.set()
+        deadline = time.monotonic() + timeout
+        self._wake_accepter()
+        self._accepter.join(timeout)
+        self._listener.close()
+        for receiver, conn in self._receivers:
+            receiver.join(max(0.0, deadline - time.monotonic()))
+            if receiver.is_alive():
+                try:
+                    conn.close()
+                except OSError:
+                    pass
@@ -0,0 +1,87 @@
+"""Measuring the time loga itself spends on decorated calls."""
+
+from __future__ import annotations
+
+import itertools
+import threading
+import time
+from typing import NamedTuple
+
+STAGES = ("bind", "sanitise", "formatting", "custom_data", "emit")
+_STAGE_INDEX = {stage: i for i, stage in enumerate(STAGES, start=1)}
+
+
+class OverheadStats(NamedTuple):
+    """Mean seconds per sampled call spent in each stage."""
+
+    samples: int
+    bind: float  # binding arguments to parameters
+    sanitise: float  # obscuring, renaming and representing parameters
+    formatting: float  # representing return values and formatting messages
+    custom_data: float  # add_custom_log_data
+    emit: float  # passing logs to the handlers
+
+    @property
+    def total(self) -> float:
+        return self.bind + self.sanitise + self.formatting + self.custom_data + self.emit
+
+
+class OverheadSample:
+    """A stopwatch adding the time of each stage of one call to the
+    totals of its callable."""
+
+    __slots__ = ("_meter", "_totals", "_last")
+
+    def __init__(self, meter: OverheadMeter, totals: list[int]) -> None:
+        self._meter = meter
+        self._totals = totals
+        self._last = time.perf_counter_ns()
+
+    def restart(self) -> None:
+        self._last = time.perf_counter_ns()
+
+    def lap(self, stage: str) -> None:
+        """Add the time since the last lap or restart to `stage`."""
+        now = time.perf_counter_ns()
+        with self._meter._lock:
+            self._totals[_STAGE_INDEX[stage]] += now - self._last
+        self._last = now
+
+
+class OverheadMeter:
+    """Time the stages of one in every `1 / sample_rate` decorated calls.
+
+    Calls are picked by counting them rather than by a random draw, so
+    that calls that aren't sampled only pay for incrementing a counter.
+    """
+
+    def __init__(self, sample_rate: float) -> None:
+        if not 0 < sample_rate <= 1:
+            raise ValueError("Overhead sample rate must be in (0, 1]")
+        self.period = max(1, round(1 / sample_rate))
+        self._counter = itertools.count()
+        # {callable: [samples, *nanoseconds per stage]}
+        self._totals: dict[str, list[int]] = {}
+        self._lock = threading.Lock()
+
+    def sample(self, name: str) -> OverheadSample | None:
+        """Return a stopwatch for this call of `name` if it is sampled."""
+        if next(self._counter) % self.period:
+            return None
+        with self._lock:
+            totals = self._totals.get(name)
+            if totals is None:
+                totals = self._totals[name] = [0] * (len(STAGES) + 1)
+            totals[0] += 1
+        return OverheadSample(self, totals)
+
+    def report(self) -> dict[str, OverheadStats]:
+        with self._lock:
+            totals = {name: list(stage_totals) for name, stage_totals in self._totals.items()}
+        return {
+            name: OverheadStats(samples, *(ns / samples / 1e9 for ns in stage_totals))
+            for name, (samples, *stage_totals) in sorted(totals.items())
+        }
+
+    def after_fork_in_child(self) -> None:
+        self._lock = threading.Lock()
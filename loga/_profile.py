@@ -0,0 +1,147 @@
+"""Folded-stack profiling of decorated calls."""
+
+from __future__ import annotations
+
+import atexit
+import os
+import pathlib
+import threading
+import time
+from typing import Dict, List, NamedTuple, Tuple
+import weakref
+
+# {path: [calls, total_ns, self_ns]}
+PathStats = Dict[Tuple[str, ...], List[int]]
+
+
+class ProfileStats(NamedTuple):
+    calls: int
+    total_time: float  # seconds, including decorated calls made within
+    self_time: float  # seconds, excluding decorated calls made within
+
+
+def _merge(into: PathStats, stats: PathStats) -> None:
+    for path, (calls, total, self_time) in stats.items():
+        entry = into.setdefault(path, [0, 0, 0])
+        entry[0] += calls
+        entry[1] += total
+        entry[2] += self_time
+
+
+class _ThreadData:
+    __slots__ = ("stack", "stats", "__weakref__")
+
+    def __init__(self) -> None:
+        self.stack: list[list] = []
+        self.stats: PathStats = {}
+
+
+class StackProfiler:
+    """Aggregate the time spent in decorated calls by call path.
+
+    The call path is the stack of the `__qualname__`s of the decorated
+    callables being run in a thread. Each thread keeps its own stack
+    and statistics, so no locks are taken per call. The statistics of
+    a thread are merged into those of finished threads when it ends.
+
+    Once a top-level decorated call returns, if `interval` seconds have
+    passed since the last write, the self times are written to
+    `filename` as folded stacks (one "outer;inner <microseconds>" line
+    per path), the input format of flamegraph.pl, inferno and
+    speedscope. They are also written at exit.
+    """
+
+    def __init__(self, filename: str, interval: float = 60.0) -> None:
+        self.filename = os.path.abspath(os.path.expanduser(filename))
+        self.interval = interval
+        self._reset()
+        atexit.register(self.write)
+
+    def _reset(self) -> None:
+        self._local = threading.local()
+        # Statistics of running threads, by id of their thread data
+        self._live: dict[int, PathStats] = {}
+        self._finished: PathStats = {}
+        self._lock = threading.Lock()
+        self._next_write = time.monotonic() + self.interval
+
+    def _stack(self) -> list[list]:
+        try:
+            return self._local.data.stack
+        except AttributeError:
+            data = self._local.data = _ThreadData()
+            with self._lock:
+                self._live[id(data)] = data.stats
+            # Thread locals are deleted when their thread ends
+            weakref.finalize(data, self._thread_finished, id(data), self._lock)
+            return data.stack
+
+    def _thread_finished(self, data_id: int, lock: threading.Lock) -> None:
+        with lock:
+            # Not found if the process forked since the thread started
+            stats = self._live.pop(data_id, None)
+            if stats is not None:
+                _merge(self._finished, stats)
+
+    def enter(self, name: str) -> None:
+        stack = self._stack()
+        path = stack[-1][0] + (name,) if stack else (name,)
+        # [path, start time, time spent in decorated calls within]
+        stack.append([path, time.perf_counter_ns(), 0])
+
+    def exit(self) -> None:  # noqa: A003
+        end = time.perf_counter_ns()
+        data: _ThreadData | None = getattr(self._local, "data", None)
+        # Empty if the process forked during the call
+        if data is None or not data.stack:
+            return
+        stack = data.stack
+        path, start, child_time = stack.pop()
+        elapsed = end - start
+        if stack:
+            stack[-1][2] += elapsed
+        stats = data.stats.get(path)
+        if stats is None:
+            data.stats[path] = [1, elapsed, elapsed - child_time]
+        else:
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] += elapsed - child_time
+        if not stack and time.monotonic() >= self._next_write:
+            self._next_write = time.monotonic() + self.interval
+            self.write()
+
+    def stats(self) -> dict[str, ProfileStats]:
+        """Return the statistics of each call path, keyed by the path
+        joined with semicolons."""
+        with self._lock:
+            # Copying a dict is atomic, unlike iterating over one that
+            # another thread may be adding to
+            thread_stats = [dict(stats) for stats in self._live.values()]
+            merged = {path: list(stats) for path, stats in self._finished.items()}
+        for stats in thread_stats:
+            _merge(merged, stats)
+        return {
+            ";".join(path): ProfileStats(calls, total / 1e9, self_time / 1e9)
+            for path, (calls, total, self_time) in sorted(merged.items())
+        }
+
+    def write(self) -> None:
+        """Write the folded stacks, replacing the previous ones."""
+        lines = [
+            f"{path} {round(stats.self_time * 1e6)}\n"
+            for path, stats in self.stats().items()
+            if stats.self_time > 0
+        ]
+        pathlib.Path(os.path.dirname(self.filename)).mkdir(parents=True, exist_ok=True)
+        tmp = f"{self.filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.writelines(lines)
+        os.replace(tmp, self.filename)
+
+    def after_fork_in_child(self) -> None:
+        """Profile the child separately, writing to a file suffixed with
+        its process id."""
+        path = pathlib.Path(self.filename)
+        self.filename = str(path.with_name(f"{path.stem}.{os.getpid()}{path.suffix}"))
+        self._reset()
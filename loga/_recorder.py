@@ -0,0 +1,109 @@
+"""In-memory recording of decorated call events, logged on demand."""
+
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Callable, Mapping
+import threading
+from typing import Any, Literal, NamedTuple
+import weakref
+
+
+class RecordedCall:
+    """The arguments of a decorated call, kept by reference, the fields
+    bound when it was made, and the level of its logs."""
+
+    __slots__ = ("function", "args", "kwargs", "time", "bound", "level", "prepared")
+
+    def __init__(
+        self,
+        function: Callable,
+        args: tuple,
+        kwargs: dict,
+        time: float,
+        bound: Mapping[str, str],
+        level: int,
+    ) -> None:
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.time = time
+        self.bound = bound
+        self.level = level
+        # Set to the call's formatters and parameter strings once logged
+        self.prepared: Any = None
+
+
+class RecordedEvent(NamedTuple):
+    where: Literal["called", "returned", "returned_none"]
+    call: RecordedCall
+    returned: Any
+    time: float
+
+
+class _ThreadEvents:
+    __slots__ = ("events", "__weakref__")
+
+    def __init__(self, size: int) -> None:
+        self.events: deque[RecordedEvent] = deque(maxlen=size)
+
+
+class FlightRecorder:
+    """Keep the last `size` events of each thread in ring buffers.
+
+    Events are stored as they are, and only represented as logs when
+    they are taken out of the buffers. A thread's buffer is dropped
+    along with its thread. Buffers are drained with
+    `popleft`, which is atomic, so events recorded while another thread
+    takes them are neither lost nor taken twice.
+    """
+
+    def __init__(self, size: int) -> None:
+        if size < 1:
+            raise ValueError("Flight recorder must keep at least one event")
+        self.size = size
+        self._reset()
+
+    def _reset(self) -> None:
+        self._local = threading.local()
+        # Events of running threads, dropped along with their thread
+        self._threads: weakref.WeakSet[_ThreadEvents] = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def record(self, event: RecordedEvent) -> None:
+        try:
+            events = self._local.events
+        except AttributeError:
+            thread_events = _ThreadEvents(self.size)
+            self._local.thread_events = thread_events
+            events = self._local.events = thread_events.events
+            with self._lock:
+                self._threads.add(thread_events)
+        events.append(event)
+
+    def take(self) -> list[RecordedEvent]:
+        """Remove and return the events recorded by the current thread."""
+        events = getattr(self._local, "events", None)
+        return [] if events is None else self._drain(events)
+
+    def take_all(self) -> list[RecordedEvent]:
+        """Remove and return the events recorded by all threads, oldest
+        first."""
+        with self._lock:
+            threads = list(self._threads)
+        events = [event for thread in threads for event in self._drain(thread.events)]
+        events.sort(key=lambda event: event.time)
+        return events
+
+    @staticmethod
+    def _drain(events: deque[RecordedEvent]) -> list[RecordedEvent]:
+        drained = []
+        while True:
+            try:
+                drained.append(events.popleft())
+            except IndexError:
+                return drained
+
+    def after_fork_in_child(self) -> None:
+        """Forget the events recorded in the parent process."""
+        self._reset()
@@ -0,0 +1,123 @@
+"""Suppression of bursts of identical log events."""
+
+from __future__ import annotations
+
+import atexit
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+import threading
+import time
+import weakref
+
+_suppressors: weakref.WeakSet[RepeatSuppressor] = weakref.WeakSet()
+
+
+class _Window:
+    __slots__ = ("opened", "level", "msg", "count")
+
+    def __init__(self, opened: float, level: int, msg: str) -> None:
+        self.opened = opened
+        self.level = level
+        self.msg = msg
+        self.count = 0
+
+
+class RepeatSuppressor:
+    """Count identical events within a time window instead of logging them.
+
+    The first event of a key opens a window and is logged as usual.
+    Further events with the same key are only counted until the window
+    closes, at which point `on_summary(level, msg, count)` is called
+    with the message of the first event.
+
+    Windows are kept in an OrderedDict in the order they were opened,
+    so expired windows are always found at the front, and the dict
+    can be capped to `max_keys` by evicting the oldest window. Windows
+    with repeats are closed by a timer thread, and at exit.
+    """
+
+    def __init__(
+        self, window: float, max_keys: int, on_summary: Callable[[int, str, int], None]
+    ) -> None:
+        if window <= 0:
+            raise ValueError("Repeat window must be positive")
+        if max_keys < 1:
+            raise ValueError("Must track at least one repeat key")
+        self._window = window
+        self._max_keys = max_keys
+        self._on_summary = on_summary
+        self._windows: OrderedDict[Hashable, _Window] = OrderedDict()
+        self._lock = threading.Lock()
+        self._timer: threading.Timer | None = None
+        _suppressors.add(self)
+
+    def admit(self, key: Hashable, level: int, msg: str) -> bool:
+        """Return True if an event should be logged, False if it was
+        counted as a repeat."""
+        now = time.monotonic()
+        with self._lock:
+            closed = self._pop_expired(now)
+            window = self._windows.get(key)
+            if window is not None:
+                window.count += 1
+                admitted = False
+                if self._timer is None:
+                    self._schedule(window.opened + self._window - now)
+            else:
+                self._windows[key] = _Window(now, level, msg)
+                admitted = True
+                if len(self._windows) > self._max_keys:
+                    closed.append(self._windows.popitem(last=False)[1])
+        self._summarise(closed)
+        return admitted
+
+    def flush(self) -> None:
+        """Close all open windows, summarising the suppressed events."""
+        with self._lock:
+            closed = list(self._windows.values())
+            self._windows.clear()
+        self._summarise(closed)
+
+    def after_fork_in_child(self) -> None:
+        """Forget the windows opened by the parent process, which will
+        summarise them itself."""
+        self._lock = threading.Lock()
+        self._timer = None
+        self._windows.clear()
+
+    def _schedule(self, delay: float) -> None:
+        self._timer = threading.Timer(max(0.0, delay), self._close_expired)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _close_expired(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._timer = None
+            closed = self._pop_expired(now)
+            repeated = next((w for w in self._windows.values() if w.count), None)
+            if repeated is not None:
+                self._schedule(repeated.opened + self._window - now)
+        self._summarise(closed)
+
+    def _pop_expired(self, now: float) -> list[_Window]:
+        closed = []
+        while self._windows:
+            oldest = next(iter(self._windows.values()))
+            if now - oldest.opened < self._window:
+                break
+            closed.append(self._windows.popitem(last=False)[1])
+        return closed
+
+    def _summarise(self, closed: list[_Window]) -> None:
+        # Called outside of the lock, as logging the summary may recurse
+        # into `admit` through user handlers.
+        for window in closed:
+            if window.count:
+                self._on_summary(window.level, window.msg, window.count)
+
+
+@atexit.register
+def _flush_all() -> None:
+    for suppressor in list(_suppressors):
+        suppressor.flush()
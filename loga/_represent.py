@@ -0,0 +1,161 @@
+"""Type-specific string representations of logged objects."""
+
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Mapping
+import importlib
+import sys
+import threading
+from types import MappingProxyType
+from typing import Any, Callable, Union
+
+Representer = Callable[[Any], str]
+# A type, or a dotted path to a type in a library that may not be installed
+RepresentedType = Union[type, str]
+
+# Containers longer than this are summarised instead of fully repr'd
+SUMMARY_THRESHOLD = 100
+# Number of leading items shown in a container summary
+SUMMARY_HEAD = 10
+
+
+class Representers:
+    """A registry of representer functions keyed by type.
+
+    Lookups walk the MRO of an object's type, so a representer
+    registered for a class is also used for its subclasses. The result
+    of the walk is cached per type. Types can be registered by their
+    dotted path, e.g. "numpy.ndarray", in which case they are resolved
+    once the library has been imported by someone else. The latest
+    registration for a type wins, whichever way it was registered.
+    Cache misses and registrations take a lock, cache hits don't.
+    """
+
+    def __init__(
+        self, representers: Mapping[RepresentedType, Representer] = MappingProxyType({})
+    ) -> None:
+        self._by_type: dict[type, Representer] = {}
+        self._by_path: dict[str, Representer] = {}
+        self._cache: dict[type, Representer | None] = {}
+        self._lock = threading.Lock()
+        for cls, representer in representers.items():
+            self.register(cls, representer)
+
+    def register(self, cls: RepresentedType, representer: Representer) -> None:
+        """Use `representer` for instances of `cls` and its subclasses."""
+        with self._lock:
+            # Resolve older path registrations first, so they can't
+            # override this one when resolved later
+            self._resolve_paths()
+            if isinstance(cls, str):
+                self._by_path[cls] = representer
+                self._resolve_paths()
+            else:
+                self._by_type[cls] = representer
+            self._cache.clear()
+
+    def lookup(self, cls: type) -> Representer | None:
+        """Return the representer for a type, or None if there is none."""
+        try:
+            return self._cache[cls]
+        except KeyError:
+            pass
+        with self._lock:
+            if self._by_path:
+                self._resolve_paths()
+            found = None
+            for klass in cls.__mro__:
+                found = self._by_type.get(klass)
+                if found is not None:
+                    break
+            self._cache[cls] = found
+        return found
+
+    def _resolve_paths(self) -> None:
+        """Move dotted path registrations of already imported libraries
+        to the type registry. Called with the lock held.
+
+        An instance of a type can't exist before its module has been
+        imported, so types cached as not having a representer before
+        the resolution can't be affected by it.
+        """
+        for path in list(self._by_path):
+            module_name, _, attr = path.rpartition(".")
+            if module_name.partition(".")[0] not in sys.modules:
+                continue
+            representer = self._by_path.pop(path)
+            try:
+                cls = getattr(importlib.import_module(module_name), attr)
+            except (ImportError, AttributeError):
+                continue
+            self._by_type[cls] = representer
+
+
+def _represent_bytes(obj: bytes | bytearray) -> str:
+    if len(obj) <= SUMMARY_THRESHOLD:
+        return repr(obj)
+    return f"<{type(obj).__name__} len={len(obj)}: {bytes(obj[:SUMMARY_HEAD])!r}...>"
+
+
+def _represent_memoryview(obj: memoryview) -> str:
+    return f"<memoryview nbytes={obj.nbytes} format={obj.format!r} shape={obj.shape}>"
+
+
+def _represent_collection(obj: Any) -> str:
+    if len(obj) <= SUMMARY_THRESHOLD:
+        return repr(obj)
+    head = []
+    for i, item in enumerate(obj):
+        if i == SUMMARY_HEAD:
+            break
+        head.append(repr(item))
+    return f"<{type(obj).__name__} len={len(obj)}: {', '.join(head)}, ...>"
+
+
+def _represent_mapping(obj: Mapping) -> str:
+    if len(obj) <= SUMMARY_THRESHOLD:
+        return repr(obj)
+    head = []
+    for i, (key, value) in enumerate(obj.items()):
+        if i == SUMMARY_HEAD:
+            break
+        head.append(f"{key!r}: {value!r}")
+    return f"<{type(obj).__name__} len={len(obj)}: {', '.join(head)}, ...>"
+
+
+def _represent_ndarray(obj: Any) -> str:
+    if obj.size <= SUMMARY_THRESHOLD:
+        return repr(obj)
+    return f"<ndarray shape={obj.shape} dtype={obj.dtype}>"
+
+
+def _represent_dataframe(obj: Any) -> str:
+    columns = list(obj.columns[:SUMMARY_HEAD])
+    more = ", ..." if len(obj.columns) > SUMMARY_HEAD else ""
+    return f"<DataFrame shape={obj.shape} columns={columns!r}{more}>"
+
+
+def _represent_series(obj: Any) -> str:
+    return f"<Series name={obj.name!r} len={len(obj)} dtype={obj.dtype}>"
+
+
+def _represent_response(obj: Any) -> str:
+    return repr(obj.text)
+
+
+BUILTIN_REPRESENTERS: Mapping[RepresentedType, Representer] = {
+    bytes: _represent_bytes,
+    bytearray: _represent_bytes,
+    memoryview: _represent_memoryview,
+    list: _represent_collection,
+    tuple: _represent_collection,
+    set: _represent_collection,
+    frozenset: _represent_collection,
+    deque: _represent_collection,
+    dict: _represent_mapping,
+    "numpy.ndarray": _represent_ndarray,
+    "pandas.DataFrame": _represent_dataframe,
+    "pandas.Series": _represent_series,
+    "requests.models.Response": _represent_response,
+}
@@ -0,0 +1,303 @@
+"""Call metrics in shared memory, aggregated across processes.
+
+The segment starts with a header describing its layout, followed by a
+table of names, one per slot, a table of the pids of the processes
+writing to it, and the counters: one row per process and slot, so that
+each process only ever writes to its own rows, without locks shared
+with other processes.
+
+Each row counts the calls of a callable, the sum of their durations in
+nanoseconds, and the calls in each duration histogram bucket. The
+exceptions of a callable are counted in slots of their own, named
+"<callable>\\0<exception type>", in the first counter of their rows.
+
+Slots and process rows are only claimed, under a file lock, the first
+time a process sees a callable or exception type, so the hot path reads
+and writes only this process's memory.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections.abc import Iterator, Sequence
+import contextlib
+import os
+import struct
+import sys
+import tempfile
+
+from ._metrics import DEFAULT_BUCKETS, CallMetrics, SeriesByName, _Series
+
+try:
+    import fcntl
+except ModuleNotFoundError:  # Windows
+    fcntl = None  # type: ignore[assignment]
+
+if sys.version_info < (3, 13):
+    from multiprocessing import resource_tracker
+from multiprocessing import shared_memory
+
+MAGIC = b"LOGAMET1"
+# Magic, number of process rows, slots and histogram bounds
+HEADER = struct.Struct("<8sIII")
+NAME_SIZE = 128
+# Length of the UTF-8 encoded name, 0 for a free slot
+NAME_LENGTH = struct.Struct("<H")
+COUNTER = struct.Struct("<Q")
+ERROR_SEPARATOR = "\0"
+
+
+def _align(size: int) -> int:
+    return (size + 7) // 8 * 8
+
+
+def _open_segment(
+    name: str, size: int | None
+) -> tuple[shared_memory.SharedMemory, memoryview, bool]:
+    """Create the segment `name` of `size` bytes, or attach to it if it
+    exists or `size` is None. Return it, its buffer and whether it was
+    created.
+
+    The segment isn't left to the resource tracker, which would remove
+    it when the process that created or attached to it exits, while
+    other processes still use it.
+    """
+    created = size is not None
+    try:
+        if sys.version_info >= (3, 13):
+            segment = shared_memory.SharedMemory(name, created, size or 0, track=False)
+        else:
+            segment = shared_memory.SharedMemory(name, created, size or 0)
+    except FileExistsError:
+        return _open_segment(name, None)[:2] + (False,)
+    if sys.version_info < (3, 13) and os.name == "posix":
+        resource_tracker.unregister(segment._name, "shared_memory")  # type: ignore[attr-defined]
+    # The buffer is only None once closed
+    return segment, segment.buf, created  # type: ignore[return-value]
+
+
+def _unlink_segment(segment: shared_memory.SharedMemory) -> None:
+    if sys.version_info < (3, 13) and os.name == "posix":
+        # unlink() unregisters the segment, which must be registered then
+        resource_tracker.register(segment._name, "shared_memory")  # type: ignore[attr-defined]
+    segment.unlink()
+
+
+class SharedCallMetrics(CallMetrics):
+    """Count calls, errors by exception type, and call durations of
+    callables, like `CallMetrics`, in the shared memory segment `name`,
+    so that `snapshot()` and `exposition()` return the counts of all
+    processes using it.
+
+    The segment is created with room for `processes` processes and
+    `slots` callables and exception types, or attached to if it already
+    exists with the same layout. Callables and exception types beyond
+    `slots` aren't counted, and names longer than 126 UTF-8 bytes are
+    cut. The process that created the segment removes it on `close()`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        slots: int = 256,
+        processes: int = 64,
+    ) -> None:
+        if fcntl is None:
+            raise RuntimeError("Shared metrics need file locks, not available on this platform")
+        if slots < 1 or processes < 1:
+            raise ValueError("Shared metrics need at least one slot and one process")
+        super().__init__(buckets)
+        self.name = name
+        self.slots = slots
+        self.processes = processes
+        self._layout()
+        # Locked so that other processes don't attach before the header is written
+        with self._file_lock():
+            self._segment, self._buf, created = _open_segment(name, self._size)
+            if created:
+                self._write_header()
+            else:
+                self._check_header()
+        self._closed = False
+        self._owner = os.getpid() if created else None
+        self._map()
+
+    @classmethod
+    def attach(cls, name: str) -> SharedCallMetrics:
+        """Attach to the existing segment `name`, e.g. to read the counts
+        from a process that doesn't count calls itself."""
+        segment, buf, _ = _open_segment(name, None)
+        try:
+            magic, processes, slots, bound_count = HEADER.unpack_from(buf)
+            if magic != MAGIC:
+                raise ValueError(f"{name} is not a loga shared metrics segment")
+            buckets = struct.unpack_from(f"<{bound_count}d", buf, HEADER.size)
+        finally:
+            segment.close()
+        return cls(name, buckets, slots, processes)
+
+    def _layout(self) -> None:
+        self._row = 2 + len(self.buckets) + 1
+        self._names_offset = _align(HEADER.size + 8 * len(self.buckets))
+        self._pids_offset = self._names_offset + NAME_SIZE * self.slots
+        self._counters_offset = self._pids_offset + COUNTER.size * self.processes
+        self._size = self._counters_offset + COUNTER.size * self._row * self.slots * self.processes
+
+    def _write_header(self) -> None:
+        HEADER.pack_into(self._buf, 0, MAGIC, self.processes, self.slots, len(self.buckets))
+        struct.pack_into(f"<{len(self.buckets)}d", self._buf, HEADER.size, *self.buckets)
+
+    def _check_header(self) -> None:
+        layout = HEADER.unpack_from(self._buf)
+        buckets = struct.unpack_from(f"<{layout[3]}d", self._buf, HEADER.size)
+        if layout != (MAGIC, self.processes, self.slots, len(self.buckets)) or (
+            buckets != self.buckets
+        ):
+            self._segment.close()
+            raise ValueError(
+                f"Shared metrics segment {self.name} exists with another layout,"
+                " remove it or configure the same slots, processes and buckets"
+            )
+
+    def _map(self) -> None:
+        self._pids = self._buf[self._pids_offset : self._counters_offset].cast("Q")
+        self._counters = self._buf[self._counters_offset : self._size].cast("Q")
+
+    def _reset(self) -> None:
+        super()._reset()
+        # Only this process's rows and the slots it has seen are kept
+        self._process: int | None = None
+        self._slot_of: dict[str, int | None] = {}
+
+    @contextlib.contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        path = os.path.join(tempfile.gettempdir(), f"loga-{self.name}.lock")
+        with open(path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_name(self, slot: int) -> str | None:
+        offset = self._names_offset + NAME_SIZE * slot
+        (length,) = NAME_LENGTH.unpack_from(self._buf, offset)
+        if not length:
+            return None
+        start = offset + NAME_LENGTH.size
+        return bytes(self._buf[start : start + length]).decode("utf-8", "replace")
+
+    def _claim_slot(self, name: str) -> int | None:
+        encoded = name.encode("utf-8")[: NAME_SIZE - NAME_LENGTH.size]
+        name = encoded.decode("utf-8", "ignore")
+        encoded = name.encode("utf-8")
+        with self._file_lock():
+            for slot in range(self.slots):
+                found = self._read_name(slot)
+                if found == name:
+                    return slot
+                if found is None:
+                    offset = self._names_offset + NAME_SIZE * slot
+                    start = offset + NAME_LENGTH.size
+                    self._buf[start : start + len(encoded)] = encoded
+                    # The length last, so that readers never see half a name
+                    NAME_LENGTH.pack_into(self._buf, offset, len(encoded))
+                    return slot
+        return None
+
+    def _claim_process(self) -> int | None:
+        """Claim a free row, or one of an exited process, whose counts
+        this process then adds to."""
+        with self._file_lock():
+            for process, pid in enumerate(self._pids):
+                if pid == 0 or not _is_running(pid):
+                    self._pids[process] = os.getpid()
+                    return process
+        return None
+
+    def _slot(self, name: str) -> int | None:
+        try:
+            return self._slot_of[name]
+        except KeyError:
+            slot = self._slot_of[name] = self._claim_slot(name)
+            return slot
+
+    def observe(self, name: str, seconds: float, exception_type: str | None = None) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            process = self._process
+            if process is None:
+                process = self._process = self._claim_process()
+                if process is None:
+                    return
+            counters = self._counters
+            slot = self._slot(name)
+            if slot is not None:
+                row = (process * self.slots + slot) * self._row
+                counters[row] += 1
+                counters[row + 1] += int(seconds * 1e9)
+                counters[row + 2 + bisect_left(self.buckets, seconds)] += 1
+            if exception_type is not None:
+                slot = self._slot(name + ERROR_SEPARATOR + exception_type)
+                if slot is not None:
+                    counters[(process * self.slots + slot) * self._row] += 1
+
+    def snapshot(self) -> SeriesByName:
+        """Return the counts of all processes, merged."""
+        merged: SeriesByName = {}
+        if self._closed:
+            return merged
+        counters = self._counters
+        for slot in range(self.slots):
+            name = self._read_name(slot)
+            if name is None:
+                break
+            name, _, exception_type = name.partition(ERROR_SEPARATOR)
+            series = merged.get(name)
+            if series is None:
+                series = merged[name] = _Series(len(self.buckets) + 1)
+            for process in range(self.processes):
+                row = (process * self.slots + slot) * self._row
+                if exception_type:
+                    count = counters[row]
+                    if count:
+                        series.errors[exception_type] = (
+                            series.errors.get(exception_type, 0) + count
+                        )
+                    continue
+                series.sum += counters[row + 1] / 1e9
+                for bucket in range(len(self.buckets) + 1):
+                    series.buckets[bucket] += counters[row + 2 + bucket]
+        return merged
+
+    def after_fork_in_child(self) -> None:
+        """Count the child's calls in rows of its own."""
+        self._reset()
+
+    def close(self) -> None:
+        """Detach from the segment, and remove it if this process
+        created it."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._pids.release()
+            self._counters.release()
+            self._segment.close()
+            if self._owner == os.getpid():
+                _unlink_segment(self._segment)
+                with contextlib.suppress(OSError):
+                    os.remove(os.path.join(tempfile.gettempdir(), f"loga-{self.name}.lock"))
+
+
+def _is_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Running, as another user
+        return True
+    return True
@@ -0,0 +1,136 @@
+"""Handlers that pass records to their target handler from a worker
+thread, so that a slow handler doesn't stall the others."""
+
+from __future__ import annotations
+
+from collections import deque
+import logging
+import threading
+import time
+from typing import Literal, NamedTuple, Tuple
+
+from . import _fork
+
+OverflowPolicy = Literal["drop_oldest", "drop_newest", "block"]
+OVERFLOW_POLICIES = frozenset({"drop_oldest", "drop_newest", "block"})
+# Longest time to wait for a queue to be handled when flushing or closing
+DRAIN_TIMEOUT = 5.0
+
+QueuedRecord = Tuple[float, logging.LogRecord]
+
+
+class SinkStats(NamedTuple):
+    queued: int  # records waiting to be handled
+    handled: int
+    dropped: int
+    mean_latency: float  # seconds from being queued to being handled
+    max_latency: float
+
+
+class QueuedSink(logging.Handler):
+    """Queue records for `target`, and handle them in a worker thread.
+
+    At most `queue_size` records are queued. When the queue is full,
+    the `overflow` policy either drops the oldest queued record, drops
+    the new record, or blocks the logging thread until there is space.
+    """
+
+    def __init__(
+        self,
+        target: logging.Handler,
+        queue_size: int = 10000,
+        overflow: OverflowPolicy = "drop_oldest",
+    ) -> None:
+        if queue_size < 1:
+            raise ValueError("Sink queue must hold at least one record")
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {overflow!r}")
+        super().__init__()
+        self.target = target
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self._start()
+
+    def _start(self) -> None:
+        self._queue: deque[QueuedRecord] = deque()
+        self._cond = threading.Condition(threading.Lock())
+        self._busy = False
+        self._stopping = False
+        self._handled = 0
+        self._dropped = 0
+        self._total_latency = 0.0
+        self._max_latency = 0.0
+        self._worker = threading.Thread(target=self._work, daemon=True)
+        self._worker.start()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        with self._cond:
+            if self._stopping:
+                self._dropped += 1
+                return
+            if len(self._queue) >= self.queue_size:
+                if self.overflow == "drop_newest":
+                    self._dropped += 1
+                    return
+                if self.overflow == "drop_oldest":
+                    self._queue.popleft()
+                    self._dropped += 1
+                else:
+                    self._cond.wait_for(
+                        lambda: len(self._queue) < self.queue_size or self._stopping
+                    )
+            self._queue.append((time.monotonic(), record))
+            self._cond.notify_all()
+
+    def _work(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue or self._stopping)
+                if not self._queue:
+                    return
+                queued_at, record = self._queue.popleft()
+                self._busy = True
+                # Wake up threads blocked on a full queue
+                self._cond.notify_all()
+            try:
+                self.target.handle(record)
+            except Exception:
+                self.handleError(record)
+            latency = time.monotonic() - queued_at
+            with self._cond:
+                self._busy = False
+                self._handled += 1
+                self._total_latency += latency
+                self._max_latency = max(self._max_latency, latency)
+                self._cond.notify_all()
+
+    def flush(self) -> None:
+        """Wait for the queued records to be handled, then flush the
+        target."""
+        with self._cond:
+            self._cond.wait_for(lambda: not self._queue and not self._busy, DRAIN_TIMEOUT)
+        self.target.flush()
+
+    def close(self) -> None:
+        with self._cond:
+            if self._stopping:
+                return
+            self._stopping = True
+            self._cond.notify_all()
+        # The worker handles what is queued before returning
+        self._worker.join(DRAIN_TIMEOUT)
+        self.target.close()
+        super().close()
+
+    def stats(self) -> SinkStats:
+        with self._cond:
+            mean = self._total_latency / self._handled if self._handled else 0.0
+            return SinkStats(
+                len(self._queue), self._handled, self._dropped, mean, self._max_latency
+            )
+
+    def after_fork_in_child(self) -> None:
+        # The queue was drained before the fork, and the worker thread
+        # only exists in the parent
+        _fork.reinit_handler(self.target)
+        self._start()
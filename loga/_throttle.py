@@ -0,0 +1,162 @@
+"""Throttling of call sites that make too many logs."""
+
+from __future__ import annotations
+
+import atexit
+from collections.abc import Callable
+import threading
+import time
+from typing import NamedTuple
+import weakref
+
+_throttles: weakref.WeakSet[Throttle] = weakref.WeakSet()
+
+
+class TalkerStats(NamedTuple):
+    callsite: str
+    events: int  # logs made, including throttled ones
+    throttled: int
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, now: float) -> None:
+        self.tokens = tokens
+        self.updated = now
+
+    def refill(self, now: float, rate: float, capacity: float) -> None:
+        self.tokens = min(capacity, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+
+
+class _Talker:
+    __slots__ = ("bucket", "events", "throttled", "unreported")
+
+    def __init__(self, bucket: _Bucket) -> None:
+        self.bucket = bucket
+        self.events = 0
+        self.throttled = 0
+        self.unreported = 0
+
+
+class Throttle:
+    """Limit the rate of logs with token buckets: one shared by all call
+    sites, refilled at `rate` logs per second, and one for each call
+    site, refilled at `callsite_rate`. Each bucket holds at most
+    `burst` seconds worth of logs.
+
+    A log is only made if both its call site's bucket and the shared
+    one have a token. Throttled logs are counted, and every
+    `notice_interval` seconds `on_notice(callsite, count)` is called
+    from a timer thread for each call site with throttled logs.
+    """
+
+    def __init__(
+        self,
+        rate: float | None,
+        callsite_rate: float | None,
+        burst: float,
+        notice_interval: float,
+        on_notice: Callable[[str, int], None],
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        for name, value in (("rate", rate), ("callsite_rate", callsite_rate)):
+            if value is not None and value <= 0:
+                raise ValueError(f"Throttle {name} must be positive")
+        if burst <= 0:
+            raise ValueError("Throttle burst must be positive")
+        if notice_interval <= 0:
+            raise ValueError("Throttle notice interval must be positive")
+        self._rate = rate
+        self._callsite_rate = callsite_rate
+        self._burst = burst
+        self._notice_interval = notice_interval
+        self._on_notice = on_notice
+        self._clock = clock
+        self._reset()
+        _throttles.add(self)
+
+    def _reset(self) -> None:
+        now = self._clock()
+        self._shared = _Bucket(self._capacity(self._rate), now)
+        self._talkers: dict[str, _Talker] = {}
+        self._lock = threading.Lock()
+        self._timer: threading.Timer | None = None
+
+    def _capacity(self, rate: float | None) -> float:
+        # At least one log can always be made once the bucket is full
+        return 0.0 if rate is None else max(1.0, rate * self._burst)
+
+    def admit(self, callsite: str) -> bool:
+        """Return True if a log from `callsite` should be made, False if
+        it was throttled."""
+        now = self._clock()
+        with self._lock:
+            talker = self._talkers.get(callsite)
+            if talker is None:
+                bucket = _Bucket(self._capacity(self._callsite_rate), now)
+                talker = self._talkers[callsite] = _Talker(bucket)
+            talker.events += 1
+            own = talker.bucket
+            shared = self._shared
+            if self._callsite_rate is not None:
+                own.refill(now, self._callsite_rate, self._capacity(self._callsite_rate))
+            if self._rate is not None:
+                shared.refill(now, self._rate, self._capacity(self._rate))
+            if (self._callsite_rate is None or own.tokens >= 1) and (
+                self._rate is None or shared.tokens >= 1
+            ):
+                own.tokens -= 1
+                shared.tokens -= 1
+                return True
+            talker.throttled += 1
+            talker.unreported += 1
+            if self._timer is None:
+                self._timer = threading.Timer(self._notice_interval, self._notify)
+                self._timer.daemon = True
+                self._timer.start()
+            return False
+
+    def _take_unreported(self) -> list[tuple[str, int]]:
+        unreported = []
+        for callsite, talker in self._talkers.items():
+            if talker.unreported:
+                unreported.append((callsite, talker.unreported))
+                talker.unreported = 0
+        return unreported
+
+    def _notify(self) -> None:
+        with self._lock:
+            self._timer = None
+            unreported = self._take_unreported()
+        # Called outside of the lock, as the notices are logged
+        for callsite, count in unreported:
+            self._on_notice(callsite, count)
+
+    def flush(self) -> None:
+        """Make the notices of throttled logs now."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            unreported = self._take_unreported()
+        for callsite, count in unreported:
+            self._on_notice(callsite, count)
+
+    def top_talkers(self, n: int | None = None) -> list[TalkerStats]:
+        """Return the call sites that made the most logs, most first."""
+        with self._lock:
+            stats = [TalkerStats(k, t.events, t.throttled) for k, t in self._talkers.items()]
+        stats.sort(key=lambda s: s.events, reverse=True)
+        return stats[:n]
+
+    def after_fork_in_child(self) -> None:
+        """Count the child's logs separately."""
+        self._reset()
+
+
+@atexit.register
+def _flush_all() -> None:
+    for throttle in list(_throttles):
+        throttle.flush()
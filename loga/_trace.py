@@ -0,0 +1,110 @@
+"""Chrome Trace Event output of decorated calls."""
+
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import pathlib
+import threading
+import time
+from typing import Any
+
+# Longest parameter string included in trace events
+TRACE_PARAMS_TRUNCATION = 200
+
+
+class ChromeTraceWriter:
+    """Write decorated calls as Chrome Trace Event JSON.
+
+    Each call is written as a complete ("X") event once it has returned
+    or raised, so the trace doesn't depend on which logs are made. The
+    output can be opened in chrome://tracing or https://ui.perfetto.dev.
+
+    Events are buffered, and written once `buffer_size` of them are
+    buffered. The output is valid JSON once the writer is closed, which
+    happens at exit at the latest, and an unterminated array that both
+    viewers accept until then.
+    """
+
+    def __init__(self, filename: str, buffer_size: int = 1000) -> None:
+        self.filename = os.path.abspath(os.path.expanduser(filename))
+        self.buffer_size = buffer_size
+        self._buffer: list[str] = []
+        self._lock = threading.Lock()
+        self._open()
+        atexit.register(self.close)
+
+    def _open(self) -> None:
+        pathlib.Path(os.path.dirname(self.filename)).mkdir(parents=True, exist_ok=True)
+        self._file = open(self.filename, "w", encoding="utf-8")
+        self._file.write("[\n")
+        self._file.flush()
+        self._first = True
+        self._pid = os.getpid()
+        # Converts perf_counter_ns() readings to microseconds since the epoch
+        self._epoch_ns = time.time_ns() - time.perf_counter_ns()
+
+    def complete(
+        self,
+        name: str,
+        start_ns: int,
+        end_ns: int,
+        params: Any = None,
+        exception_type: str | None = None,
+    ) -> None:
+        """Add a call that started and ended at the given
+        `time.perf_counter_ns()`s."""
+        args = {}
+        if params is not None:
+            params = str(params)
+            if len(params) > TRACE_PARAMS_TRUNCATION:
+                params = params[: TRACE_PARAMS_TRUNCATION - 3] + "..."
+            args["params"] = params
+        if exception_type is not None:
+            args["exception_type"] = exception_type
+        trace_event = {
+            "name": name,
+            "cat": "loga",
+            "ph": "X",
+            "ts": (self._epoch_ns + start_ns) / 1000,
+            "dur": (end_ns - start_ns) / 1000,
+            "pid": self._pid,
+            "tid": threading.get_ident(),
+            "args": args,
+        }
+        self._buffer.append(json.dumps(trace_event, default=str))
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._write_buffer()
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._write_buffer()
+                self._file.write("\n]\n")
+                self._file.close()
+
+    def _write_buffer(self) -> None:
+        if self._buffer and not self._file.closed:
+            # Events added by other threads while writing are kept
+            events = self._buffer[:]
+            del self._buffer[: len(events)]
+            separator = "" if self._first else ",\n"
+            self._file.write(separator + ",\n".join(events))
+            self._file.flush()
+            self._first = False
+
+    def after_fork_in_child(self) -> None:
+        """Write the child's events to a file of its own, suffixed with
+        its process id."""
+        self._lock = threading.Lock()
+        # The parent's buffer was flushed before the fork
+        self._buffer.clear()
+        self._file.close()
+        path = pathlib.Path(self.filename)
+        self.filename = str(path.with_name(f"{path.stem}.{os.getpid()}{path.suffix}"))
+        self._open()
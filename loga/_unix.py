@@ -0,0 +1,200 @@
+"""Sending logs to a local log shipper over a Unix domain socket."""
+
+from __future__ import annotations
+
+from collections import deque
+import errno
+import logging
+import socket
+import struct
+import threading
+import time
+from typing import Literal
+
+from ._multiprocess import close_at_exit
+
+SocketType = Literal["stream", "datagram"]
+# Each event is prefixed by its length, as 4 bytes in network byte order
+FRAME_LENGTH = struct.Struct("!I")
+# Most bytes sent in one datagram, unless a single event is larger
+DATAGRAM_SIZE = 65536
+# Most bytes joined into one write to a stream socket
+STREAM_BATCH_SIZE = 1 << 18
+# Longest time to wait for buffered events to be sent when closing
+CLOSE_TIMEOUT = 1.0
+
+
+class UnixSocketHandler(logging.Handler):
+    """Send formatted records, each prefixed by its length, to the Unix
+    domain socket at `path`, of type "stream" or "datagram".
+
+    Records are buffered, and sent in batches when `batch_size` records
+    are buffered, when a record of `flush_level` or higher is handled,
+    and every `flush_interval` seconds. The socket is non-blocking:
+    what it doesn't take is kept for the next flush, and if it is
+    disconnected, reconnecting is tried at most every
+    `reconnect_interval` seconds. At most `buffer_size` bytes are kept,
+    the oldest records are dropped, and counted in `dropped`, beyond
+    that. A batch cut short by a disconnection is sent again whole, so
+    its records may be received twice.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        socket_type: SocketType = "stream",
+        batch_size: int = 100,
+        flush_interval: float = 0.2,
+        flush_level: int = logging.ERROR,
+        buffer_size: int = 4 << 20,
+        reconnect_interval: float = 1.0,
+    ) -> None:
+        if socket_type not in {"stream", "datagram"}:
+            raise ValueError(f"Unknown socket type {socket_type!r}")
+        if batch_size < 1 or buffer_size < 1:
+            raise ValueError("Batch and buffer sizes must be positive")
+        super().__init__()
+        self.path = path
+        self.socket_type = socket_type
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.flush_level = flush_level
+        self.buffer_size = buffer_size
+        self.reconnect_interval = reconnect_interval
+        self.dropped = 0
+        self._start()
+
+    def _start(self) -> None:
+        self._frames: deque[bytes] = deque()
+        self._buffered = 0
+        # A batch taken from the frames, and how much of it was sent
+        self._batch = b""
+        self._batch_frames = 0
+        self._sent = 0
+        self._sock: socket.socket | None = None
+        self._next_connect = 0.0
+        self._stopping = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+        self._flusher.start()
+        # Sent when multiprocessing children exit too
+        self._finalizer = close_at_exit(self)
+
+    def after_fork_in_child(self) -> None:
+        """Send only the child's records, over a socket of its own."""
+        if self._sock is not None:
+            self._sock.close()
+        self._finalizer.cancel()
+        self._start()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            data = self.format(record).encode("utf-8")
+            frame = FRAME_LENGTH.pack(len(data)) + data
+            self._frames.append(frame)
+            self._buffered += len(frame)
+            while self._buffered > self.buffer_size and self._frames:
+                self._buffered -= len(self._frames.popleft())
+                self.dropped += 1
+            if len(self._frames) >= self.batch_size or record.levelno >= self.flush_level:
+                self._send()
+        except Exception:
+            self.handleError(record)
+
+    def _connect(self) -> socket.socket | None:
+        if self._sock is not None:
+            return self._sock
+        now = time.monotonic()
+        if now < self._next_connect:
+            return None
+        self._next_connect = now + self.reconnect_interval
+        kind = socket.SOCK_STREAM if self.socket_type == "stream" else socket.SOCK_DGRAM
+        sock = socket.socket(socket.AF_UNIX, kind)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            return None
+        sock.setblocking(False)
+        self._sock = sock
+        return sock
+
+    def _disconnect(self) -> None:
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        # Sent again whole on the next connection
+        self._sent = 0
+
+    def _take_batch(self) -> None:
+        limit = DATAGRAM_SIZE if self.socket_type == "datagram" else STREAM_BATCH_SIZE
+        frames: list[bytes] = []
+        size = 0
+        while self._frames and (not frames or size + len(self._frames[0]) <= limit):
+            frame = self._frames.popleft()
+            frames.append(frame)
+            size += len(frame)
+        self._buffered -= size
+        self._batch = b"".join(frames)
+        self._batch_frames = len(frames)
+        self._sent = 0
+
+    def _send(self) -> None:
+        """Send buffered frames until the socket takes no more. Called
+        with the handler's lock held."""
+        while self._batch or self._frames:
+            sock = self._connect()
+            if sock is None:
+                return
+            if not self._batch:
+                self._take_batch()
+            try:
+                if self.socket_type == "datagram":
+                    sock.send(self._batch)
+                    self._sent = len(self._batch)
+                else:
+                    self._sent += sock.send(memoryview(self._batch)[self._sent :])
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as error:
+                if self.socket_type == "datagram" and error.errno == errno.EMSGSIZE:
+                    # Too large for any datagram, never sendable
+                    self.dropped += self._batch_frames
+                    self._batch = b""
+                    continue
+                self._disconnect()
+                return
+            if self._sent == len(self._batch):
+                self._batch = b""
+                self._sent = 0
+
+    def flush(self) -> None:
+        self.acquire()
+        try:
+            self._send()
+        finally:
+            self.release()
+
+    def _flush_periodically(self) -> None:
+        while not self._stopping.wait(self.flush_interval):
+            self.flush()
+
+    def close(self) -> None:
+        if self._stopping.is_set():
+            return
+        self._stopping.set()
+        self._finalizer.cancel()
+        self.acquire()
+        try:
+            deadline = time.monotonic() + CLOSE_TIMEOUT
+            self._next_connect = 0.0
+            while (self._batch or self._frames) and time.monotonic() < deadline:
+                self._send()
+                if self._sock is None:
+                    # No one is listening
+                    break
+                if self._batch or self._frames:
+                    time.sleep(0.01)
+            self._disconnect()
+        finally:
+            self.release()
+            super().close()
@@ -0,0 +1,106 @@
+import json
+from unittest.mock import patch
+
+import pytest
+
+from loga import Loga
+from loga import _analyze
+from loga.__main__ import main
+
+WORK = "write_calls.<locals>.work"
+
+
+def write_calls(logfile, logfile_format, facility):
+    loga = Loga(
+        facility=facility,
+        do_write=True,
+        logfile=str(logfile),
+        logfile_format=logfile_format,
+        log_if_graylog_disabled=False,
+    )
+
+    now = [1000.0]
+
+    @loga
+    def work(n):
+        now[0] += n
+        if n % 4 == 3:
+            raise ValueError(f"Bad {n}\nsecond line")
+        return n
+
+    # Each call takes n seconds, and errors are logged with a traceback
+    with patch("time.time", side_effect=lambda: now[0]):
+        for n in range(8):
+            try:
+                work(n)
+            except ValueError:
+                pass
+    loga.info("not a decorated call")
+    loga.close()
+
+
+class TestAnalyze:
+    @pytest.mark.parametrize("logfile_format", ["text", "json"])
+    def test_report(self, tmp_path, logfile_format):
+        logfile = tmp_path / "logs.txt"
+        write_calls(logfile, logfile_format, f"analyze-{logfile_format}")
+        report = _analyze.analyze([str(logfile)])
+        assert list(report) == [WORK]
+        work = report[WORK]
+        assert work.calls == 8
+        assert work.errors == 2
+        assert work.error_rate == 0.25
+        assert work.unfinished == 0
+        assert (work.p50, work.p90, work.p99, work.max) == (3.0, 7.0, 7.0, 7.0)
+
+    def test_chunks_split_calls(self, tmp_path):
+        logfile = tmp_path / "logs.txt"
+        write_calls(logfile, "json", "analyze-chunks")
+        single = _analyze.analyze([str(logfile)])
+        size = logfile.stat().st_size
+        with patch.object(_analyze, "MIN_CHUNK_SIZE", 1):
+            chunks = _analyze._chunks([str(logfile)], processes=2)
+            assert len(chunks) == 8
+            assert chunks[-1][2] == size
+            assert _analyze._merge(_analyze._analyse_chunk(*c) for c in chunks).report() == single
+            assert _analyze.analyze([str(logfile)], processes=2) == single
+
+    def test_unfinished_and_unmatched(self, tmp_path):
+        logfile = tmp_path / "logs.txt"
+        logfile.write_text(
+            "2024-01-01 00:00:00 UTC\t*Returned from gone(x=1) with int (1)\t10\n"
+            "2024-01-01 00:00:00 UTC\t*Called slow(x=1)\t10\n"
+            "2024-01-01 00:00:01 UTC\t*Called slow(x=2)\t10\n"
+            "2024-01-01 00:00:03 UTC\t*Returned None from slow(x=1)\t10\n"
+        )
+        report = _analyze.analyze([str(logfile)])
+        assert list(report) == ["slow"]
+        assert report["slow"].calls == 1
+        assert report["slow"].max == 3.0
+        assert report["slow"].unfinished == 1
+
+    def test_empty_file(self, tmp_path):
+        logfile = tmp_path / "logs.txt"
+        logfile.touch()
+        assert _analyze.analyze([str(logfile)], processes=2) == {}
+
+    def test_cli(self, tmp_path, capsys):
+        logfile = tmp_path / "logs.txt"
+        write_calls(logfile, "text", "analyze-cli")
+        main(["analyze", str(logfile)])
+        header, row = capsys.readouterr().out.splitlines()
+        assert header.split() == [
+            "callable",
+            "calls",
+            "errors",
+            "error",
+            "%",
+            "p50",
+            "p90",
+            "p99",
+            "max",
+            "unfinished",
+        ]
+        assert row.split() == [WORK, "8", "2", "25.0", "3.000", "7.000", "7.000", "7.000", "0"]
+        main(["analyze", "--json", str(logfile)])
+        assert json.loads(capsys.readouterr().out)[WORK]["calls"] == 8
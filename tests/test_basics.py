@@ -259,6 +259,16 @@ class TestDecoration:
             (alert, logged_msg), extras = logger.call_args
             assert logged_msg == '*Errored during ForErrors.one() with ValueError "Boom!"'
 
+    def test_error_deco_success_not_represented(self):
+        """Test that successful calls of @loga.errors callables don't represent
+        their arguments or make a couplet."""
+        with patch.object(Loga, "_prepare_call") as prepare, patch("uuid.uuid1") as uuid1:
+            with patch("logging.Logger.log") as logger:
+                assert ForErrors().two()
+        prepare.assert_not_called()
+        uuid1.assert_not_called()
+        logger.assert_not_called()
+
     def test_private_keyword_removal(self):
         with patch("logging.Logger.log") as logger:
             mnem = "every good boy deserves fruit"
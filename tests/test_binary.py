@@ -0,0 +1,191 @@
+import io
+import json
+import logging
+import os
+from unittest.mock import patch
+import uuid
+
+import pytest
+
+from loga import Loga
+from loga import _analyze, _binary
+from loga.__main__ import main
+from loga._loga import JsonLogFormatter, LocalLogFormatter
+from tests.test_fork import run_in_fork
+
+
+def write_logs(logfile, logfile_format, facility):
+    loga = Loga(
+        facility=facility,
+        do_write=True,
+        logfile=str(logfile),
+        logfile_format=logfile_format,
+        log_if_graylog_disabled=False,
+    )
+
+    @loga
+    def work(n):
+        if n == 3:
+            raise ValueError("Bad ü\nsecond line")
+        return n
+
+    with patch("time.time", return_value=1000.25):
+        for n in range(5):
+            try:
+                work(n)
+            except ValueError:
+                pass
+        loga.log(logging.WARNING, "manual", extra={"user": "someone"})
+    loga.close()
+
+
+class TestBinaryFormat:
+    def test_read_records(self, tmp_path):
+        logfile = tmp_path / "logs.bin"
+        write_logs(logfile, "binary", "binary-read")
+        records = list(_binary.read_records(str(logfile)))
+        assert len(records) == 11
+        called = records[0]
+        assert called["time"] == 1000.25
+        assert called["level"] == logging.DEBUG
+        assert called["message"] == "*Called write_logs.<locals>.work(n=0)"
+        assert called["event"] == "called"
+        assert called["n"] == "0"
+        assert called["decorated"] is True
+        assert called["number_of_params"] == 1
+        assert isinstance(called["couplet"], uuid.UUID)
+        assert records[1]["couplet"] == called["couplet"]
+        assert records[7]["exception_msg"] == "Bad ü\nsecond line"
+        assert records[-1]["user"] == "someone"
+
+    def test_value_types(self, tmp_path):
+        logfile = tmp_path / "logs.bin"
+        handler = _binary.BinaryFileHandler(str(logfile))
+        values = {"count": -300, "ratio": 0.5, "flag": False, "none": None, "other": object}
+        handler.handle(logging.makeLogRecord({"msg": "typed", "levelno": 20, **values}))
+        handler.close()
+        (record,) = _binary.read_records(str(logfile))
+        assert record == {
+            "time": record["time"],
+            "level": 20,
+            "message": "typed",
+            **values,
+            "other": str(object),
+        }
+
+    @pytest.mark.parametrize("to", ["text", "json"])
+    def test_converted_like_written(self, tmp_path, to):
+        binary = tmp_path / "logs.bin"
+        written = tmp_path / "logs.txt"
+        write_logs(binary, "binary", f"binary-{to}")
+        write_logs(written, to, f"binary-{to}-written")
+        output = io.StringIO()
+        formatter = JsonLogFormatter() if to == "json" else LocalLogFormatter()
+        _binary.convert(str(binary), output, formatter)
+        converted = output.getvalue().splitlines()
+        expected = written.read_text(encoding="utf-8").splitlines()
+        if to == "json":
+            # Couplets differ between the files
+            assert [{**json.loads(line), "couplet": None} for line in converted] == [
+                {**json.loads(line), "couplet": None} for line in expected
+            ]
+        else:
+            assert converted == expected
+
+    def test_smaller_than_text(self, tmp_path):
+        binary = tmp_path / "logs.bin"
+        text = tmp_path / "logs.json"
+        write_logs(binary, "binary", "binary-size")
+        write_logs(text, "json", "binary-size-json")
+        assert binary.stat().st_size < text.stat().st_size * 0.6
+
+    def test_segments_and_torn_frames(self, tmp_path):
+        logfile = tmp_path / "logs.bin"
+        with patch.object(_binary, "SEGMENT_RECORDS", 2):
+            write_logs(logfile, "binary", "binary-segments")
+            # Reopening the file starts a new segment too
+            write_logs(logfile, "binary", "binary-segments")
+        records = list(_binary.read_records(str(logfile)))
+        assert len(records) == 22
+        assert records[11]["message"] == records[0]["message"]
+        with open(logfile, "ab") as f:
+            f.write(b"R\x7f\x00")
+        assert len(list(_binary.read_records(str(logfile)))) == 22
+
+    def test_flushed_from_errors(self, tmp_path):
+        logfile = tmp_path / "logs.bin"
+        handler = _binary.BinaryFileHandler(str(logfile))
+        handler.handle(logging.makeLogRecord({"msg": "buffered", "levelno": logging.INFO}))
+        assert list(_binary.read_records(str(logfile))) == []
+        handler.handle(logging.makeLogRecord({"msg": "failed", "levelno": logging.ERROR}))
+        messages = [r["message"] for r in _binary.read_records(str(logfile))]
+        assert messages == ["buffered", "failed"]
+        handler.close()
+
+    def test_reopened_in_own_file_after_fork(self, tmp_path):
+        logfile = tmp_path / "logs.bin"
+        handler = _binary.BinaryFileHandler(str(logfile))
+        handler.handle(logging.makeLogRecord({"msg": "parent", "levelno": logging.INFO}))
+        handler.flush()
+        handler.after_fork_in_child()
+        assert handler.stream is None
+        handler.handle(logging.makeLogRecord({"msg": "child", "levelno": logging.INFO}))
+        handler.close()
+        assert handler.baseFilename == str(tmp_path / f"logs.{os.getpid()}.bin")
+        assert [r["message"] for r in _binary.read_records(str(logfile))] == ["parent"]
+        messages = [r["message"] for r in _binary.read_records(handler.baseFilename)]
+        assert messages == ["child"]
+
+    def test_forked_children_write_own_file(self, tmp_path):
+        logfile = tmp_path / "logs.bin"
+        loga = Loga(
+            facility="binary-fork",
+            do_write=True,
+            logfile=str(logfile),
+            logfile_format="binary",
+            log_if_graylog_disabled=False,
+        )
+        loga.log(logging.INFO, "parent before", extra={"side": "parent"})
+
+        def child():
+            loga.log(logging.INFO, "child", extra={"who": "child"})
+            loga.close()
+            return True
+
+        assert run_in_fork(child) == 0
+        loga.log(logging.INFO, "parent after", extra={"side": "parent"})
+        loga.close()
+        records = list(_binary.read_records(str(logfile)))
+        assert [(r["message"], r["side"]) for r in records] == [
+            ("parent before", "parent"),
+            ("parent after", "parent"),
+        ]
+        (child_file,) = tmp_path.glob("logs.*.bin")
+        (record,) = _binary.read_records(str(child_file))
+        assert (record["message"], record["who"]) == ("child", "child")
+
+    def test_analyze(self, tmp_path):
+        logfile = tmp_path / "logs.bin"
+        write_logs(logfile, "binary", "binary-analyze")
+        report = _analyze.analyze([str(logfile)], processes=2)
+        work = report["write_logs.<locals>.work"]
+        assert (work.calls, work.errors, work.unfinished) == (5, 1, 0)
+
+    def test_cli(self, tmp_path, capsys):
+        logfile = tmp_path / "logs.bin"
+        write_logs(logfile, "binary", "binary-cli")
+        main(["convert", str(logfile)])
+        lines = capsys.readouterr().out.splitlines()
+        assert lines[0].split("\t")[1:] == ["*Called write_logs.<locals>.work(n=0)", "10"]
+        output = tmp_path / "logs.json"
+        main(["convert", str(logfile), "--to", "json", "-o", str(output)])
+        assert json.loads(output.read_text().splitlines()[-1])["message"] == "manual"
+
+    def test_not_indexed(self, tmp_path):
+        with pytest.raises(ValueError):
+            Loga(
+                do_write=True,
+                logfile=str(tmp_path / "logs.bin"),
+                logfile_format="binary",
+                logfile_index=True,
+            )
@@ -0,0 +1,114 @@
+import asyncio
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from loga import Loga
+
+loga = Loga(facility="bind", log_if_graylog_disabled=False, private_data={"secret"})
+
+
+@loga
+def step(n):
+    return n
+
+
+def logged_extras(logger):
+    return [c.kwargs["extra"] for c in logger.call_args_list]
+
+
+class TestBind:
+    def test_decorated_and_manual_logs(self):
+        with patch("logging.Logger.log") as logger:
+            with loga.bind(request_id=42, secret="hunter2"):
+                step(1)
+                loga.info("manual", extra={"other": "data"})
+            loga.info("unbound")
+        called, returned, manual, unbound = logged_extras(logger)
+        for extra in called, returned, manual:
+            assert extra["request_id"] == "42"
+            assert extra["secret"] == "********"
+        assert manual["other"] == "data"
+        assert "request_id" not in unbound
+
+    def test_sanitised_once(self):
+        with patch.object(loga, "sanitise", wraps=loga.sanitise) as sanitise:
+            with loga.bind(request_id=1):
+                with patch("logging.Logger.log"):
+                    for n in range(3):
+                        step(n)
+        bound_calls = [c for c in sanitise.call_args_list if "request_id" in c.args[0]]
+        assert len(bound_calls) == 1
+
+    def test_nesting_precedence_and_unbind(self):
+        with patch("logging.Logger.log") as logger:
+            with loga.bind(a=1, b=1):
+                with loga.bind(b=2):
+                    loga.info("inner", extra={"a": "explicit"})
+                loga.info("outer")
+                loga.unbind("a")
+                loga.info("unbound a")
+        inner, outer, unbound = logged_extras(logger)
+        assert (inner["a"], inner["b"]) == ("explicit", "2")
+        assert (outer["a"], outer["b"]) == ("1", "1")
+        assert "a" not in unbound and unbound["b"] == "1"
+
+    def test_without_context_manager(self):
+        def bind_in_thread():
+            loga.bind(worker="yes")
+            loga.info("in thread")
+
+        with patch("logging.Logger.log") as logger:
+            thread = threading.Thread(target=bind_in_thread)
+            thread.start()
+            thread.join()
+            loga.info("main thread")
+        in_thread, main_thread = logged_extras(logger)
+        assert in_thread["worker"] == "yes"
+        assert "worker" not in main_thread
+
+    def test_asyncio_tasks(self):
+        async def handle(request_id):
+            with loga.bind(request_id=request_id):
+                await asyncio.sleep(0.01 * (3 - request_id))
+                loga.info(f"request {request_id}")
+
+        async def serve():
+            await asyncio.gather(*(handle(i) for i in range(3)))
+
+        with patch("logging.Logger.log") as logger:
+            asyncio.run(serve())
+        assert {c.args[1]: c.kwargs["extra"]["request_id"] for c in logger.call_args_list} == {
+            "request 0": "0",
+            "request 1": "1",
+            "request 2": "2",
+        }
+
+    def test_flight_recorder_keeps_bound_fields(self):
+        recording = Loga(
+            facility="bind-recorder", log_if_graylog_disabled=False, flight_recorder_size=4
+        )
+
+        @recording
+        def recorded():
+            pass
+
+        @recording
+        def fails():
+            raise ValueError
+
+        # Instances don't share bound fields
+        with loga.bind(request_id="other instance"):
+            with recording.bind(request_id="first"):
+                recorded()
+        with patch("logging.Logger.log") as logger:
+            with recording.bind(request_id="second"):
+                with pytest.raises(ValueError):
+                    fails()
+        assert [e["request_id"] for e in logged_extras(logger)] == [
+            "first",
+            "first",
+            "second",
+            "second",
+        ]
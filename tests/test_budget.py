@@ -0,0 +1,87 @@
+import json
+from unittest.mock import patch
+
+import pytest
+
+from loga import Loga
+from loga._budget import EventBudget
+
+loga = Loga(facility="budget", log_if_graylog_disabled=False, event_budget=2000)
+
+
+# A callable with 20 parameters, p0 to p19
+namespace: dict = {}
+exec(f"def takes({', '.join(f'p{i}' for i in range(20))}):\n    return 20", namespace)
+takes = loga(namespace["takes"])
+
+
+@loga
+def fails(data):
+    raise ValueError(data)
+
+
+def event_size(msg, extra, measure=len):
+    return measure(msg) + sum(measure(k) + measure(str(v)) for k, v in extra.items())
+
+
+class TestEventBudget:
+    def test_many_large_params(self):
+        params = ["x" * 5000 for _ in range(20)]
+        with patch("logging.Logger.log") as logger:
+            takes(*params)
+        for log in logger.call_args_list:
+            msg, extra = log.args[1], log.kwargs["extra"]
+            assert event_size(msg, extra) <= 2000
+            assert msg.endswith("...")
+            cut = extra["cut_fields"].split(",")
+            assert {"message", "params", "call_signature", "p0", "p19"} <= set(cut)
+            assert extra["p19"].endswith("...")
+        # Small values are kept whole
+        returned = logger.call_args_list[1].kwargs["extra"]
+        assert returned["return_value"] == "(20)"
+        assert returned["callable"] == "takes"
+
+    def test_fair_shares(self):
+        budget = EventBudget(100)
+        extra = {"a": "1" * 10, "b": "2" * 100, "c": "3" * 1000}
+        msg = budget.apply("m" * 5, extra)
+        assert msg == "m" * 5
+        assert extra["a"] == "1" * 10
+        # Both cut to the same size
+        assert len(extra["b"]) == len(extra["c"])
+        assert extra["b"].startswith("222") and extra["c"].endswith("...")
+        assert extra["cut_fields"] == "b,c"
+        assert event_size(msg, extra) <= 100
+
+    def test_within_budget_untouched(self):
+        extra = {"a": "small"}
+        assert EventBudget(100).apply("message", extra) == "message"
+        assert extra == {"a": "small"}
+
+    def test_traceback_keeps_its_end(self):
+        with patch("logging.Logger.log") as logger:
+            with pytest.raises(ValueError):
+                fails("y" * 10000)
+        extra = logger.call_args.kwargs["extra"]
+        assert extra["traceback"].startswith("...")
+        assert extra["traceback"].rstrip().endswith("y")
+        assert "traceback" in extra["cut_fields"]
+
+    def test_bytes(self):
+        budget = EventBudget(300, unit="bytes")
+        extra = {"text": "ü" * 500, "data": json.dumps(["é"] * 100)}
+        msg = budget.apply("ä" * 200, extra)
+        assert event_size(msg, extra, lambda s: len(s.encode())) <= 300
+        # Characters aren't split
+        assert extra["text"].rstrip(".").strip("ü") == ""
+
+    def test_manual_logs(self):
+        with patch("logging.Logger.log") as logger:
+            loga.info("z" * 3000, extra={"big": "w" * 3000})
+        msg, extra = logger.call_args.args[1], logger.call_args.kwargs["extra"]
+        assert event_size(msg, extra) <= 2000
+        assert extra["cut_fields"] == "message,big"
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            EventBudget(100, unit="lines")  # type: ignore[arg-type]
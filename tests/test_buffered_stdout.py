@@ -0,0 +1,120 @@
+import gc
+import io
+import logging
+import time
+import weakref
+
+import pytest
+
+from loga import Loga
+from loga._buffered import BufferedStreamHandler
+
+
+class CountingStream(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def write(self, s):
+        self.writes += 1
+        return super().write(s)
+
+
+def record(msg, level=logging.INFO):
+    return logging.makeLogRecord({"msg": msg, "levelno": level, "levelname": "x"})
+
+
+class TestBufferedStdout:
+    def test_size(self):
+        stream = CountingStream()
+        handler = BufferedStreamHandler(stream, buffer_size=10, flush_interval=60)
+        try:
+            handler.handle(record("abcd"))
+            assert stream.getvalue() == ""
+            # 5 characters each, with the newline
+            handler.handle(record("efgh"))
+            assert stream.getvalue() == "abcd\nefgh\n"
+            assert stream.writes == 1
+        finally:
+            handler.close()
+
+    def test_errors(self):
+        stream = CountingStream()
+        handler = BufferedStreamHandler(stream, flush_interval=60)
+        try:
+            handler.handle(record("info"))
+            handler.handle(record("warning", logging.WARNING))
+            assert stream.getvalue() == ""
+            handler.handle(record("error", logging.ERROR))
+            assert stream.getvalue() == "info\nwarning\nerror\n"
+        finally:
+            handler.close()
+
+    def test_interval(self):
+        stream = CountingStream()
+        handler = BufferedStreamHandler(stream, flush_interval=0.01)
+        try:
+            handler.handle(record("soon"))
+            deadline = time.monotonic() + 5
+            while not stream.getvalue() and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert stream.getvalue() == "soon\n"
+        finally:
+            handler.close()
+
+    def test_flush_and_close(self):
+        stream = CountingStream()
+        handler = BufferedStreamHandler(stream, flush_interval=60)
+        handler.handle(record("flushed"))
+        handler.flush()
+        assert stream.getvalue() == "flushed\n"
+        handler.handle(record("closed"))
+        handler.close()
+        assert stream.getvalue() == "flushed\nclosed\n"
+
+    def test_fewer_writes(self):
+        buffered_stream = CountingStream()
+        handler = BufferedStreamHandler(buffered_stream, flush_interval=60)
+        stream = CountingStream()
+        unbuffered = logging.StreamHandler(stream)
+        for i in range(1000):
+            handler.handle(record(f"log {i}"))
+            unbuffered.handle(record(f"log {i}"))
+        handler.close()
+        assert buffered_stream.getvalue() == stream.getvalue()
+        assert (buffered_stream.writes, stream.writes) == (1, 1000)
+
+    def test_invalid_size(self):
+        with pytest.raises(ValueError):
+            BufferedStreamHandler(io.StringIO(), buffer_size=0)
+
+    def test_loga(self, capsys):
+        loga = Loga(
+            facility="buffered-stdout",
+            log_if_graylog_disabled=False,
+            do_print=True,
+            print_buffer_size=1 << 20,
+            print_flush_interval=60,
+        )
+
+        @loga
+        def double(n):
+            return n * 2
+
+        double(2)
+        assert capsys.readouterr().out == ""
+        loga.flush()
+        out = capsys.readouterr().out
+        assert "*Called" in out and "with int (4)" in out
+        loga.error("failed")
+        assert "failed" in capsys.readouterr().out
+        loga.close()
+
+    def test_closed_handlers_are_freed(self):
+        handler = BufferedStreamHandler(io.StringIO(), flush_interval=60)
+        handler.close()
+        handler._flusher.join(5)
+        ref = weakref.ref(handler)
+        del handler
+        gc.collect()
+        assert ref() is None
@@ -0,0 +1,178 @@
+from array import array
+import ast
+import csv
+import logging
+import math
+import uuid
+
+import pytest
+
+from loga import Loga
+from loga._columns import EventStore
+
+try:
+    import numpy
+except ModuleNotFoundError:
+    numpy = None  # type: ignore[assignment]
+
+backends = pytest.mark.parametrize(
+    "use_numpy",
+    [
+        False,
+        pytest.param(True, marks=pytest.mark.skipif(numpy is None, reason="Requires NumPy")),
+    ],
+)
+
+
+def event(name, kind, created, couplet):
+    return logging.makeLogRecord(
+        {
+            "decorated": True,
+            "callable": name,
+            "event": kind,
+            "created": created,
+            "couplet": couplet,
+        }
+    )
+
+
+def fill(store):
+    """Add 10 calls of "fast", 1 in 10 raising, 2 of "slow" and one
+    unfinished call of "slow"."""
+    for i in range(10):
+        couplet = uuid.uuid1()
+        store.handle(event("fast", "called", 100.0 + i, couplet))
+        ended = "errored" if i == 9 else "returned"
+        store.handle(event("fast", ended, 100.0 + i + (i + 1) / 100, couplet))
+    for created, duration in (200.0, 2.0), (300.0, 3.0):
+        couplet = uuid.uuid1()
+        store.handle(event("slow", "called", created, couplet))
+        store.handle(event("slow", "returned_none", created + duration, couplet))
+    store.handle(event("slow", "called", 400.0, uuid.uuid1()))
+    # Not events of decorated calls
+    store.handle(logging.makeLogRecord({"msg": "manual"}))
+
+
+def read_npy(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    assert data[:8] == b"\x93NUMPY\x01\x00"
+    header_length = int.from_bytes(data[8:10], "little")
+    assert (10 + header_length) % 64 == 0
+    header = ast.literal_eval(data[10 : 10 + header_length].decode())
+    typecodes = {"<f8": "d", "<u4": "I", "|u1": "B", "<u8": "Q"}
+    values = array(typecodes[header["descr"]])
+    values.frombytes(data[10 + header_length :])
+    assert header["shape"] == (len(values),)
+    return values
+
+
+class TestEventStore:
+    @backends
+    def test_columns_grow_in_chunks(self, use_numpy):
+        store = EventStore(chunk_size=4, use_numpy=use_numpy)
+        fill(store)
+        assert len(store) == 25
+        columns = store.columns()
+        assert set(columns) == {
+            "time",
+            "duration",
+            "callable",
+            "event",
+            "couplet_high",
+            "couplet_low",
+        }
+        assert all(len(column) == 25 for column in columns.values())
+        assert store.callables == ["fast", "slow"]
+        assert list(columns["event"][:4]) == [0, 1, 0, 1]
+        assert math.isnan(columns["duration"][0])
+        assert columns["duration"][1] == pytest.approx(0.01)
+        assert columns["duration"][-2] == pytest.approx(3.0)
+        assert int(columns["couplet_high"][0]) << 64 | int(columns["couplet_low"][0]) > 0
+
+    @backends
+    def test_summary(self, use_numpy):
+        store = EventStore(chunk_size=3, use_numpy=use_numpy)
+        fill(store)
+        fast, slow = store.summary().values()
+        assert (fast.calls, fast.errors, fast.error_rate) == (10, 1, 0.1)
+        assert (fast.p50, fast.p90, fast.p99, fast.max) == pytest.approx((0.05, 0.09, 0.1, 0.1))
+        assert (slow.calls, slow.p50, slow.max, slow.unfinished) == (2, 2.0, 3.0, 1)
+
+    @backends
+    def test_export(self, use_numpy, tmp_path):
+        store = EventStore(chunk_size=5, use_numpy=use_numpy)
+        fill(store)
+        store.to_npy(str(tmp_path / "npy"))
+        durations = read_npy(tmp_path / "npy" / "duration.npy")
+        assert durations[1] == pytest.approx(0.01)
+        assert list(read_npy(tmp_path / "npy" / "callable.npy")) == [0] * 20 + [1] * 5
+        assert list(read_npy(tmp_path / "npy" / "event.npy"))[20:] == [0, 2, 0, 2, 0]
+        if numpy is not None:
+            assert numpy.array_equal(
+                numpy.load(tmp_path / "npy" / "time.npy"), store.columns()["time"]
+            )
+        names = (tmp_path / "npy" / "callables.txt").read_text()
+        assert names == "fast\nslow\n"
+
+        store.to_csv(str(tmp_path / "events.csv"))
+        with open(tmp_path / "events.csv", newline="") as f:
+            rows = list(csv.DictReader(f))
+        assert len(rows) == 25
+        assert rows[0]["duration"] == ""
+        assert rows[1]["callable"] == "fast" and rows[1]["event"] == "returned"
+        assert float(rows[1]["duration"]) == pytest.approx(0.01)
+        assert rows[0]["couplet"] == rows[1]["couplet"]
+        uuid.UUID(rows[0]["couplet"])
+
+    def test_open_calls_bounded(self):
+        store = EventStore(max_open=2)
+        couplets = [uuid.uuid1() for _ in range(3)]
+        for i, couplet in enumerate(couplets):
+            store.handle(event("unended", "called", float(i), couplet))
+        assert list(store._open) == [couplet.int for couplet in couplets[1:]]
+        store.handle(event("unended", "returned", 5.0, couplets[0]))
+        store.handle(event("unended", "returned", 5.0, couplets[2]))
+        durations = store.columns()["duration"]
+        assert math.isnan(durations[3]) and durations[4] == 3.0
+        assert store.summary()["unended"].unfinished == 1
+
+    def test_invalid_sizes(self):
+        with pytest.raises(ValueError):
+            EventStore(chunk_size=0)
+        with pytest.raises(ValueError):
+            EventStore(max_open=0)
+
+    def test_decorated_calls(self, tmp_path):
+        loga = Loga(
+            facility="event-store",
+            log_if_graylog_disabled=False,
+            event_store=True,
+            event_store_chunk_size=2,
+            log_fields=set(),
+        )
+
+        @loga
+        def work(n):
+            if n == 2:
+                raise ValueError
+            return n
+
+        for n in range(3):
+            try:
+                work(n)
+            except ValueError:
+                pass
+        loga.info("manual")
+        store = loga.events()
+        assert len(store) == 6
+        assert store.callables == [work.__qualname__]
+        report = store.summary()[work.__qualname__]
+        assert (report.calls, report.errors, report.unfinished) == (3, 1, 0)
+        store.clear()
+        assert len(store) == 0 and store.summary() == {}
+        loga.close()
+
+    def test_disabled(self):
+        with pytest.raises(RuntimeError):
+            Loga(log_if_graylog_disabled=False).events()
@@ -0,0 +1,103 @@
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from loga import Loga
+
+loga = Loga(log_if_graylog_disabled=False, flight_recorder_size=3)
+
+
+class Unrepresentable:
+    def __repr__(self):
+        raise AssertionError("Recorded calls must not be represented until dumped")
+
+
+@loga
+def step(n, anything=None):
+    return n
+
+
+@loga
+def fails(n):
+    raise ValueError(f"Broken at {n}")
+
+
+def logged_messages(logger):
+    return [c.args[1] for c in logger.call_args_list]
+
+
+class TestFlightRecorder:
+    def setup_method(self):
+        assert loga._recorder is not None
+        loga._recorder.take_all()
+
+    def test_calls_kept_unrepresented(self):
+        with patch("logging.Logger.log") as logger:
+            step(1, anything=Unrepresentable())
+        logger.assert_not_called()
+
+    def test_error_logs_preceding_events(self):
+        with patch("logging.Logger.log") as logger:
+            for n in range(5):
+                step(n)
+            with pytest.raises(ValueError):
+                fails(5)
+        # The 3 most recent events, including the failed call, then the error
+        assert logged_messages(logger) == [
+            "*Called step(n=4)",
+            "*Returned from step(n=4) with int (4)",
+            "*Called fails(n=5)",
+            '*Errored during fails(n=5) with ValueError "Broken at 5"',
+        ]
+        called, errored = logger.call_args_list[-2:]
+        assert called.kwargs["extra"]["couplet"] == errored.kwargs["extra"]["couplet"]
+
+    def test_dumped_events_keep_their_time(self):
+        with patch("time.time", return_value=1000.0):
+            step(1)
+        with patch("logging.Logger.log") as logger:
+            loga.dump()
+        assert logged_messages(logger) == [
+            "*Called step(n=1)",
+            "*Returned from step(n=1) with int (1)",
+        ]
+        for log_call in logger.call_args_list:
+            assert log_call.kwargs["extra"]["_loga_created"] == 1000.0
+        with patch("logging.Logger.log") as logger:
+            loga.dump()
+        logger.assert_not_called()
+
+    def test_per_thread_buffers(self):
+        thread = threading.Thread(target=step, args=(1,))
+        thread.start()
+        thread.join()
+        time.sleep(0.01)
+        with patch("logging.Logger.log") as logger:
+            with pytest.raises(ValueError):
+                fails(2)
+        # The other thread's events are only logged on dump
+        assert logged_messages(logger) == [
+            "*Called fails(n=2)",
+            '*Errored during fails(n=2) with ValueError "Broken at 2"',
+        ]
+
+    def test_errors_only_decorations_dump(self):
+        @loga.errors
+        def fails_quietly():
+            raise KeyError
+
+        with patch("logging.Logger.log") as logger:
+            step(1)
+            with pytest.raises(KeyError):
+                fails_quietly()
+        assert logged_messages(logger)[:2] == [
+            "*Called step(n=1)",
+            "*Returned from step(n=1) with int (1)",
+        ]
+        assert logged_messages(logger)[2].startswith("*Errored during")
+
+    def test_disabled(self):
+        with pytest.raises(RuntimeError):
+            Loga(log_if_graylog_disabled=False).dump()
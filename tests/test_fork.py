@@ -0,0 +1,214 @@
+import io
+import logging
+import logging.handlers
+import os
+import socket
+import weakref
+
+import pytest
+
+from loga import Loga, _fork
+from loga._multiprocess import AggregatorHandler
+from tests.test_multiprocess import ListHandler, make_aggregator, wait_for
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="Requires os.fork")
+
+
+def run_in_fork(child):
+    """Run `child()` in a forked process, and return its exit code."""
+    pid = os.fork()
+    if pid == 0:  # pragma: no cover
+        code = 1
+        try:
+            code = 0 if child() else 2
+        finally:
+            os._exit(code)
+    _, status = os.waitpid(pid, 0)
+    return os.WEXITSTATUS(status)
+
+
+class TestFork:
+    def test_file_reopened_in_child(self, tmp_path):
+        logfile = tmp_path / "logs.txt"
+        loga = Loga(facility="fork-file", do_write=True, logfile=str(logfile))
+        loga.info("parent")
+        (file_handler,) = loga._handlers
+        assert isinstance(file_handler, logging.FileHandler)
+
+        def child():
+            reopened = file_handler.stream is None
+            loga.info("child")
+            loga.close()
+            return reopened
+
+        assert run_in_fork(child) == 0
+        loga.info("parent again")
+        loga.close()
+        lines = [line.split("\t")[1] for line in logfile.read_text().splitlines()]
+        assert lines == ["parent", "child", "parent again"]
+
+    def test_socket_and_locks_reinitialised(self):
+        loga = Loga(facility="fork-socket", repeat_window=60, repr_cache_size=10_000)
+        datagram_handler = logging.handlers.DatagramHandler("localhost", 9)
+        datagram_handler.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        loga._add_handler(datagram_handler)
+        repeats_lock = loga._repeats._lock  # type: ignore[union-attr]
+        cache_lock = loga._repr_cache._lock  # type: ignore[union-attr]
+        loga.info("open a window")
+
+        def child():
+            return (
+                datagram_handler.sock is None
+                and loga._repeats._lock is not repeats_lock  # type: ignore[union-attr]
+                and loga._repr_cache._lock is not cache_lock  # type: ignore[union-attr]
+                and not loga._repeats._windows  # type: ignore[union-attr]
+            )
+
+        assert run_in_fork(child) == 0
+        assert datagram_handler.sock is not None
+        loga.close()
+
+    def test_children_of_aggregator_send_to_it(self):
+        aggregator, handler = make_aggregator("fork-aggregator")
+        aggregator.start_aggregator()
+
+        @aggregator
+        def work():
+            return "done"
+
+        def child():
+            work()
+            aggregator.close()
+            return isinstance(aggregator._handlers, list) and not any(
+                isinstance(h, ListHandler) for h in aggregator._handlers
+            )
+
+        assert run_in_fork(child) == 0
+        wait_for(lambda: len(handler.records) == 2)
+        aggregator.close()
+        assert [r.getMessage() for r in handler.records] == [
+            "*Called TestFork.test_children_of_aggregator_send_to_it.<locals>.work()",
+            "*Returned from TestFork.test_children_of_aggregator_send_to_it.<locals>.work() "
+            "with str ('done')",
+        ]
+        assert handler.records[0].process != os.getpid()
+
+    def test_hook_errors_reported(self, capsys, monkeypatch):
+        loga = Loga(facility="fork-error")
+
+        def fail():
+            raise RuntimeError("hook failed")
+
+        monkeypatch.setattr(loga, "_before_fork", fail)
+        _fork._before_fork()
+        err = capsys.readouterr().err
+        assert "Loga error in fork hook" in err
+        assert "RuntimeError: hook failed" in err
+
+
+class TestHooksInProcess:
+    """The fork hooks, called in this process rather than in a forked
+    child, where their effects can be inspected and measured."""
+
+    def test_reinit_handler(self, tmp_path):
+        file_handler = logging.FileHandler(tmp_path / "logs.txt")
+        stream = file_handler.stream
+        assert stream is not None
+        _fork.reinit_handler(file_handler)
+        assert file_handler.stream is None and stream.closed
+        # Reopened on the next log
+        file_handler.handle(logging.makeLogRecord({"msg": "reopened"}))
+        file_handler.close()
+        assert (tmp_path / "logs.txt").read_text() == "reopened\n"
+
+        datagram_handler = logging.handlers.DatagramHandler("localhost", 9)
+        datagram_handler.createSocket()
+        sock = datagram_handler.sock
+        assert sock is not None
+        _fork.reinit_handler(datagram_handler)
+        assert datagram_handler.sock is None and sock.fileno() == -1
+
+        stream_handler = logging.StreamHandler(io.StringIO())
+        _fork.reinit_handler(stream_handler)
+        assert not stream_handler.stream.closed
+
+        # Handlers with an `after_fork_in_child` method reinitialise themselves
+        aggregator_handler = AggregatorHandler(("127.0.0.1", 9), flush_interval=60)
+        aggregator_handler.buffer.append(logging.makeLogRecord({"msg": "parent's"}))
+        flusher = aggregator_handler._flusher
+        _fork.reinit_handler(aggregator_handler)
+        assert aggregator_handler.buffer == []
+        assert aggregator_handler._flusher is not flusher
+        aggregator_handler.close()
+
+    def test_after_fork_in_child(self, tmp_path):
+        loga = Loga(
+            facility="fork-in-process",
+            log_if_graylog_disabled=False,
+            do_write=True,
+            logfile=str(tmp_path / "logs.txt"),
+            repeat_window=60,
+            throttle_rate=1000,
+            repr_cache_size=10_000,
+            profile_file=str(tmp_path / "profile.folded"),
+            trace_file=str(tmp_path / "trace.json"),
+            flight_recorder_size=10,
+            collect_metrics=True,
+            overhead_sample_rate=1.0,
+            do_print=True,
+            print_buffer_size=1 << 20,
+            event_store=True,
+            unix_socket=str(tmp_path / "logs.sock"),
+        )
+
+        @loga
+        def work():
+            return "done"
+
+        work()
+        work()
+        loga.serve_metrics()
+        metrics_server = loga._metrics_server
+        assert metrics_server is not None
+        # The serving thread doesn't exist in a child
+        metrics_server._server.shutdown()
+        aggregator_address = loga.start_aggregator()
+        aggregator = loga._aggregator
+        assert aggregator is not None
+        try:
+            loga._before_fork()
+            loga._after_fork_in_child()
+            # Handlers were reinitialised before being replaced
+            assert len(loga.events()) == 0
+            assert loga._repeats is not None and not loga._repeats._windows
+            assert loga._profiler is not None and loga._tracer is not None
+            assert loga._profiler.filename.endswith(f"profile.{os.getpid()}.folded")
+            assert loga._tracer.filename.endswith(f"trace.{os.getpid()}.json")
+            assert loga.profile_stats() == {}
+            assert loga._metrics_server is None
+            assert "loga_calls_total{" not in loga.metrics()
+            # Logs go to the parent's aggregator instead
+            assert loga._aggregator is None
+            (handler,) = loga._handlers
+            assert isinstance(handler, AggregatorHandler)
+            assert handler.address == aggregator_address
+        finally:
+            loga.close()
+            aggregator.close()
+
+    def test_hook_errors_reported_after_fork(self, capsys, monkeypatch):
+        calls = []
+
+        class Broken:
+            def _after_fork_in_child(self):
+                raise RuntimeError("reinit failed")
+
+        class Working:
+            def _after_fork_in_child(self):
+                calls.append(self)
+
+        instances = [Broken(), Working()]
+        monkeypatch.setattr(_fork, "_instances", weakref.WeakSet(instances))
+        _fork._after_fork_in_child()
+        assert calls == [instances[1]]
+        assert "RuntimeError: reinit failed" in capsys.readouterr().err
@@ -0,0 +1,197 @@
+import logging
+import os
+from unittest.mock import patch
+
+import pytest
+
+from loga import Loga
+from loga import _index
+from loga.__main__ import main
+from tests.test_fork import run_in_fork
+
+
+def make_loga(logfile, facility, **kwargs):
+    return Loga(
+        facility=facility,
+        do_write=True,
+        logfile=str(logfile),
+        logfile_index=True,
+        log_if_graylog_disabled=False,
+        **kwargs,
+    )
+
+
+class TestIndex:
+    def test_query(self, tmp_path):
+        logfile = tmp_path / "logs.txt"
+        loga = make_loga(logfile, "index-query")
+
+        @loga
+        def add(a, b):
+            return a + b
+
+        @loga
+        def fails(message):
+            raise ValueError(message)
+
+        with patch("time.time", return_value=1000.0):
+            add(1, 2)
+        with patch("time.time", return_value=2000.0):
+            with pytest.raises(ValueError):
+                fails("first line\nsecond line")
+            loga.log(logging.WARNING, "manual")
+        add(3, 4)
+
+        by_callable = loga.query(callable_name="TestIndex.test_query.<locals>.add")
+        assert len(by_callable) == 4
+        assert by_callable[0].endswith("add(a=1, b=2)\t10")
+        assert (
+            by_callable[2].split("\t")[1] == "*Called TestIndex.test_query.<locals>.add(a=3, b=4)"
+        )
+
+        errored = loga.query(callable_name="TestIndex.test_query.<locals>.fails", limit=5)
+        assert len(errored) == 2
+        # Multi-line records are fetched whole
+        assert errored[1].splitlines()[1].startswith("second line")
+        assert "Traceback" in errored[1]
+
+        assert loga.query(level=logging.WARNING) == [loga.query(since=2000, until=2000)[-1]]
+        assert len(loga.query(since=1000, until=1000)) == 2
+        assert len(loga.query(until=2000)) == 5
+        assert loga.query(callable_name="unknown") == []
+        loga.close()
+
+    def test_query_by_couplet(self, tmp_path):
+        logfile = tmp_path / "logs.txt"
+        loga = make_loga(logfile, "index-couplet", logfile_format="json")
+
+        @loga
+        def step(n):
+            return n
+
+        with patch("logging.Logger.log", wraps=loga._logger.log) as logger:
+            for n in range(20):
+                step(n)
+        couplet = logger.call_args_list[13].kwargs["extra"]["couplet"]
+        records = loga.query(couplet=couplet)
+        assert len(records) == 2
+        assert all('"n": "6"' in record for record in records)
+        assert loga.query(couplet=str(couplet)) == records
+        loga.close()
+
+    def test_index_survives_reopening(self, tmp_path):
+        logfile = tmp_path / "logs.txt"
+        first = make_loga(logfile, "index-reopen")
+        first.info("one")
+        first.close()
+        second = make_loga(logfile, "index-reopen")
+        second.info("two")
+        assert [r.split("\t")[1] for r in second.query()] == ["one", "two"]
+        second.close()
+
+        # A new log file starts a new index
+        os.remove(logfile)
+        third = make_loga(logfile, "index-reopen")
+        third.info("three")
+        assert [r.split("\t")[1] for r in third.query()] == ["three"]
+        third.close()
+
+    def test_query_by_time_bucket(self, tmp_path):
+        logfile = tmp_path / "logs.txt"
+        loga = make_loga(logfile, "index-time")
+        # Written out of time order, like the backdated logs of slow calls
+        for created in (1000, 1010, 1100, 1030, 5000, 1100, 9000):
+            with patch("time.time", return_value=float(created)):
+                loga.info(str(created))
+        loga.flush()
+        times = [r.split("\t")[1] for r in loga.query(since=1010, until=1100)]
+        assert times == ["1010", "1100", "1030", "1100"]
+        assert [r.split("\t")[1] for r in loga.query(since=5000)] == ["5000", "9000"]
+        assert [r.split("\t")[1] for r in loga.query(until=1009)] == ["1000"]
+        # Only the entries of runs in the buckets of 960-1019, 1020-1079 and 1080-1139
+        assert _index._time_ranges(str(logfile), 7, 1010, 1100) == [(0, 4), (5, 6)]
+        loga.close()
+
+    def test_runs_of_lost_entries_dropped(self, tmp_path):
+        logfile = tmp_path / "logs.txt"
+        loga = make_loga(logfile, "index-lost-runs")
+        with patch("time.time", return_value=1000.0):
+            loga.info("kept")
+        loga.close()
+        # As if killed after flushing runs, but not their entries
+        with open(str(logfile) + _index.TIMES_SUFFIX, "ab") as f:
+            f.write(_index.TIME_RUN.pack(5000 // _index.TIME_BUCKET, 1))
+        loga = make_loga(logfile, "index-lost-runs")
+        with patch("time.time", return_value=1000.0):
+            loga.info("after reopening")
+        loga.flush()
+        assert [r.split("\t")[1] for r in loga.query(until=2000)] == ["kept", "after reopening"]
+        assert loga.query(since=5000) == []
+        loga.close()
+
+    def test_without_time_buckets(self, tmp_path):
+        logfile = tmp_path / "logs.txt"
+        loga = make_loga(logfile, "index-no-buckets")
+        for created in (1000.0, 2000.0):
+            with patch("time.time", return_value=created):
+                loga.info(str(int(created)))
+        loga.close()
+        # E.g. indexed before time buckets were, all entries are read
+        os.remove(str(logfile) + _index.TIMES_SUFFIX)
+        assert [r.split("\t")[1] for r in _index.query(str(logfile), since=1500)] == ["2000"]
+
+    def test_not_indexed_after_fork(self, tmp_path):
+        logfile = tmp_path / "logs.txt"
+        loga = make_loga(logfile, "index-after-fork")
+        loga.info("parent")
+        (handler,) = loga._handlers
+        # Called in this process, as in a forked child
+        handler.after_fork_in_child()
+        loga.info("child")
+        loga.close()
+        assert len(logfile.read_text().splitlines()) == 2
+        assert [r.split("\t")[1] for r in _index.query(str(logfile))] == ["parent"]
+
+    def test_written_right_away(self, tmp_path):
+        logfile = tmp_path / "logs.txt"
+        loga = make_loga(logfile, "index-durable")
+        loga.info("info")
+        assert logfile.read_text().split("\t")[1] == "info"
+        # Errors flush the index too
+        loga.error("error")
+        assert [r.split("\t")[1] for r in _index.query(str(logfile))] == ["info", "error"]
+        loga.close()
+
+    @pytest.mark.skipif(not hasattr(os, "fork"), reason="Requires os.fork")
+    def test_forked_children_append(self, tmp_path):
+        logfile = tmp_path / "logs.txt"
+        loga = make_loga(logfile, "index-fork")
+        loga.info("parent before")
+
+        def child():
+            loga.info("child, longer than the parent's records")
+            loga.close()
+            return True
+
+        assert run_in_fork(child) == 0
+        loga.info("parent after")
+        # The child's record isn't indexed, but doesn't shift the parent's
+        assert [r.split("\t")[1] for r in loga.query()] == ["parent before", "parent after"]
+        loga.close()
+        assert len(logfile.read_text().splitlines()) == 3
+
+    def test_cli(self, tmp_path, capsys):
+        logfile = tmp_path / "logs.txt"
+        loga = make_loga(logfile, "index-cli")
+        loga.info("first")
+        loga.warning("second")
+        loga.close()
+        main(["query", str(logfile), "--level", "30", "--since", "2000-01-01T00:00:00"])
+        assert capsys.readouterr().out.split("\t")[1] == "second"
+        main(["query", str(logfile), "--limit", "1"])
+        assert capsys.readouterr().out.split("\t")[1] == "first"
+
+    def test_not_indexed(self, tmp_path):
+        with pytest.raises(RuntimeError):
+            Loga(log_if_graylog_disabled=False).query()
+        assert _index.query(str(tmp_path / "missing.txt")) == []
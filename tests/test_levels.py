@@ -0,0 +1,130 @@
+import logging
+from unittest.mock import patch
+
+import pytest
+
+from loga import Loga
+from loga._levels import LevelOverrides, parse_levels
+
+loga = Loga(facility="levels", log_if_graylog_disabled=False)
+
+
+@loga(level=logging.INFO)
+def important(n):
+    return n
+
+
+@loga
+def chatty(n):
+    if n < 0:
+        raise ValueError(n)
+    return n
+
+
+@loga(level="WARNING")
+class Service:
+    def handle(self):
+        return "handled"
+
+
+def logged(logger):
+    return [(c.args[0], c.args[1].split(" ")[0]) for c in logger.call_args_list]
+
+
+class TestLevels:
+    def test_decorated_level(self):
+        with patch("logging.Logger.log") as logger:
+            important(1)
+            Service().handle()
+        assert logged(logger) == [
+            (logging.INFO, "*Called"),
+            (logging.INFO, "*Returned"),
+            (logging.WARNING, "*Called"),
+            (logging.WARNING, "*Returned"),
+        ]
+        assert logger.call_args.kwargs["extra"]["log_level"] == "30"
+
+    def test_set_level(self):
+        try:
+            loga.set_level(f"{__name__}.*", "INFO")
+            with patch("logging.Logger.log") as logger:
+                chatty(1)
+                important(1)
+                with pytest.raises(ValueError):
+                    chatty(-1)
+            # Errors are logged even below the level
+            assert logged(logger) == [
+                (logging.INFO, "*Called"),
+                (logging.INFO, "*Returned"),
+                (logging.DEBUG, "*Errored"),
+            ]
+            # The longest matching pattern wins
+            loga.set_level(f"{__name__}.important", logging.ERROR)
+            loga.set_level(f"{__name__}.chatty", logging.DEBUG)
+            with patch("logging.Logger.log") as logger:
+                chatty(1)
+                important(1)
+            assert logged(logger) == [(logging.DEBUG, "*Called"), (logging.DEBUG, "*Returned")]
+        finally:
+            for pattern in f"{__name__}.*", f"{__name__}.important", f"{__name__}.chatty":
+                loga.set_level(pattern, None)
+        with patch("logging.Logger.log") as logger:
+            important(1)
+        assert len(logger.call_args_list) == 2
+
+    def test_decision_cached(self):
+        with patch.object(LevelOverrides, "threshold", return_value=logging.DEBUG) as threshold:
+            own = Loga(facility="levels-cached", log_if_graylog_disabled=False)
+
+            @own
+            def cached():
+                pass
+
+            with patch("logging.Logger.log"):
+                for _ in range(3):
+                    cached()
+                assert threshold.call_count == 1
+                own.set_level("elsewhere.*", logging.INFO)
+                cached()
+                cached()
+        assert threshold.call_count == 2
+
+    def test_from_environment(self, monkeypatch):
+        monkeypatch.setenv("LOGA_LEVELS", f"{__name__}.*=WARNING")
+        # Overridden by the environment
+        own = Loga(
+            facility="levels-env", log_if_graylog_disabled=False, levels={f"{__name__}.*": "DEBUG"}
+        )
+
+        @own
+        def quiet():
+            pass
+
+        @own(level=logging.ERROR)
+        def loud():
+            pass
+
+        with patch("logging.Logger.log") as logger:
+            quiet()
+            loud()
+        assert logged(logger) == [(logging.ERROR, "*Called"), (logging.ERROR, "*Returned")]
+
+    def test_flight_recorder_keeps_level(self):
+        recording = Loga(
+            facility="levels-recorder", log_if_graylog_disabled=False, flight_recorder_size=4
+        )
+
+        @recording(level=logging.INFO)
+        def fails():
+            raise KeyError
+
+        with patch("logging.Logger.log") as logger:
+            with pytest.raises(KeyError):
+                fails()
+        assert logged(logger) == [(logging.INFO, "*Called"), (logging.INFO, "*Errored")]
+
+    def test_parse_levels(self):
+        assert parse_levels("a.*=info, b.c=25,") == {"a.*": logging.INFO, "b.c": 25}
+        for spec in "a.*", "=INFO", "a.*=LOUD":
+            with pytest.raises(ValueError):
+                parse_levels(spec)
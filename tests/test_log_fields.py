@@ -0,0 +1,96 @@
+from unittest.mock import patch
+
+import pytest
+
+from loga import Loga
+from loga._loga import _template_fields
+
+loga = Loga(
+    facility="log-fields",
+    log_if_graylog_disabled=False,
+    called="{callable} called",
+    returned="{callable} returned {return_value}",
+    errored="{callable} raised {exception_type}",
+    log_fields={"couplet"},
+)
+
+
+@loga
+def add(a, b):
+    return a + b
+
+
+@loga
+def fails():
+    raise ValueError("not in the log")
+
+
+class TestLogFields:
+    def test_template_fields(self):
+        assert _template_fields("*Called {call_signature} at {timestamp!s:>10}") == {
+            "call_signature",
+            "timestamp",
+        }
+        assert _template_fields("{params[0]} {callable.upper} {{escaped}}") == {
+            "params",
+            "callable",
+        }
+
+    def test_only_used_fields_computed(self):
+        with patch.object(loga, "_get_timestamp") as get_timestamp:
+            with patch("logging.Logger.log") as logger:
+                assert add(1, 2) == 3
+        get_timestamp.assert_not_called()
+        called, returned = logger.call_args_list
+        assert called.args[1] == "add called"
+        assert returned.args[1] == "add returned (3)"
+        assert called.kwargs["extra"]["couplet"] == returned.kwargs["extra"]["couplet"]
+        for log in called, returned:
+            extra = log.kwargs["extra"]
+            assert {"params", "call_signature", "timestamp", "callable"}.isdisjoint(extra)
+            # Parameters are always logged
+            assert (extra["a"], extra["b"]) == ("1", "2")
+            assert extra["decorated"] is True
+        assert "return_value" not in returned.kwargs["extra"]
+
+    def test_traceback_not_formatted(self):
+        with patch("traceback.format_exc") as format_exc:
+            with patch("logging.Logger.log") as logger:
+                with pytest.raises(ValueError):
+                    fails()
+        format_exc.assert_not_called()
+        errored = logger.call_args_list[-1]
+        assert errored.args[1] == "fails raised ValueError"
+        assert "exception_msg" not in errored.kwargs["extra"]
+
+    def test_all_fields_by_default(self):
+        default = Loga(facility="log-fields-default", log_if_graylog_disabled=False)
+
+        @default
+        def sub(a, b):
+            return a - b
+
+        with patch("logging.Logger.log") as logger:
+            sub(2, 1)
+        extra = logger.call_args.kwargs["extra"]
+        for field in "params", "call_signature", "timestamp", "couplet", "return_value":
+            assert field in extra
+
+    def test_traced_calls_keep_params(self, tmp_path):
+        traced = Loga(
+            facility="log-fields-traced",
+            log_if_graylog_disabled=False,
+            log_fields=set(),
+            called="{callable}",
+            trace_file=str(tmp_path / "trace.json"),
+        )
+
+        @traced
+        def mul(a, b):
+            return a * b
+
+        with patch("logging.Logger.log") as logger:
+            mul(2, 3)
+        traced.close()
+        assert "params" not in logger.call_args.kwargs["extra"]
+        assert '"params": "a=2, b=3"' in (tmp_path / "trace.json").read_text()
@@ -0,0 +1,91 @@
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from loga import Loga
+
+
+def decorated():
+    """Return a new Loga instance, and `sleep_for` and `fails` decorated
+    by it, so that tests don't count each other's calls."""
+    loga = Loga(
+        facility="metrics",
+        log_if_graylog_disabled=False,
+        collect_metrics=True,
+        metrics_buckets=(0.01, 0.1),
+        called=None,
+        returned=None,
+    )
+
+    @loga
+    def sleep_for(seconds):
+        time.sleep(seconds)
+
+    @loga
+    def fails(exception):
+        raise exception
+
+    return loga, sleep_for, fails
+
+
+def samples(text):
+    lines = text.splitlines()
+    assert lines[-1] == "# EOF"
+    return dict(line.rsplit(" ", 1) for line in lines if not line.startswith("#"))
+
+
+class TestMetrics:
+    def test_counters_and_histogram(self):
+        loga, sleep_for, fails = decorated()
+        for seconds in (0, 0, 0.02):
+            sleep_for(seconds)
+        for exception in (ValueError, ValueError, KeyError):
+            with pytest.raises(exception):
+                fails(exception)
+        thread = threading.Thread(target=sleep_for, args=(0.2,))
+        thread.start()
+        thread.join()
+
+        found = samples(loga.metrics())
+        label = f'callable="{sleep_for.__qualname__}"'
+        assert found[f"loga_calls_total{{{label}}}"] == "4"
+        assert found[f'loga_call_duration_seconds_bucket{{{label},le="0.01"}}'] == "2"
+        assert found[f'loga_call_duration_seconds_bucket{{{label},le="0.1"}}'] == "3"
+        assert found[f'loga_call_duration_seconds_bucket{{{label},le="+Inf"}}'] == "4"
+        assert found[f"loga_call_duration_seconds_count{{{label}}}"] == "4"
+        assert float(found[f"loga_call_duration_seconds_sum{{{label}}}"]) >= 0.22
+        label = f'callable="{fails.__qualname__}"'
+        assert found[f"loga_calls_total{{{label}}}"] == "3"
+        assert found[f'loga_errors_total{{{label},exception_type="ValueError"}}'] == "2"
+        assert found[f'loga_errors_total{{{label},exception_type="KeyError"}}'] == "1"
+
+    def test_served_over_http(self):
+        loga, sleep_for, _ = decorated()
+        sleep_for(0)
+        host, port = loga.serve_metrics()
+        try:
+            with urllib.request.urlopen(f"http://{host}:{port}/metrics") as response:
+                assert response.headers["Content-Type"].startswith("application/openmetrics-text")
+                body = response.read().decode()
+                assert f'loga_calls_total{{callable="{sleep_for.__qualname__}"}} 1' in body
+            with pytest.raises(urllib.error.HTTPError):
+                urllib.request.urlopen(f"http://{host}:{port}/other")
+        finally:
+            loga._metrics_server.close()
+            loga._metrics_server = None
+
+    def test_label_escaping(self):
+        own_loga = Loga(log_if_graylog_disabled=False, collect_metrics=True)
+        assert own_loga._metrics is not None
+        own_loga._metrics.observe('odd"name\\', 0.0)
+        assert 'loga_calls_total{callable="odd\\"name\\\\"} 1' in own_loga.metrics()
+
+    def test_disabled(self):
+        plain = Loga(log_if_graylog_disabled=False)
+        with pytest.raises(RuntimeError):
+            plain.metrics()
+        with pytest.raises(RuntimeError):
+            plain.serve_metrics()
@@ -0,0 +1,137 @@
+import gc
+import logging
+import multiprocessing
+import threading
+import time
+import weakref
+
+from loga import Loga
+from loga._multiprocess import AggregatorHandler
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def make_aggregator(facility):
+    aggregator = Loga(facility=facility, log_if_graylog_disabled=False)
+    handler = ListHandler()
+    aggregator._add_handler(handler)
+    return aggregator, handler
+
+
+def log_from_child(address, facility):
+    loga = Loga(facility=facility, aggregator_address=address)
+
+    @loga
+    def work(n):
+        return n * 2
+
+    for n in range(3):
+        work(n)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+class TestAggregator:
+    def test_batches_from_same_process(self):
+        aggregator, handler = make_aggregator("aggregator-local")
+        address = aggregator.start_aggregator()
+        client = Loga(facility="aggregator-local-client")
+        client.connect_aggregator(address, batch_size=2, flush_interval=60)
+        client.info("first", {"key": "value"})
+        time.sleep(0.05)
+        assert handler.records == []
+        client.info("second")
+        wait_for(lambda: len(handler.records) == 2)
+        first = handler.records[0]
+        assert first.getMessage() == "first"
+        assert first.key == "value"
+        assert first.levelno == logging.INFO
+        # errors are sent immediately
+        client.error("third")
+        wait_for(lambda: len(handler.records) == 3)
+        assert handler.records[-1].getMessage() == "third"
+        client.info("fourth")
+        client.close()
+        aggregator.close()
+        assert [r.getMessage() for r in handler.records][-1] == "fourth"
+
+    def test_logs_from_child_process(self):
+        aggregator, handler = make_aggregator("aggregator-child")
+        address = aggregator.start_aggregator()
+        context = multiprocessing.get_context("spawn")
+        child = context.Process(target=log_from_child, args=(address, "aggregator-child"))
+        child.start()
+        child.join(30)
+        assert child.exitcode == 0
+        aggregator.close()
+        messages = [r.getMessage() for r in handler.records]
+        assert len(messages) == 6
+        assert messages[0] == "*Called log_from_child.<locals>.work(n=0)"
+        assert messages[-1] == "*Returned from log_from_child.<locals>.work(n=2) with int (4)"
+        assert {r.process for r in handler.records} == {child.pid}
+
+    def test_unpicklable_extra_is_stringified(self):
+        aggregator, handler = make_aggregator("aggregator-unpicklable")
+        address = aggregator.start_aggregator()
+        client = Loga(facility="aggregator-unpicklable-client")
+        client.connect_aggregator(address, flush_interval=60)
+        logger = logging.getLogger("aggregator-unpicklable-client")
+        logger.warning("with a lock", extra={"lock": threading.Lock()})
+        client.info("after")
+        client.close()
+        aggregator.close()
+        messages = [r.getMessage() for r in handler.records]
+        assert messages == ["with a lock", "after"]
+        assert "lock" in handler.records[0].lock
+
+    def test_close_with_connected_client(self):
+        aggregator, handler = make_aggregator("aggregator-connected")
+        address = aggregator.start_aggregator()
+        client = Loga(facility="aggregator-connected-client")
+        client.connect_aggregator(address, flush_interval=60)
+        client.error("sent")
+        wait_for(lambda: len(handler.records) == 1)
+        start = time.monotonic()
+        aggregator.close()
+        assert time.monotonic() - start < 1
+        assert [r.getMessage() for r in handler.records] == ["sent"]
+        client.close()
+
+    def test_disconnected_receivers_are_forgotten(self):
+        aggregator, handler = make_aggregator("aggregator-recycled")
+        address = aggregator.start_aggregator()
+        server = aggregator._aggregator
+        assert server is not None
+        for i in range(6):
+            client = Loga(facility="aggregator-recycled-client")
+            client.connect_aggregator(address, flush_interval=60)
+            client.error(f"client {i}")
+            client.close()
+            if i == 4:
+                wait_for(lambda: len(handler.records) == 5)
+                wait_for(lambda: not any(r.is_alive() for r, _ in server._receivers))
+        # Only the last client's receiver is kept
+        wait_for(lambda: len(server._receivers) == 1)
+        assert len(server._receivers) == 1
+        aggregator.close()
+        assert len(handler.records) == 6
+
+    def test_closed_handlers_are_freed(self):
+        handler = AggregatorHandler(("127.0.0.1", 9), flush_interval=60)
+        handler.close()
+        handler._flusher.join(5)
+        ref = weakref.ref(handler)
+        del handler
+        gc.collect()
+        assert ref() is None
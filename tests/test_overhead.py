@@ -0,0 +1,47 @@
+from unittest.mock import patch
+
+import pytest
+
+from loga import Loga
+
+loga = Loga(log_if_graylog_disabled=False, overhead_sample_rate=0.5)
+
+
+@loga
+def add(a, b):
+    return a + b
+
+
+@loga
+def fails():
+    raise ValueError
+
+
+class TestOverhead:
+    def test_report(self):
+        with patch("logging.Logger.log"):
+            for n in range(10):
+                add(n, 1)
+            for _ in range(2):
+                with pytest.raises(ValueError):
+                    fails()
+        report = loga.overhead_report()
+        stats = report["add"]
+        assert stats.samples == 5
+        assert stats.bind > 0
+        assert stats.sanitise > 0
+        assert stats.formatting > 0
+        assert stats.custom_data > 0
+        assert stats.emit > 0
+        assert stats.total == pytest.approx(
+            stats.bind + stats.sanitise + stats.formatting + stats.custom_data + stats.emit
+        )
+        assert report["fails"].samples == 1
+
+    def test_invalid_rate(self):
+        with pytest.raises(ValueError):
+            Loga(log_if_graylog_disabled=False, overhead_sample_rate=2)
+
+    def test_disabled(self):
+        with pytest.raises(RuntimeError):
+            Loga(log_if_graylog_disabled=False).overhead_report()
@@ -0,0 +1,83 @@
+import gc
+import threading
+import time
+
+import pytest
+
+from loga import Loga
+
+
+class TestProfile:
+    def test_folded_stacks(self, tmp_path):
+        profile_file = tmp_path / "profile.folded"
+        loga = Loga(facility="profile", profile_file=str(profile_file), profile_interval=3600)
+
+        @loga
+        def leaf():
+            time.sleep(0.01)
+
+        @loga
+        def root():
+            leaf()
+            leaf()
+            time.sleep(0.01)
+
+        root()
+        thread = threading.Thread(target=leaf)
+        thread.start()
+        thread.join()
+
+        stats = loga.profile_stats()
+        root_name = "TestProfile.test_folded_stacks.<locals>.root"
+        leaf_name = "TestProfile.test_folded_stacks.<locals>.leaf"
+        assert set(stats) == {root_name, f"{root_name};{leaf_name}", leaf_name}
+        nested = stats[f"{root_name};{leaf_name}"]
+        assert nested.calls == 2
+        assert stats[leaf_name].calls == 1
+        assert stats[root_name].total_time >= nested.total_time + 0.01
+        assert stats[root_name].self_time < stats[root_name].total_time - nested.total_time / 2
+
+        assert not profile_file.exists()
+        loga.flush()
+        lines = profile_file.read_text().splitlines()
+        assert len(lines) == 3
+        path, micros = lines[2].rsplit(" ", 1)
+        assert path == f"{root_name};{leaf_name}"
+        assert int(micros) == round(nested.self_time * 1e6)
+
+    def test_errors_are_profiled(self, tmp_path):
+        profile_file = tmp_path / "profile.folded"
+        loga = Loga(facility="profile-errors", profile_file=str(profile_file), profile_interval=0)
+
+        @loga.errors
+        def fails():
+            raise SystemExit
+
+        with pytest.raises(SystemExit):
+            fails()
+        # Written periodically, here after each outermost call
+        assert profile_file.read_text().startswith(
+            "TestProfile.test_errors_are_profiled.<locals>.fails "
+        )
+
+    def test_disabled(self):
+        with pytest.raises(RuntimeError):
+            Loga(facility="profile-disabled").profile_stats()
+
+    def test_finished_threads_merged(self, tmp_path):
+        loga = Loga(facility="profile-threads", profile_file=str(tmp_path / "profile.folded"))
+
+        @loga
+        def work():
+            pass
+
+        for _ in range(20):
+            thread = threading.Thread(target=work)
+            thread.start()
+            thread.join()
+        gc.collect()
+        profiler = loga._profiler
+        assert profiler is not None
+        assert len(profiler._live) <= 1
+        (stats,) = loga.profile_stats().values()
+        assert stats.calls == 20
@@ -0,0 +1,92 @@
+import logging
+import time
+from unittest.mock import patch
+
+import pytest
+
+from loga import Loga
+
+loga = Loga(log_if_graylog_disabled=False, repeat_window=60, repeat_max_keys=2)
+
+
+@loga
+def always_fails(n):
+    raise ValueError("Down")
+
+
+@loga.errors
+def fails_quietly():
+    raise ValueError("Down")
+
+
+class TestRepeats:
+    def setup_method(self):
+        loga.flush()
+
+    def test_errors_are_counted(self):
+        with patch("logging.Logger.log") as logger:
+            for n in range(5):
+                with pytest.raises(ValueError):
+                    always_fails(n)
+            # called logs differ in template from errored logs, but all
+            # have the same key per event type
+            assert logger.call_count == 2
+            loga.flush()
+            assert logger.call_count == 4
+            (level, msg), kwargs = logger.call_args
+            assert msg.startswith("*Last message repeated 4 times: *Errored during always_fails")
+            assert kwargs["extra"]["repeated"] == "4"
+
+    def test_manual_logs(self):
+        with patch("logging.Logger.log") as logger:
+            for _ in range(3):
+                loga.warning("Disk full")
+            loga.info("Disk full")
+            assert logger.call_count == 2
+            loga.flush()
+            assert logger.call_count == 3
+            (level, msg), _ = logger.call_args
+            assert level == logging.WARNING
+            assert msg == "*Last message repeated 2 times: Disk full"
+
+    def test_window_closes(self):
+        with patch("logging.Logger.log") as logger, patch("time.monotonic") as clock:
+            clock.return_value = 1000.0
+            fails_quietly_n_times(3)
+            assert logger.call_count == 1
+            clock.return_value = 1061.0
+            fails_quietly_n_times(1)
+            msgs = [c.args[1] for c in logger.call_args_list]
+            assert msgs[1].startswith("*Last message repeated 2 times")
+            assert msgs[2].startswith("*Errored during fails_quietly")
+            assert len(msgs) == 3
+
+    def test_evicted_keys_are_summarised(self):
+        with patch("logging.Logger.log") as logger:
+            for msg in ("one", "one", "two", "three"):
+                loga.info(msg)
+            msgs = [c.args[1] for c in logger.call_args_list]
+            assert msgs == ["one", "two", "*Last message repeated 1 times: one", "three"]
+
+    def test_disabled_by_default(self):
+        plain = Loga(log_if_graylog_disabled=False)
+        with patch("logging.Logger.log") as logger:
+            for _ in range(3):
+                plain.info("again")
+            assert logger.call_count == 3
+
+
+def fails_quietly_n_times(n):
+    for _ in range(n):
+        with pytest.raises(ValueError):
+            fails_quietly()
+
+
+def test_summary_after_flood_stops():
+    own_loga = Loga(log_if_graylog_disabled=False, repeat_window=0.05)
+    with patch("logging.Logger.log") as logger:
+        for _ in range(100):
+            own_loga.warning("Flood")
+        time.sleep(0.2)
+    msgs = [c.args[1] for c in logger.call_args_list]
+    assert msgs == ["Flood", "*Last message repeated 99 times: Flood"]
@@ -0,0 +1,56 @@
+from unittest.mock import patch
+
+from loga import Loga
+
+loga = Loga(log_if_graylog_disabled=False, repr_cache_size=10_000)
+
+CONFIG = "x" * 100
+IDS = tuple(range(50))
+
+
+@loga
+def configure(config, ids=None):
+    return None
+
+
+class TestReprCache:
+    def setup_method(self):
+        loga._repr_cache.clear()  # type: ignore[union-attr]
+
+    def test_repeated_arguments_hit(self):
+        before = loga.repr_cache_info()
+        with patch("logging.Logger.log") as logger:
+            for _ in range(3):
+                configure(CONFIG, ids=IDS)
+        info = loga.repr_cache_info()
+        assert info.misses - before.misses == 2
+        assert info.hits - before.hits == 4
+        assert 0 < info.currsize <= info.maxsize == 10_000
+        (_, msg), _ = logger.call_args_list[-2]
+        assert msg == f"*Called configure(config={CONFIG!r}, ids={IDS!r})"
+
+    def test_mutable_and_small_not_cached(self):
+        before = loga.repr_cache_info()
+        with patch("logging.Logger.log"):
+            configure(list(IDS))
+            configure((["mutable"],) * 40)
+            configure("short")
+        assert loga.repr_cache_info()[:2] == before[:2]
+
+    def test_size_eviction(self):
+        with patch("logging.Logger.log"):
+            for i in range(100):
+                configure(str(i) * 100)
+        info = loga.repr_cache_info()
+        assert info.currsize <= 10_000
+
+    def test_disabled(self):
+        plain = Loga(log_if_graylog_disabled=False)
+        assert plain.repr_cache_info() == (0, 0, 0, 0)
+
+    def test_size_counts_tuple_items(self):
+        big_strings = tuple("x" * 1000 + str(i) for i in range(40))
+        with patch("logging.Logger.log"):
+            configure(big_strings)
+        # The items alone are bigger than the cache
+        assert loga.repr_cache_info().currsize == 0
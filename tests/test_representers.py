@@ -0,0 +1,154 @@
+from collections import deque
+import importlib
+import sys
+import threading
+import time
+import types
+from unittest.mock import patch
+
+from loga import Loga
+from loga._represent import Representers
+
+loga = Loga(log_if_graylog_disabled=False)
+
+
+class Row:
+    def __init__(self, pk):
+        self.pk = pk
+
+    def __repr__(self):
+        raise AssertionError("Should use the registered representer")
+
+
+class SubRow(Row):
+    pass
+
+
+loga.register_representer(Row, lambda row: f"<Row pk={row.pk}>")
+
+
+@loga
+def echo(value):
+    return value
+
+
+def logged_messages(value):
+    with patch("logging.Logger.log") as logger:
+        echo(value)
+    return [c.args[1] for c in logger.call_args_list]
+
+
+class TestRepresenters:
+    def test_small_containers_use_repr(self):
+        called, returned = logged_messages([1, 2, 3])
+        assert called == "*Called echo(value=[1, 2, 3])"
+        assert returned == "*Returned from echo(value=[1, 2, 3]) with list ([1, 2, 3])"
+
+    def test_large_sequence_summary(self):
+        called, _ = logged_messages(list(range(1000)))
+        assert called == "*Called echo(value=<list len=1000: 0, 1, 2, 3, 4, 5, 6, 7, 8, 9, ...>)"
+
+    def test_large_mapping_summary(self):
+        called, _ = logged_messages({i: i for i in range(1000)})
+        assert called.startswith("*Called echo(value=<dict len=1000: 0: 0, 1: 1,")
+
+    def test_large_deque_summary(self):
+        called, _ = logged_messages(deque(range(1000), maxlen=2000))
+        assert called.startswith("*Called echo(value=<deque len=1000: 0, 1,")
+
+    def test_bytes_summary(self):
+        called, _ = logged_messages(bytearray(5000))
+        assert called == (
+            r"*Called echo(value=<bytearray len=5000: b'\x00\x00\x00\x00"
+            r"\x00\x00\x00\x00\x00\x00'...>)"
+        )
+
+    def test_memoryview(self):
+        called, _ = logged_messages(memoryview(b"abc"))
+        assert called == "*Called echo(value=<memoryview nbytes=3 format='B' shape=(3,)>)"
+
+    def test_registered_type_and_subclass(self):
+        called, returned = logged_messages(SubRow(7))
+        assert called == "*Called echo(value=<Row pk=7>)"
+        assert returned.endswith("with SubRow (<Row pk=7>)")
+
+    def test_dotted_path_resolved_after_import(self):
+        module = types.ModuleType("fake_orm")
+
+        class Model:
+            pass
+
+        module.Model = Model  # type: ignore[attr-defined]
+        Model.__module__ = "fake_orm"
+        loga.register_representer("fake_orm.Model", lambda obj: "<Model>")
+        assert loga._representers.lookup(int) is None
+        with patch.dict(sys.modules, fake_orm=module):
+            called, _ = logged_messages(Model())
+        assert called == "*Called echo(value=<Model>)"
+
+    def test_requests_response_text(self):
+        module = types.ModuleType("requests.models")
+
+        class Response:
+            text = "response body"
+
+        module.Response = Response  # type: ignore[attr-defined]
+        own_loga = Loga(log_if_graylog_disabled=False)
+        with patch.dict(sys.modules, {"requests": types.ModuleType("requests")}):
+            with patch.dict(sys.modules, {"requests.models": module}):
+                assert own_loga._represent_return_value(Response()) == "('response body')"
+
+    def test_reregistering_resolved_dotted_path(self):
+        module = types.ModuleType("fake_geo")
+
+        class Point:
+            pass
+
+        module.Point = Point  # type: ignore[attr-defined]
+        own_loga = Loga(log_if_graylog_disabled=False)
+        with patch.dict(sys.modules, fake_geo=module):
+            own_loga.register_representer("fake_geo.Point", lambda obj: "<old>")
+            assert own_loga._force_string_and_truncate(Point(), None, use_repr=True) == "<old>"
+            own_loga.register_representer("fake_geo.Point", lambda obj: "<new>")
+            assert own_loga._force_string_and_truncate(Point(), None, use_repr=True) == "<new>"
+
+    def test_type_registration_overrides_older_dotted_path(self):
+        module = types.ModuleType("fake_geo")
+
+        class Point:
+            pass
+
+        module.Point = Point  # type: ignore[attr-defined]
+        own_loga = Loga(log_if_graylog_disabled=False)
+        own_loga.register_representer("fake_geo.Point", lambda obj: "<by path>")
+        with patch.dict(sys.modules, fake_geo=module):
+            own_loga.register_representer(Point, lambda obj: "<by type>")
+            assert own_loga._force_string_and_truncate(Point(), None, use_repr=True) == "<by type>"
+
+    def test_dotted_path_resolved_by_concurrent_lookups(self):
+        module = types.ModuleType("fake_array")
+
+        class Array:
+            pass
+
+        module.Array = Array  # type: ignore[attr-defined]
+        representers = Representers({"fake_array.Array": lambda obj: "<Array>"})
+        barrier = threading.Barrier(8)
+        found = []
+
+        def slow_import(name):
+            time.sleep(0.05)
+            return module
+
+        def lookup():
+            barrier.wait()
+            found.append(representers.lookup(Array))
+
+        with patch.dict(sys.modules, fake_array=module):
+            with patch.object(importlib, "import_module", slow_import):
+                threads = [threading.Thread(target=lookup) for _ in range(8)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+        assert [f and f(None) for f in found] == ["<Array>"] * 8
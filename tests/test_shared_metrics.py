@@ -0,0 +1,113 @@
+import os
+import uuid
+
+import pytest
+
+from loga import Loga
+from loga.__main__ import main
+from loga._shared import SharedCallMetrics
+from tests.test_fork import run_in_fork
+from tests.test_metrics import samples
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="Requires os.fork")
+
+
+@pytest.fixture
+def segment():
+    return f"loga-test-{uuid.uuid4().hex[:12]}"
+
+
+class TestSharedMetrics:
+    def test_counts_of_forked_workers(self, segment, capsys):
+        loga = Loga(
+            facility="shared-metrics",
+            log_if_graylog_disabled=False,
+            shared_metrics=segment,
+            metrics_buckets=(0.01, 1.0),
+            called=None,
+            returned=None,
+        )
+
+        @loga
+        def handle(fail=False):
+            if fail:
+                raise ValueError
+
+        def worker():
+            for _ in range(10):
+                handle()
+            try:
+                handle(fail=True)
+            except ValueError:
+                pass
+            loga.close()
+            return True
+
+        try:
+            handle()
+            for _ in range(3):
+                assert run_in_fork(worker) == 0
+            found = samples(loga.metrics())
+            label = f'callable="{handle.__qualname__}"'
+            assert found[f"loga_calls_total{{{label}}}"] == "34"
+            assert found[f'loga_errors_total{{{label},exception_type="ValueError"}}'] == "3"
+            assert found[f'loga_call_duration_seconds_bucket{{{label},le="0.01"}}'] == "34"
+
+            # Readable from processes that don't count calls themselves
+            main(["metrics", segment])
+            assert f"loga_calls_total{{{label}}} 34" in capsys.readouterr().out
+        finally:
+            loga.close()
+        assert not os.path.exists(f"/dev/shm/{segment}")
+
+    def test_attach_with_another_layout(self, segment):
+        metrics = SharedCallMetrics(segment, (0.1,), slots=4, processes=2)
+        try:
+            with pytest.raises(ValueError):
+                SharedCallMetrics(segment, (0.1,), slots=8, processes=2)
+            other = SharedCallMetrics(segment, (0.1,), slots=4, processes=2)
+            other.observe("f", 0.0)
+            attached = SharedCallMetrics.attach(segment)
+            assert (attached.buckets, attached.slots, attached.processes) == ((0.1,), 4, 2)
+            assert sum(attached.snapshot()["f"].buckets) == 1
+            other.close()
+            attached.close()
+        finally:
+            metrics.close()
+
+    def test_full(self, segment):
+        metrics = SharedCallMetrics(segment, (0.1,), slots=2, processes=1)
+        try:
+            metrics.observe("a", 0.0)
+            metrics.observe("b", 0.0, "KeyError")
+            metrics.observe("c" * 200, 0.0)
+            snapshot = metrics.snapshot()
+            assert list(snapshot) == ["a", "b"]
+            assert snapshot["b"].errors == {}
+
+            # The only process row is taken by this process
+            def child():
+                metrics.after_fork_in_child()
+                metrics.observe("a", 0.0)
+                return True
+
+            assert run_in_fork(child) == 0
+            assert sum(metrics.snapshot()["a"].buckets) == 1
+        finally:
+            metrics.close()
+
+    def test_rows_of_exited_processes_reused(self, segment):
+        metrics = SharedCallMetrics(segment, (0.1,), slots=2, processes=2)
+
+        def child():
+            metrics.after_fork_in_child()
+            metrics.observe("a", 0.0)
+            return True
+
+        try:
+            for _ in range(3):
+                assert run_in_fork(child) == 0
+            assert sum(metrics.snapshot()["a"].buckets) == 3
+            assert list(metrics._pids).count(0) == 1
+        finally:
+            metrics.close()
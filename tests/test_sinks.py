@@ -0,0 +1,115 @@
+import logging
+import os
+import threading
+import time
+
+import pytest
+
+from loga import Loga
+from tests.test_fork import run_in_fork
+from tests.test_multiprocess import ListHandler
+
+
+class SlowHandler(ListHandler):
+    def __init__(self):
+        super().__init__()
+        self.unblocked = threading.Event()
+
+    def emit(self, record):
+        self.unblocked.wait(5)
+        super().emit(record)
+
+
+def make_loga(facility, **kwargs):
+    loga = Loga(facility=facility, log_if_graylog_disabled=False, sink_queue_size=2, **kwargs)
+    slow, fast = SlowHandler(), ListHandler()
+    loga.add_sink(slow, "slow")
+    loga.add_sink(fast, "fast", queue_size=100)
+    return loga, slow, fast
+
+
+def messages(handler):
+    return [record.getMessage() for record in handler.records]
+
+
+class TestSinks:
+    def test_slow_sink_does_not_stall_others(self):
+        loga, slow, fast = make_loga("sinks-independent")
+        start = time.monotonic()
+        loga.info("0")
+        # Let the slow sink's worker start handling it
+        time.sleep(0.05)
+        for n in range(1, 5):
+            loga.info(str(n))
+        assert time.monotonic() - start < 1
+        loga._sinks["fast"].flush()
+        assert messages(fast) == ["0", "1", "2", "3", "4"]
+        assert slow.records == []
+        slow.unblocked.set()
+        loga.flush()
+        # One record was being handled, the oldest queued ones were dropped
+        assert messages(slow) == ["0", "3", "4"]
+        stats = loga.sink_stats()
+        assert stats["slow"].handled == 3
+        assert stats["slow"].dropped == 2
+        assert stats["slow"].queued == 0
+        assert stats["fast"].dropped == 0
+        assert stats["slow"].max_latency >= stats["slow"].mean_latency > 0
+        loga.close()
+
+    def test_drop_newest(self):
+        loga, slow, _ = make_loga("sinks-newest", sink_overflow="drop_newest")
+        for n in range(5):
+            loga.info(str(n))
+            time.sleep(0.02)
+        slow.unblocked.set()
+        loga.close()
+        assert messages(slow) == ["0", "1", "2"]
+
+    def test_block(self):
+        loga, slow, _ = make_loga("sinks-block", sink_overflow="block")
+        threading.Timer(0.1, slow.unblocked.set).start()
+        start = time.monotonic()
+        for n in range(5):
+            loga.info(str(n))
+        assert time.monotonic() - start >= 0.09
+        loga.close()
+        assert messages(slow) == ["0", "1", "2", "3", "4"]
+
+    def test_sink_without_queue(self):
+        loga = Loga(facility="sinks-direct", log_if_graylog_disabled=False, sink_queue_size=2)
+        handler = ListHandler()
+        loga.add_sink(handler, queue_size=0)
+        loga.info("now")
+        assert messages(handler) == ["now"]
+        assert loga.sink_stats() == {}
+
+    def test_duplicate_names(self):
+        loga = Loga(facility="sinks-names", log_if_graylog_disabled=False, sink_queue_size=2)
+        loga.add_sink(ListHandler())
+        loga.add_sink(ListHandler())
+        assert set(loga.sink_stats()) == {"ListHandler", "ListHandler-2"}
+        loga.close()
+
+    def test_invalid_config(self):
+        loga = Loga(facility="sinks-invalid", log_if_graylog_disabled=False)
+        with pytest.raises(ValueError):
+            loga.add_sink(logging.NullHandler(), queue_size=-1)
+        with pytest.raises(ValueError):
+            loga.add_sink(logging.NullHandler(), queue_size=1, overflow="ignore")  # type: ignore
+
+    @pytest.mark.skipif(not hasattr(os, "fork"), reason="Requires os.fork")
+    def test_worker_restarted_in_forked_child(self, tmp_path):
+        logfile = tmp_path / "logs.txt"
+        loga = Loga(facility="sinks-fork", do_write=True, logfile=str(logfile), sink_queue_size=10)
+        loga.info("parent")
+
+        def child():
+            loga.info("child")
+            loga.close()
+            return True
+
+        assert run_in_fork(child) == 0
+        loga.close()
+        lines = [line.split("\t")[1] for line in logfile.read_text().splitlines()]
+        assert lines == ["parent", "child"]
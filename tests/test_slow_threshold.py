@@ -0,0 +1,83 @@
+import logging
+import time
+from unittest.mock import patch
+
+import pytest
+
+from loga import Loga
+
+loga = Loga(log_if_graylog_disabled=False, slow_threshold=0.05)
+
+
+class Unrepresentable:
+    def __repr__(self):
+        raise AssertionError("Fast calls must not repr their arguments")
+
+
+@loga
+def sleep_for(seconds, anything=None):
+    time.sleep(seconds)
+    return seconds
+
+
+@loga
+def fails(anything=None):
+    raise ValueError("Broken")
+
+
+@loga(slow_threshold=0)
+def always_logged():
+    return 1
+
+
+@loga(slow_threshold=0.05)
+class Sleeper:
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+
+class TestSlowThreshold:
+    def test_fast_call_not_logged_or_represented(self):
+        with patch("logging.Logger.log") as logger:
+            assert sleep_for(0, anything=Unrepresentable()) == 0
+        logger.assert_not_called()
+
+    def test_slow_call_logged(self):
+        with patch("logging.Logger.log") as logger:
+            sleep_for(0.06)
+        (called_level, called), called_kwargs = logger.call_args_list[0]
+        (_, returned), returned_kwargs = logger.call_args_list[1]
+        assert called == "*Called sleep_for(seconds=0.06)"
+        assert returned == "*Returned from sleep_for(seconds=0.06) with float (0.06)"
+        assert called_kwargs["extra"]["duration"] >= 0.06
+        assert called_kwargs["extra"]["couplet"] == returned_kwargs["extra"]["couplet"]
+
+    def test_errors_always_logged(self):
+        with patch("logging.Logger.log") as logger:
+            with pytest.raises(ValueError):
+                fails()
+        msgs = [c.args[1] for c in logger.call_args_list]
+        assert msgs == ["*Called fails()", '*Errored during fails() with ValueError "Broken"']
+
+    def test_per_callable_override(self):
+        with patch("logging.Logger.log") as logger:
+            always_logged()
+            Sleeper().sleep(0)
+        assert logger.call_count == 2
+        with patch("logging.Logger.log") as logger:
+            Sleeper().sleep(0.06)
+        assert logger.call_count == 2
+
+    def test_called_record_backdated(self):
+        records = []
+
+        class ListHandler(logging.Handler):
+            def emit(self, record):
+                records.append(record)
+
+        own_loga = Loga(facility="slow-backdated", slow_threshold=0.05)
+        own_loga._add_handler(ListHandler())
+        own_loga(sleep_for.__wrapped__)(0.1)  # type: ignore[attr-defined]
+        called, returned = records
+        assert returned.created - called.created >= 0.1
+        assert not hasattr(called, "_loga_created")
@@ -0,0 +1,106 @@
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from loga import Loga
+from loga._throttle import TalkerStats, Throttle
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_throttle(rate=None, callsite_rate=None, burst=1.0):
+    notices = []
+    clock = FakeClock()
+    throttle = Throttle(rate, callsite_rate, burst, 60.0, lambda *n: notices.append(n), clock)
+    return throttle, clock, notices
+
+
+class TestThrottle:
+    def test_callsite_buckets(self):
+        throttle, clock, notices = make_throttle(callsite_rate=2, burst=2)
+        assert [throttle.admit("hot") for _ in range(6)] == [True] * 4 + [False] * 2
+        # Other call sites have their own budget
+        assert throttle.admit("quiet")
+        clock.now = 1.0
+        assert [throttle.admit("hot") for _ in range(3)] == [True, True, False]
+        throttle.flush()
+        assert notices == [("hot", 3)]
+        throttle.flush()
+        assert notices == [("hot", 3)]
+        assert throttle.top_talkers() == [TalkerStats("hot", 9, 3), TalkerStats("quiet", 1, 0)]
+        assert throttle.top_talkers(1) == [TalkerStats("hot", 9, 3)]
+
+    def test_shared_bucket(self):
+        throttle, clock, _ = make_throttle(rate=3, callsite_rate=100)
+        assert [throttle.admit(site) for site in "abcd"] == [True, True, True, False]
+        clock.now = 1 / 3
+        assert throttle.admit("d")
+
+    def test_notices_from_timer(self):
+        notified = threading.Event()
+        throttle = Throttle(None, 1, 1.0, 0.01, lambda *n: notified.set())
+        throttle.admit("site")
+        assert not throttle.admit("site")
+        assert notified.wait(5)
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            make_throttle(rate=0)
+        with pytest.raises(ValueError):
+            make_throttle(rate=1, burst=0)
+
+
+class TestLogaThrottle:
+    def test_decorated_and_manual(self):
+        loga = Loga(
+            facility="throttle",
+            log_if_graylog_disabled=False,
+            throttle_callsite_rate=0.001,
+            throttle_burst=4000,
+        )
+
+        @loga
+        def noisy(n):
+            return n
+
+        with patch("logging.Logger.log") as logger:
+            for n in range(5):
+                noisy(n)
+            for _ in range(6):
+                loga.info("manual")
+            loga.info("other call site")
+            loga.flush()
+        messages = [c.args[1] for c in logger.call_args_list]
+        # 4 events of each call site, then the throttled ones are counted
+        assert messages[:4] == [
+            "*Called TestLogaThrottle.test_decorated_and_manual.<locals>.noisy(n=0)",
+            "*Returned from TestLogaThrottle.test_decorated_and_manual.<locals>.noisy(n=0) "
+            "with int (0)",
+            "*Called TestLogaThrottle.test_decorated_and_manual.<locals>.noisy(n=1)",
+            "*Returned from TestLogaThrottle.test_decorated_and_manual.<locals>.noisy(n=1) "
+            "with int (1)",
+        ]
+        assert messages[4:9] == ["manual"] * 4 + ["other call site"]
+        noisy_notice, manual_notice = messages[9:]
+        assert noisy_notice == (
+            "*Throttled 6 events from TestLogaThrottle.test_decorated_and_manual.<locals>.noisy"
+        )
+        assert manual_notice.startswith(f"*Throttled 2 events from {__file__}:")
+        assert logger.call_args.kwargs["extra"]["throttled"] == "2"
+
+        talkers = loga.top_talkers(2)
+        assert talkers[0] == TalkerStats(
+            "TestLogaThrottle.test_decorated_and_manual.<locals>.noisy", 10, 6
+        )
+        assert talkers[1].events == 6
+
+    def test_disabled(self):
+        with pytest.raises(RuntimeError):
+            Loga(log_if_graylog_disabled=False).top_talkers()
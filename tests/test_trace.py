@@ -0,0 +1,102 @@
+import json
+import threading
+
+import pytest
+
+from loga import Loga
+
+
+def read_trace(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+class TestChromeTrace:
+    def test_nested_calls(self, tmp_path):
+        trace_file = tmp_path / "trace.json"
+        loga = Loga(facility="trace-nested", trace_file=str(trace_file))
+
+        @loga
+        def inner(x):
+            return x
+
+        @loga
+        def outer(x):
+            return inner(x) + 1
+
+        outer(1)
+        loga.info("not a decorated call")
+        loga.close()
+
+        events = read_trace(trace_file)
+        assert [(e["ph"], e["name"].split(".")[-1]) for e in events] == [
+            ("X", "inner"),
+            ("X", "outer"),
+        ]
+        inner_event, outer_event = events
+        assert outer_event["args"] == {"params": "x=1"}
+        assert outer_event["ts"] <= inner_event["ts"]
+        assert inner_event["ts"] + inner_event["dur"] <= outer_event["ts"] + outer_event["dur"]
+        assert {e["tid"] for e in events} == {threading.get_ident()}
+
+    def test_errors(self, tmp_path):
+        trace_file = tmp_path / "trace.json"
+        loga = Loga(facility="trace-errors", trace_file=str(trace_file))
+
+        @loga
+        def fails():
+            raise ValueError
+
+        @loga.errors
+        def fails_quietly():
+            raise KeyError
+
+        for func in (fails, fails_quietly):
+            with pytest.raises(LookupError if func is fails_quietly else ValueError):
+                func()
+        loga.close()
+
+        loud, quiet = read_trace(trace_file)
+        assert loud["args"]["exception_type"] == "ValueError"
+        assert quiet["ph"] == "X"
+        assert quiet["args"]["exception_type"] == "KeyError"
+
+    def test_independent_of_logs(self, tmp_path):
+        trace_file = tmp_path / "trace.json"
+        loga = Loga(
+            facility="trace-no-logs",
+            trace_file=str(trace_file),
+            called=None,
+            returned=None,
+            repeat_window=60,
+        )
+
+        @loga
+        def func():
+            pass
+
+        for _ in range(3):
+            func()
+        loga.stop()
+        func()
+        loga.close()
+        assert [e["ph"] for e in read_trace(trace_file)] == ["X"] * 4
+
+    def test_buffered_until_full(self, tmp_path):
+        trace_file = tmp_path / "trace.json"
+        loga = Loga(facility="trace-buffer", trace_file=str(trace_file))
+        assert loga._tracer is not None
+        loga._tracer.buffer_size = 2
+
+        @loga
+        def func():
+            pass
+
+        func()
+        assert trace_file.read_text() == "[\n"
+        func()
+        # Unterminated until closed
+        assert json.loads(trace_file.read_text() + "]")[-1]["ph"] == "X"
+        func()
+        loga.close()
+        assert len(read_trace(trace_file)) == 3
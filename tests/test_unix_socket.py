@@ -0,0 +1,172 @@
+import gc
+import json
+import logging
+import os
+import socket
+import struct
+import tempfile
+import time
+import weakref
+
+import pytest
+
+from loga import Loga
+from loga._unix import UnixSocketHandler
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="Requires AF_UNIX")
+
+
+@pytest.fixture
+def path():
+    # Unix socket paths are short, so not in pytest's temporary directories
+    directory = tempfile.mkdtemp()
+    yield os.path.join(directory, "logs.sock")
+    for name in os.listdir(directory):
+        os.remove(os.path.join(directory, name))
+    os.rmdir(directory)
+
+
+def listen(path, kind=socket.SOCK_STREAM):
+    server = socket.socket(socket.AF_UNIX, kind)
+    server.bind(path)
+    if kind == socket.SOCK_STREAM:
+        server.listen()
+    server.settimeout(5)
+    return server
+
+
+def parse_frames(data):
+    """Return the messages of the whole frames at the start of `data`,
+    and the rest of it."""
+    messages = []
+    while len(data) >= 4:
+        (length,) = struct.unpack("!I", data[:4])
+        if len(data) < 4 + length:
+            break
+        messages.append(data[4 : 4 + length].decode())
+        data = data[4 + length :]
+    return messages, data
+
+
+def receive(conn, count):
+    messages: list[str] = []
+    data = b""
+    while len(messages) < count:
+        chunk = conn.recv(65536)
+        assert chunk
+        frames, data = parse_frames(data + chunk)
+        messages += frames
+    return messages
+
+
+def record(msg, level=logging.INFO):
+    return logging.makeLogRecord({"msg": msg, "levelno": level, "levelname": "x"})
+
+
+class TestUnixSocket:
+    def test_stream(self, path):
+        server = listen(path)
+        loga = Loga(facility="unix-socket", log_if_graylog_disabled=False, unix_socket=path)
+        try:
+            loga.info("first", extra={"request": 1})
+            loga.warning("second")
+            loga.flush()
+            conn, _ = server.accept()
+            with conn:
+                conn.settimeout(5)
+                first, second = map(json.loads, receive(conn, 2))
+        finally:
+            loga.close()
+            server.close()
+        assert (first["message"], first["request"], first["level"]) == ("first", "1", 20)
+        assert second["message"] == "second" and second["loga"] == "True"
+
+    def test_batches(self, path):
+        server = listen(path)
+        handler = UnixSocketHandler(path, batch_size=3, flush_interval=60)
+        try:
+            handler.handle(record("one"))
+            handler.handle(record("two"))
+            # Not even connected before a whole batch is buffered
+            server.settimeout(0.2)
+            with pytest.raises(socket.timeout):
+                server.accept()
+            handler.handle(record("three"))
+            server.settimeout(5)
+            conn, _ = server.accept()
+            conn.settimeout(5)
+            assert receive(conn, 3) == ["one", "two", "three"]
+            # Errors are sent right away
+            handler.handle(record("error", logging.ERROR))
+            assert receive(conn, 1) == ["error"]
+            conn.close()
+        finally:
+            handler.close()
+            server.close()
+
+    def test_datagram(self, path):
+        server = listen(path, socket.SOCK_DGRAM)
+        handler = UnixSocketHandler(path, "datagram", batch_size=2, flush_interval=60)
+        try:
+            for msg in "abcd":
+                handler.handle(record(msg))
+            # One datagram per batch
+            assert parse_frames(server.recv(65536)) == (["a", "b"], b"")
+            assert parse_frames(server.recv(65536)) == (["c", "d"], b"")
+        finally:
+            handler.close()
+            server.close()
+
+    def test_reconnects_and_spills(self, path):
+        handler = UnixSocketHandler(
+            path, batch_size=1, flush_interval=60, buffer_size=30, reconnect_interval=0
+        )
+        try:
+            # Nobody listening: records are kept, at most 30 bytes of them
+            for msg in "abcdef":
+                handler.handle(record(msg * 4))
+            assert handler.dropped == 3
+            server = listen(path)
+            handler.flush()
+            conn, _ = server.accept()
+            conn.settimeout(5)
+            assert receive(conn, 3) == ["dddd", "eeee", "ffff"]
+
+            # The listener goes away and comes back
+            conn.close()
+            server.close()
+            os.remove(path)
+            for msg in "gh":
+                handler.handle(record(msg * 4))
+            server = listen(path)
+            handler.handle(record("iiii"))
+            conn, _ = server.accept()
+            conn.settimeout(5)
+            assert receive(conn, 3) == ["gggg", "hhhh", "iiii"]
+            conn.close()
+            server.close()
+        finally:
+            handler.close()
+
+    def test_never_blocks(self, path):
+        server = listen(path)
+        handler = UnixSocketHandler(path, batch_size=1, flush_interval=60, buffer_size=1 << 20)
+        try:
+            start = time.monotonic()
+            # Far more than the socket's buffers take while nobody reads
+            for _ in range(200):
+                handler.handle(record("x" * 50_000))
+            assert time.monotonic() - start < 5
+            assert handler.dropped > 0
+        finally:
+            handler.close()
+            server.close()
+
+    def test_closed_handlers_are_freed(self, path):
+        handler = UnixSocketHandler(path, flush_interval=60)
+        handler.close()
+        handler._flusher.join(5)
+        ref = weakref.ref(handler)
+        del handler
+        gc.collect()
+        assert ref() is None